@@ -2,17 +2,45 @@ from __future__ import annotations
 
 import hashlib
 import json
+import math
 import os
-from urllib.parse import quote
-from datetime import datetime
+import threading
+from functools import lru_cache
+from importlib import import_module
 from pathlib import Path
-from typing import Any, Dict, Optional
+from typing import TYPE_CHECKING, Any, Dict, Optional
 
-import requests
-from flask import Flask, jsonify, render_template, request
+import click
+from flask import Flask, Response, g, jsonify, render_template, request
+from flask.json.provider import DefaultJSONProvider
 
+from backend import metrics
+from backend.aggregates import Aggregates
+from backend.batch import EXPENSE_FIELDS, all_finite, calculate_batch
 from backend.calculations import calculate_all
-from backend.constants import DEFAULT_MIN_WAGE, get_rules, save_rules
+from backend.config import read_env_file
+from backend.constants import DEFAULT_MIN_WAGE, get_rules, get_rules_version, save_rules
+from backend.kv import KVClient, get_kv_client, kv_config
+from backend.memo import CALCULATION_CACHE, cached_calculate
+from backend.serialization import make_encoder
+from backend.storage import (
+    MAX_PAGE_SIZE,
+    Cursor,
+    filter_summaries,
+    format_cursor,
+    new_record_id,
+    next_cursor,
+    open_storage,
+    parse_cursor,
+    summarize_record,
+    summary_score,
+    take_summaries,
+)
+
+# exportacao, importacao, recalculo, sensibilidade e solver sao importados so
+# nas rotas e comandos que os usam: nao pesam no cold start da funcao
+if TYPE_CHECKING:
+    from backend.sensitivity import Axis
 
 BASE_DIR = Path(__file__).resolve().parent
 # Use absolute paths to avoid cwd issues on Vercel.
@@ -27,7 +55,39 @@ if os.getenv("VERCEL") or os.getenv("VERCEL_ENV"):
     DATA_DIR = Path("/tmp") / "brmsalcalc" / "simulacoes"
 else:
     DATA_DIR = BASE_DIR / "data" / "simulacoes"
-DATA_DIR.mkdir(parents=True, exist_ok=True)
+# O diretorio so e criado no primeiro acesso; com KV ele nem chega a existir.
+FILE_STORAGE = open_storage(DATA_DIR)
+
+
+# Mesmo ``default`` do Flask (datas, Decimal, dataclasses...), sem ordenar chaves.
+_JSON_ENCODER = make_encoder(default=DefaultJSONProvider.default)
+_COMPACT_ARGS = {"separators": (",", ":")}
+
+
+class _TimedJSONProvider(DefaultJSONProvider):
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        with metrics.stage("serializacao"):
+            # ``jsonify`` fora do modo debug pede so a saida compacta
+            if kwargs == _COMPACT_ARGS:
+                return _JSON_ENCODER.encode(obj)
+            return super().dumps(obj, **kwargs)
+
+
+app.json = _TimedJSONProvider(app)
+
+
+@app.before_request
+def _start_timing() -> None:
+    g.timing = metrics.begin_request()
+
+
+@app.after_request
+def _finish_timing(response: Response) -> Response:
+    timing = g.pop("timing", None)
+    if timing is not None:
+        rule = request.url_rule.rule if request.url_rule else None
+        response.headers["Server-Timing"] = timing.finish(request.method, rule, response.status_code)
+    return response
 
 
 def _get_credentials() -> Dict[str, str]:
@@ -36,85 +96,45 @@ def _get_credentials() -> Dict[str, str]:
         "ADMIN_PASSWORD": os.getenv("ADMIN_PASSWORD"),
     }
     if not env["ADMIN_LOGIN"] or not env["ADMIN_PASSWORD"]:
-        env_path = BASE_DIR / ".env"
-        if env_path.exists():
-            for line in env_path.read_text(encoding="utf-8").splitlines():
-                if not line or line.strip().startswith("#") or "=" not in line:
-                    continue
-                key, value = line.split("=", 1)
-                if key.strip() in ("ADMIN_LOGIN", "ADMIN_PASSWORD"):
-                    env[key.strip()] = value.strip()
+        file_env = read_env_file(BASE_DIR / ".env")
+        for key in ("ADMIN_LOGIN", "ADMIN_PASSWORD"):
+            if key in file_env:
+                env[key] = file_env[key]
     return {
         "login": env.get("ADMIN_LOGIN") or "admin",
         "password": env.get("ADMIN_PASSWORD") or "admin123",
     }
 
 
+@lru_cache(maxsize=8)
 def _make_token(login: str, password: str) -> str:
     raw = f"{login}:{password}"
     return hashlib.sha256(raw.encode("utf-8")).hexdigest()
 
 
 def _kv_config() -> Optional[Dict[str, str]]:
-    url = os.getenv("KV_REST_API_URL") or os.getenv("UPSTASH_REDIS_REST_URL")
-    token = os.getenv("KV_REST_API_TOKEN") or os.getenv("UPSTASH_REDIS_REST_TOKEN")
-    if not url or not token:
-        return None
-    return {"url": url.rstrip("/"), "token": token}
+    return kv_config()
 
 
-def _kv_request(command: str, *args: str, data: Optional[str] = None) -> Dict[str, Any]:
-    config = _kv_config()
-    if not config:
+def _kv_client() -> KVClient:
+    client = get_kv_client()
+    if client is None:
         raise RuntimeError("KV nao configurado")
-    path = "/".join([command.lower(), *[quote(str(arg), safe="") for arg in args]])
-    url = f"{config['url']}/{path}"
-    headers = {"Authorization": f"Bearer {config['token']}"}
-    if data is None:
-        response = requests.get(url, headers=headers, timeout=10)
-    else:
-        response = requests.post(url, headers=headers, data=data.encode("utf-8"), timeout=10)
-    response.raise_for_status()
-    payload = response.json()
-    if "error" in payload:
-        raise RuntimeError(payload["error"])
-    return payload
+    return client
 
 
 def _kv_set(key: str, value: str) -> None:
-    _kv_request("set", key, data=value)
+    _kv_client().command("SET", key, value)
 
 
 def _kv_get(key: str) -> Optional[str]:
-    payload = _kv_request("get", key)
-    return payload.get("result")
-
-
-def _kv_del(key: str) -> None:
-    _kv_request("del", key)
-
-
-def _kv_zadd(key: str, score: float, member: str) -> None:
-    _kv_request("zadd", key, str(score), member)
-
-
-def _kv_zrem(key: str, member: str) -> None:
-    _kv_request("zrem", key, member)
-
-
-def _kv_zrange(key: str, start: int, stop: int, rev: bool = False) -> list[str]:
-    args = [key, str(start), str(stop)]
-    if rev:
-        args.append("REV")
-    payload = _kv_request("zrange", *args)
-    return payload.get("result") or []
+    return _kv_client().command("GET", key)
 
 
 def _kv_mget(keys: list[str]) -> list[Optional[str]]:
     if not keys:
         return []
-    payload = _kv_request("mget", *keys)
-    return payload.get("result") or []
+    return _kv_client().command("MGET", *keys) or []
 
 
 def _storage_use_kv() -> bool:
@@ -128,50 +148,296 @@ def _require_kv_if_vercel() -> Optional[tuple[Any, int]]:
     return None
 
 
-def _slugify(value: str) -> str:
-    safe = "".join(ch if ch.isalnum() else "_" for ch in value.strip())
-    return "_".join(filter(None, safe.split("_"))).lower() or "empresa"
+KV_AGGREGATES_KEY = "sim:aggregates"
+# Hash id -> resumo compacto (JSON); listagens e analises leem so daqui.
+KV_SUMMARIES_KEY = "sim:summaries"
+# Contador incrementado a cada gravacao/exclusao; compoe o ETag das listagens.
+KV_GENERATION_KEY = "sim:generation"
+# Lista com os ids (JSON) de cada geracao, na mesma transacao do INCR; a busca de
+# outros processos aplica so esses ids em vez de remontar o indice.
+KV_CHANGES_KEY = "sim:changes"
+KV_CHANGES_MAX = 10000
+KV_SCAN_CHUNK = 200
 
 
-def _load_records() -> list[dict[str, Any]]:
-    if _storage_use_kv():
-        ids = _kv_zrange("sim:index", 0, -1, rev=True)
-        keys = [f"sim:{sim_id}" for sim_id in ids]
-        raw_items = _kv_mget(keys)
-        records: list[dict[str, Any]] = []
-        for raw in raw_items:
-            if not raw:
-                continue
-            try:
-                records.append(json.loads(raw))
-            except json.JSONDecodeError:
-                continue
-        return records
+def _dump_summary(summary: dict[str, Any]) -> str:
+    return json.dumps(summary, ensure_ascii=False, separators=(",", ":"))
+
+
+def _kv_backfill_summaries(ids: list[str]) -> dict[str, dict[str, Any]]:
+    """Gera e grava os resumos de registros que ainda nao estao no hash."""
+    summaries: dict[str, dict[str, Any]] = {}
+    for sim_id, raw in zip(ids, _kv_mget([f"sim:{sim_id}" for sim_id in ids])):
+        if not raw:
+            continue
+        try:
+            summaries[sim_id] = summarize_record(json.loads(raw), sim_id)
+        except json.JSONDecodeError:
+            continue
+    if summaries:
+        fields: list[str] = []
+        for sim_id, summary in summaries.items():
+            fields += [sim_id, _dump_summary(summary)]
+        _kv_client().command("HSET", KV_SUMMARIES_KEY, *fields)
+    return summaries
+
 
-    records: list[dict[str, Any]] = []
-    for path in DATA_DIR.rglob("*.json"):
+def _kv_summaries(ids: list[str]) -> list[dict[str, Any]]:
+    """Resumos dos ``ids`` (na mesma ordem), completando os que faltarem."""
+    if not ids:
+        return []
+    raw_items = _kv_client().command("HMGET", KV_SUMMARIES_KEY, *ids) or []
+    missing = [sim_id for sim_id, raw in zip(ids, raw_items) if not raw]
+    backfilled = _kv_backfill_summaries(missing) if missing else {}
+    summaries: list[dict[str, Any]] = []
+    for sim_id, raw in zip(ids, raw_items):
+        if not raw:
+            if sim_id in backfilled:
+                summaries.append(backfilled[sim_id])
+            continue
         try:
-            payload = json.loads(path.read_text(encoding="utf-8"))
+            summaries.append(json.loads(raw))
         except json.JSONDecodeError:
             continue
-        records.append(payload)
-    return records
+    return summaries
+
+
+def _kv_index_range(top: str, skip: int, count: Optional[int]) -> list[Any]:
+    args: list[Any] = ["ZRANGE", "sim:index", top, "-inf", "BYSCORE", "REV"]
+    if skip or count is not None:
+        args += ["LIMIT", skip, -1 if count is None else count]
+    return args
+
+
+def _kv_scan_ids(before: Optional[Cursor], skip: int, count: Optional[int]) -> list[str]:
+    """Ids do indice em ordem decrescente de ``(score, id)``, abaixo de ``before``."""
+    if before is None:
+        return _kv_client().command(*_kv_index_range("+inf", skip, count)) or []
+    score, last_id = before
+    # o ZSET desempata pelo id, entao no score do cursor entram so os ids menores
+    ties, ids = _kv_client().pipeline(
+        [
+            ["ZRANGE", "sim:index", repr(score), repr(score), "BYSCORE", "REV"],
+            _kv_index_range(f"({score!r}", skip, count),
+        ]
+    )
+    ties = [sim_id for sim_id in ties or [] if sim_id < last_id]
+    if not ties:
+        return ids or []
+    # raro (mesmo ``created_at``): a pagina comeca pelos empates e o resto vem abaixo do score
+    head = ties[skip:] if count is None else ties[skip : skip + count]
+    rest = None if count is None else count - len(head)
+    if rest == 0:
+        return head
+    return head + (_kv_client().command(*_kv_index_range(f"({score!r}", max(skip - len(ties), 0), rest)) or [])
+
+
+def _kv_scan_summaries(
+    before: Optional[Cursor], skip: int = 0, count: Optional[int] = None
+) -> tuple[list[dict[str, Any]], int]:
+    """Resumos do indice em ordem decrescente de ``(score, id)``, abaixo de ``before``.
+
+    Devolve os resumos e quantos ids o ``ZRANGE`` retornou (para saber se o
+    indice acabou).
+    """
+    ids = _kv_scan_ids(before, skip, count)
+    return _kv_summaries(ids), len(ids)
+
+
+def _list_summaries(
+    empresa: Optional[str] = None,
+    cliente: Optional[str] = None,
+    limit: Optional[int] = None,
+    offset: int = 0,
+    before: Optional[Cursor] = None,
+) -> list[dict[str, Any]]:
+    if _storage_use_kv():
+        if not empresa and not cliente:
+            return _kv_scan_summaries(before, offset, limit)[0]
+        # Com filtro, le o indice em blocos ate completar a pagina.
+        page: list[dict[str, Any]] = []
+        skip = 0
+        while limit is None or len(page) < offset + limit:
+            summaries, fetched = _kv_scan_summaries(before, skip, KV_SCAN_CHUNK)
+            page.extend(filter_summaries(summaries, empresa, cliente))
+            skip += fetched
+            if fetched < KV_SCAN_CHUNK:
+                break
+        return take_summaries(page, limit=limit, offset=offset)
+
+    return FILE_STORAGE.list_summaries(
+        empresa=empresa, cliente=cliente, limit=limit, offset=offset, before=before
+    )
+
+
+def _kv_parse_aggregates(raw: Optional[str]) -> tuple[Optional[str], Optional[Aggregates]]:
+    """(geracao de ``sim:generation`` refletida, agregados) gravados em ``raw``."""
+    if not raw:
+        return None, None
+    try:
+        data = json.loads(raw)
+        return data.get("generation"), Aggregates.from_dict(data)
+    except (json.JSONDecodeError, AttributeError):
+        return None, None
+
+
+def _kv_store_aggregates(aggregates: Aggregates, generation: Any) -> None:
+    data = {**aggregates.to_dict(), "generation": str(generation)}
+    _kv_set(KV_AGGREGATES_KEY, json.dumps(data, ensure_ascii=False))
+
+
+def _kv_update_aggregates(
+    old: Optional[dict[str, Any]], new: Optional[dict[str, Any]], raw: Optional[str], generation: Any
+) -> None:
+    """Aplica a mudanca sobre os agregados ``raw`` lidos na transacao que chegou a ``generation``.
+
+    Compare-and-set pela geracao: so atualiza agregados da geracao imediatamente
+    anterior. Se outra gravacao passou no meio, nada e gravado e a proxima
+    leitura de _analysis_aggregates ve a geracao atrasada e reconstroi.
+    """
+    stamp, aggregates = _kv_parse_aggregates(raw)
+    if aggregates is None or stamp != str(int(generation) - 1):
+        return
+    stale = aggregates.remove(old) if old else set()
+    if new:
+        aggregates.add(new)
+    if stale:
+        aggregates.refresh_extremes(stale, _list_summaries())
+    _kv_store_aggregates(aggregates, generation)
+
+
+def _analysis_aggregates() -> dict[str, Any]:
+    if _storage_use_kv():
+        raw, generation = _kv_client().pipeline([["GET", KV_AGGREGATES_KEY], ["GET", KV_GENERATION_KEY]])
+        generation = generation or "0"
+        stamp, aggregates = _kv_parse_aggregates(raw)
+        if aggregates is None or stamp != generation:
+            aggregates = Aggregates.from_summaries(_list_summaries())
+            # so grava se ninguem mudou o acervo durante a leitura dos resumos
+            if (_kv_get(KV_GENERATION_KEY) or "0") == generation:
+                _kv_store_aggregates(aggregates, generation)
+        return aggregates.report()
+
+    return FILE_STORAGE.aggregates()
+
+
+# (geracao do KV, indice de busca) do processo; ver _search_summaries
+_KV_SEARCH: Optional[tuple[str, Any]] = None
+_KV_SEARCH_LOCK = threading.Lock()
+
+
+def _search_summaries(
+    text: Optional[str], fuzzy: bool, ranges: dict[str, Any], limit: Optional[int], offset: int
+) -> tuple[int, list[dict[str, Any]]]:
+    if not _storage_use_kv():
+        return FILE_STORAGE.search(text, fuzzy, ranges, limit, offset)
+
+    from backend.search import SearchIndex
+
+    global _KV_SEARCH
+    with _KV_SEARCH_LOCK:
+        generation = _kv_get(KV_GENERATION_KEY) or "0"
+        if _KV_SEARCH is not None and _KV_SEARCH[0] != generation:
+            # Outro processo gravou: aplica so os ids das geracoes novas.
+            _KV_SEARCH = _kv_replay_changes(*_KV_SEARCH, generation)
+        if _KV_SEARCH is None:
+            _KV_SEARCH = (generation, SearchIndex(_list_summaries()))
+        return _KV_SEARCH[1].search(text, fuzzy, ranges, limit, offset)
+
+
+def _kv_change_commands(ids: list[str]) -> list[list[Any]]:
+    """Registro dos ``ids`` em ``sim:changes`` e ``INCR`` da geracao (use numa transacao)."""
+    return [
+        ["RPUSH", KV_CHANGES_KEY, json.dumps(ids, ensure_ascii=False)],
+        ["LTRIM", KV_CHANGES_KEY, -KV_CHANGES_MAX, -1],
+        ["INCR", KV_GENERATION_KEY],
+    ]
+
+
+def _kv_replay_changes(since: str, index: Any, generation: str) -> Optional[tuple[str, Any]]:
+    """Aplica ao indice os ids gravados depois da geracao ``since`` (ate ``generation`` ou mais).
+
+    Devolve ``None`` se ``sim:changes`` nao cobre todas essas geracoes.
+    """
+    wanted = max(int(generation) - int(since), 1)
+    while True:
+        # GET e LRANGE na mesma transacao: o fim da lista e a geracao lida
+        generation, entries = _kv_client().transaction(
+            [["GET", KV_GENERATION_KEY], ["LRANGE", KV_CHANGES_KEY, -wanted, -1]]
+        )
+        missing = int(generation or 0) - int(since)
+        entries = entries or []
+        if missing < 0 or missing > KV_CHANGES_MAX or len(entries) < min(missing, wanted):
+            return None
+        if missing <= wanted:
+            break
+        wanted = missing
+    ids = sorted({sim_id for entry in entries[len(entries) - missing :] for sim_id in json.loads(entry)})
+    summaries = {summary["id"]: summary for summary in _kv_summaries(ids)}
+    for sim_id in ids:
+        if sim_id in summaries:
+            index.add(summaries[sim_id])
+        else:
+            index.discard(sim_id)
+    return str(generation), index
+
+
+def _kv_update_search(generation: Any, added: Optional[dict[str, Any]] = None, removed: Optional[str] = None) -> None:
+    """Aplica a gravacao ao indice de busca se ele estava na geracao anterior ao ``INCR``."""
+    global _KV_SEARCH
+    with _KV_SEARCH_LOCK:
+        if _KV_SEARCH is None or _KV_SEARCH[0] != str(int(generation) - 1):
+            return
+        index = _KV_SEARCH[1]
+        if added is not None:
+            index.add(added)
+        if removed is not None:
+            index.discard(removed)
+        _KV_SEARCH = (str(generation), index)
 
 
 def _save_record(record: dict[str, Any]) -> None:
     if _storage_use_kv():
         sim_id = record["id"]
         key = f"sim:{sim_id}"
-        _kv_set(key, json.dumps(record, ensure_ascii=False, indent=2))
-        created_at = record.get("created_at") or datetime.now().isoformat()
-        score = datetime.fromisoformat(created_at).timestamp()
-        _kv_zadd("sim:index", score, sim_id)
+        summary = summarize_record(record)
+        *_, generation, raw_aggregates = _kv_client().transaction(
+            [
+                ["SET", key, json.dumps(record, ensure_ascii=False, separators=(",", ":"))],
+                ["HSET", KV_SUMMARIES_KEY, sim_id, _dump_summary(summary)],
+                ["ZADD", "sim:index", summary_score(summary), sim_id],
+                *_kv_change_commands([sim_id]),
+                ["GET", KV_AGGREGATES_KEY],
+            ]
+        )
+        _kv_update_aggregates(None, summary, raw_aggregates, generation)
+        _kv_update_search(generation, added=summary)
         return
 
-    sim_id = record["id"]
-    path = DATA_DIR / f"{sim_id}.json"
-    path.parent.mkdir(parents=True, exist_ok=True)
-    path.write_text(json.dumps(record, ensure_ascii=False, indent=2), encoding="utf-8")
+    FILE_STORAGE.save(record)
+
+
+def _save_records(records: list[dict[str, Any]], replace: bool = False) -> int:
+    """Grava um lote de registros (importacao em massa ou recalculo).
+
+    Os agregados do KV sao descartados na mesma transacao e reconstruidos
+    na proxima leitura (``replace`` indica que os registros podem ja existir).
+    """
+    if not _storage_use_kv():
+        return FILE_STORAGE.save_many(records)
+
+    summaries = [summarize_record(record) for record in records]
+    for start in range(0, len(records), KV_SCAN_CHUNK):
+        commands: list[list[Any]] = []
+        for record, summary in zip(records[start : start + KV_SCAN_CHUNK], summaries[start : start + KV_SCAN_CHUNK]):
+            sim_id = record["id"]
+            commands.append(["SET", f"sim:{sim_id}", json.dumps(record, ensure_ascii=False, separators=(",", ":"))])
+            commands.append(["HSET", KV_SUMMARIES_KEY, sim_id, _dump_summary(summary)])
+            commands.append(["ZADD", "sim:index", summary_score(summary), sim_id])
+        commands += _kv_change_commands([record["id"] for record in records[start : start + KV_SCAN_CHUNK]])
+        commands.append(["DEL", KV_AGGREGATES_KEY])
+        _kv_client().transaction(commands)
+    return len(records)
 
 
 def _get_record(sim_id: str) -> Optional[dict[str, Any]]:
@@ -185,30 +451,84 @@ def _get_record(sim_id: str) -> Optional[dict[str, Any]]:
         except json.JSONDecodeError:
             return None
 
-    path = DATA_DIR / f"{sim_id}.json"
-    if not path.exists():
-        return None
-    return json.loads(path.read_text(encoding="utf-8"))
+    return FILE_STORAGE.get(sim_id)
 
 
-def _delete_record(sim_id: str) -> None:
+def _get_records(sim_ids: list[str]) -> list[Optional[dict[str, Any]]]:
     if _storage_use_kv():
-        key = f"sim:{sim_id}"
-        _kv_del(key)
-        _kv_zrem("sim:index", sim_id)
-        return
+        records: list[Optional[dict[str, Any]]] = []
+        for raw in _kv_mget([f"sim:{sim_id}" for sim_id in sim_ids]):
+            try:
+                records.append(json.loads(raw) if raw else None)
+            except json.JSONDecodeError:
+                records.append(None)
+        return records
+
+    return FILE_STORAGE.get_many(sim_ids)
+
 
-    path = DATA_DIR / f"{sim_id}.json"
-    if path.exists():
-        path.unlink()
+def _delete_record(sim_id: str) -> bool:
+    if _storage_use_kv():
+        # O HGET roda antes do HDEL na transacao e devolve o resumo antigo.
+        raw_summary, deleted, *_, generation, raw_aggregates = _kv_client().transaction(
+            [
+                ["HGET", KV_SUMMARIES_KEY, sim_id],
+                ["DEL", f"sim:{sim_id}"],
+                ["HDEL", KV_SUMMARIES_KEY, sim_id],
+                ["ZREM", "sim:index", sim_id],
+                *_kv_change_commands([sim_id]),
+                ["GET", KV_AGGREGATES_KEY],
+            ]
+        )
+        if not deleted:
+            return False
+        try:
+            old = json.loads(raw_summary) if raw_summary else None
+        except json.JSONDecodeError:
+            old = None
+        # sem o resumo antigo nao ha como descontar: os agregados ficam numa
+        # geracao atrasada e a proxima leitura os reconstroi
+        if old is not None:
+            _kv_update_aggregates(old, None, raw_aggregates, generation)
+        _kv_update_search(generation, removed=sim_id)
+        return True
+
+    return FILE_STORAGE.delete(sim_id)
+
+
+def _storage_etag() -> str:
+    """ETag das listagens: geracao do armazenamento + versao das regras.
+
+    Custa um GET no KV ou um ``stat`` do catalogo; nenhum resumo e lido.
+    """
+    if _storage_use_kv():
+        generation = _kv_get(KV_GENERATION_KEY) or "0"
+    else:
+        generation = FILE_STORAGE.generation()
+    return f"{generation}.{get_rules_version()}"
+
+
+def _tag_response(response: Response, etag: str) -> Response:
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "private, no-cache"
+    response.headers["Vary"] = "X-Auth-Token"
+    return response
+
+
+def _not_modified(etag: str) -> Optional[Response]:
+    """Resposta 304 quando o ``If-None-Match`` do cliente ja cobre ``etag``."""
+    if request.if_none_match.contains_weak(etag):
+        return _tag_response(Response(status=304), etag)
+    return None
 
 
 def _require_auth() -> Optional[str]:
     token = request.headers.get("X-Auth-Token")
     if not token:
         return None
-    credentials = _get_credentials()
-    expected = _make_token(credentials["login"], credentials["password"])
+    with metrics.stage("auth"):
+        credentials = _get_credentials()
+        expected = _make_token(credentials["login"], credentials["password"])
     if token != expected:
         return None
     return credentials["login"]
@@ -225,11 +545,63 @@ def _to_float(value: Any, field_name: str, default: float = 0.0) -> float:
         number = float(value)
     except (TypeError, ValueError):
         raise ValueError(f"{field_name} invalido")
+    if not math.isfinite(number):
+        raise ValueError(f"{field_name} invalido")
     if number < 0:
         raise ValueError(f"{field_name} nao pode ser negativo")
     return number
 
 
+def _parse_page_args() -> tuple[Optional[int], int, Optional[Cursor]]:
+    limit = request.args.get("limit")
+    offset = request.args.get("offset")
+    before = request.args.get("before")
+    try:
+        limit_value = int(limit) if limit is not None else None
+        offset_value = int(offset) if offset is not None else 0
+        before_value = parse_cursor(before) if before is not None else None
+    except ValueError:
+        raise ValueError("limit/offset/before invalidos")
+    if limit_value is not None and not 1 <= limit_value <= MAX_PAGE_SIZE:
+        raise ValueError(f"limit deve estar entre 1 e {MAX_PAGE_SIZE}")
+    if offset_value < 0:
+        raise ValueError("offset nao pode ser negativo")
+    return limit_value, offset_value, before_value
+
+
+def _paged_response(rows: list[dict[str, Any]], page: list[dict[str, Any]], limit: Optional[int]) -> Any:
+    response = jsonify(rows)
+    cursor = next_cursor(page, limit)
+    if cursor is not None:
+        response.headers["X-Next-Before"] = format_cursor(cursor)
+    return response
+
+
+def _parse_export_args() -> tuple[str, dict[str, Any]]:
+    from backend.export import EXPORT_FORMATS, parse_date_bound
+
+    export_format = (request.args.get("formato") or "ndjson").lower()
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError("formato deve ser ndjson ou csv")
+    filters = {
+        "empresa": request.args.get("empresa"),
+        "cliente": request.args.get("cliente"),
+        "desde": parse_date_bound(request.args.get("desde")),
+        "ate": parse_date_bound(request.args.get("ate"), end=True),
+    }
+    return export_format, filters
+
+
+def _export_response(chunks: Any, export_format: str, name: str) -> Response:
+    from backend.export import EXPORT_FORMATS, gzip_chunks
+
+    headers = {"Content-Disposition": f'attachment; filename="{name}.{export_format}"', "Vary": "Accept-Encoding"}
+    if "gzip" in request.headers.get("Accept-Encoding", ""):
+        headers["Content-Encoding"] = "gzip"
+        chunks = gzip_chunks(chunks)
+    return Response(chunks, mimetype=EXPORT_FORMATS[export_format], headers=headers)
+
+
 def _get_payload() -> Optional[Dict[str, Any]]:
     payload = request.get_json(silent=True)
     if not isinstance(payload, dict):
@@ -237,13 +609,13 @@ def _get_payload() -> Optional[Dict[str, Any]]:
     return payload
 
 
-def _parse_calculation_payload(payload: Dict[str, Any]) -> Dict[str, Any]:
+def _parse_calculation_payload(payload: Dict[str, Any], require_income: bool = True) -> Dict[str, Any]:
     despesas_raw = payload.get("despesas_anuais") or {}
     if not isinstance(despesas_raw, dict):
         raise ValueError("despesas_anuais invalido")
 
     rendimento_mensal = payload.get("rendimento_mensal")
-    if rendimento_mensal is None:
+    if rendimento_mensal is None and require_income:
         raise ValueError("rendimento_mensal obrigatorio")
 
     annual_expenses = {
@@ -270,6 +642,54 @@ def _parse_calculation_payload(payload: Dict[str, Any]) -> Dict[str, Any]:
     }
 
 
+def _parse_batch_payload(payload: Dict[str, Any]) -> Dict[str, Any]:
+    rendimentos = payload.get("rendimento_mensal")
+    if not isinstance(rendimentos, list):
+        raise ValueError("rendimento_mensal deve ser uma lista")
+    size = len(rendimentos)
+
+    def column(values: Any, field_name: str) -> list[float]:
+        if values is None:
+            return [0.0] * size
+        if not isinstance(values, list):
+            raise ValueError(f"{field_name} deve ser uma lista")
+        if len(values) != size:
+            raise ValueError(f"{field_name} deve ter o mesmo tamanho de rendimento_mensal")
+        return [_to_float(value, field_name) for value in values]
+
+    despesas_raw = payload.get("despesas_anuais") or {}
+    if not isinstance(despesas_raw, dict):
+        raise ValueError("despesas_anuais invalido")
+
+    if any(value is None for value in rendimentos):
+        raise ValueError("rendimento_mensal obrigatorio")
+
+    return {
+        "rendimento_mensal": column(rendimentos, "rendimento_mensal"),
+        "annual_expenses": {name: column(despesas_raw.get(name), name) for name in EXPENSE_FIELDS},
+        "pro_labore": column(payload.get("pro_labore"), "pro_labore"),
+        "iss_fixo": column(payload.get("iss_fixo"), "iss_fixo"),
+        "salario_minimo": column(payload.get("salario_minimo"), "salario_minimo"),
+    }
+
+
+def _parse_axis(raw: Any, name: str) -> Axis:
+    from backend.sensitivity import Axis
+
+    if not isinstance(raw, dict):
+        raise ValueError(f"{name} invalido")
+    try:
+        passos = int(raw.get("passos", 0))
+    except (TypeError, ValueError):
+        raise ValueError(f"{name}.passos invalido")
+    return Axis(
+        campo=str(raw.get("campo") or ""),
+        inicio=_to_float(raw.get("inicio"), f"{name}.inicio"),
+        fim=_to_float(raw.get("fim"), f"{name}.fim"),
+        passos=passos,
+    )
+
+
 @app.get("/")
 def index() -> str:
     return render_template("index.html")
@@ -305,15 +725,16 @@ def calculate() -> Any:
     except ValueError as exc:
         return _json_error(str(exc), 400)
 
-    result = calculate_all(
-        monthly_income=parsed["rendimento_mensal"],
-        annual_expenses=parsed["annual_expenses"],
-        pro_labore_monthly=parsed["pro_labore"],
-        iss_fixo=parsed["iss_fixo"],
-        salario_minimo=parsed["salario_minimo"] or DEFAULT_MIN_WAGE,
-    )
+    with metrics.stage("calculo"):
+        result = cached_calculate(
+            monthly_income=parsed["rendimento_mensal"],
+            annual_expenses=parsed["annual_expenses"],
+            pro_labore_monthly=parsed["pro_labore"],
+            iss_fixo=parsed["iss_fixo"],
+            salario_minimo=parsed["salario_minimo"] or DEFAULT_MIN_WAGE,
+        )
 
-    result["assumptions"] = {
+    assumptions = {
         "annual_expenses": parsed["annual_expenses"]["total"],
         "min_wage_used": parsed["salario_minimo"] or DEFAULT_MIN_WAGE,
         "presumed_profit_rate": 0.32,
@@ -321,9 +742,150 @@ def calculate() -> Any:
         "cofins_rate": 0.03,
     }
 
+    with metrics.stage("serializacao"):
+        try:
+            body = result.to_json({"assumptions": assumptions}, allow_nan=False)
+        except ValueError:
+            # entradas finitas mas enormes (ex.: 1e308) estouram para Infinity
+            return _json_error("Valores fora do intervalo numerico", 422)
+    return app.response_class(body, mimetype="application/json")
+
+
+@app.get("/calculate/cache")
+def calculate_cache_stats() -> Any:
+    if not _require_auth():
+        return _json_error("Nao autorizado", 401)
+    return jsonify(CALCULATION_CACHE.stats())
+
+
+@app.get("/metrics")
+def metrics_endpoint() -> Any:
+    if not metrics.ENABLED:
+        return _json_error("Metricas desligadas (METRICS_ENABLED)", 404)
+    return Response(metrics.REGISTRY.render(), content_type=metrics.CONTENT_TYPE)
+
+
+@app.post("/calculate/batch")
+def calculate_batch_route() -> Any:
+    if not _require_auth():
+        return _json_error("Nao autorizado", 401)
+
+    payload = _get_payload()
+    if payload is None:
+        return _json_error("Payload invalido", 400)
+    try:
+        parsed = _parse_batch_payload(payload)
+    except ValueError as exc:
+        return _json_error(str(exc), 400)
+
+    with metrics.stage("calculo"):
+        result = calculate_batch(
+            monthly_income=parsed["rendimento_mensal"],
+            annual_expenses=parsed["annual_expenses"],
+            pro_labore_monthly=parsed["pro_labore"],
+            iss_fixo=parsed["iss_fixo"],
+            salario_minimo=parsed["salario_minimo"],
+        )
+    if not all_finite(result):
+        return _json_error("Valores fora do intervalo numerico", 422)
+    result["count"] = len(parsed["rendimento_mensal"])
+    return jsonify(result)
+
+
+@app.post("/break-even")
+def break_even() -> Any:
+    if not _require_auth():
+        return _json_error("Nao autorizado", 401)
+
+    payload = _get_payload()
+    if payload is None:
+        return _json_error("Payload invalido", 400)
+    try:
+        parsed = _parse_calculation_payload(payload, require_income=False)
+    except ValueError as exc:
+        return _json_error(str(exc), 400)
+
+    from backend.solver import break_even_income
+
+    with metrics.stage("calculo"):
+        result = break_even_income(
+            annual_expenses=parsed["annual_expenses"],
+            pro_labore_monthly=parsed["pro_labore"],
+            iss_fixo=parsed["iss_fixo"],
+            salario_minimo=parsed["salario_minimo"] or DEFAULT_MIN_WAGE,
+        )
+    return jsonify(result)
+
+
+@app.post("/optimize/pro-labore")
+def optimize_pro_labore_route() -> Any:
+    if not _require_auth():
+        return _json_error("Nao autorizado", 401)
+
+    from backend.solver import (
+        DEFAULT_OPTIMIZATION_POINTS,
+        MAX_OPTIMIZATION_POINTS,
+        optimize_pro_labore,
+        validate_pro_labore_range,
+    )
+
+    payload = _get_payload()
+    if payload is None:
+        return _json_error("Payload invalido", 400)
+    try:
+        parsed = _parse_calculation_payload(payload)
+        min_pro_labore = payload.get("pro_labore_min")
+        max_pro_labore = payload.get("pro_labore_max")
+        if min_pro_labore is not None:
+            min_pro_labore = _to_float(min_pro_labore, "pro_labore_min")
+        if max_pro_labore is not None:
+            max_pro_labore = _to_float(max_pro_labore, "pro_labore_max")
+        validate_pro_labore_range(min_pro_labore, max_pro_labore)
+        points = int(_to_float(payload.get("pontos"), "pontos", default=DEFAULT_OPTIMIZATION_POINTS))
+    except ValueError as exc:
+        return _json_error(str(exc), 400)
+    if not 2 <= points <= MAX_OPTIMIZATION_POINTS:
+        return _json_error(f"pontos deve estar entre 2 e {MAX_OPTIMIZATION_POINTS}", 400)
+
+    with metrics.stage("calculo"):
+        result = optimize_pro_labore(
+            monthly_income=parsed["rendimento_mensal"],
+            annual_expenses=parsed["annual_expenses"],
+            iss_fixo=parsed["iss_fixo"],
+            salario_minimo=parsed["salario_minimo"] or DEFAULT_MIN_WAGE,
+            min_pro_labore=min_pro_labore,
+            max_pro_labore=max_pro_labore,
+            points=points,
+        )
     return jsonify(result)
 
 
+@app.post("/sensitivity")
+def sensitivity() -> Any:
+    if not _require_auth():
+        return _json_error("Nao autorizado", 401)
+
+    from backend.sensitivity import SCENARIO_FIELDS, sensitivity_json, sensitivity_ndjson, validate_axes
+
+    payload = _get_payload()
+    if payload is None:
+        return _json_error("Payload invalido", 400)
+    try:
+        x_axis = _parse_axis(payload.get("eixo_x"), "eixo_x")
+        y_axis = _parse_axis(payload.get("eixo_y"), "eixo_y")
+        validate_axes(x_axis, y_axis)
+        income_in_axes = "rendimento_mensal" in (x_axis.campo, y_axis.campo)
+        parsed = _parse_calculation_payload(payload, require_income=not income_in_axes)
+    except ValueError as exc:
+        return _json_error(str(exc), 400)
+
+    scenario = {name: parsed[name] for name in SCENARIO_FIELDS}
+    scenario["annual_expenses"] = parsed["annual_expenses"]
+    if payload.get("stream"):
+        return Response(sensitivity_ndjson(scenario, x_axis, y_axis), mimetype="application/x-ndjson")
+    return Response(sensitivity_json(scenario, x_axis, y_axis), mimetype="application/json")
+
+
 @app.post("/simulations")
 def save_simulation() -> Any:
     if not _require_auth():
@@ -344,20 +906,19 @@ def save_simulation() -> Any:
     if not nome_empresa:
         return _json_error("Nome da empresa obrigatório", 400)
 
-    result = calculate_all(
-        monthly_income=parsed["rendimento_mensal"],
-        annual_expenses=parsed["annual_expenses"],
-        pro_labore_monthly=parsed["pro_labore"],
-        iss_fixo=parsed["iss_fixo"],
-        salario_minimo=parsed["salario_minimo"] or DEFAULT_MIN_WAGE,
-    )
+    with metrics.stage("calculo"):
+        result = calculate_all(
+            monthly_income=parsed["rendimento_mensal"],
+            annual_expenses=parsed["annual_expenses"],
+            pro_labore_monthly=parsed["pro_labore"],
+            iss_fixo=parsed["iss_fixo"],
+            salario_minimo=parsed["salario_minimo"] or DEFAULT_MIN_WAGE,
+        )
 
-    now = datetime.now()
-    file_id = now.strftime("%Y-%m-%d_%H%M%S")
-    sim_id = f"{_slugify(nome_empresa)}/{file_id}"
+    sim_id, created = new_record_id(nome_empresa)
     record = {
         "id": sim_id,
-        "created_at": now.isoformat(),
+        "created_at": created.isoformat(),
         "nome_cliente": (parsed.get("nome_cliente") or "").strip(),
         "nome_empresa": nome_empresa,
         "input": {
@@ -375,6 +936,7 @@ def save_simulation() -> Any:
             "salario_minimo": parsed.get("salario_minimo"),
         },
         "output": result,
+        "rules_version": get_rules_version(),
     }
     _save_record(record)
     return jsonify({"id": record["id"]})
@@ -388,18 +950,53 @@ def list_simulations() -> Any:
     if kv_guard:
         return kv_guard
 
-    records = []
-    for payload in _load_records():
-        records.append(
-            {
-                "id": payload.get("id"),
-                "created_at": payload.get("created_at"),
-                "nome_cliente": payload.get("nome_cliente"),
-                "nome_empresa": payload.get("nome_empresa"),
-            }
-        )
-    records.sort(key=lambda item: item.get("created_at", ""), reverse=True)
-    return jsonify(records)
+    try:
+        limit, offset, before = _parse_page_args()
+    except ValueError as exc:
+        return _json_error(str(exc), 400)
+    etag = _storage_etag()
+    not_modified = _not_modified(etag)
+    if not_modified:
+        return not_modified
+
+    summaries = _list_summaries(
+        request.args.get("empresa"), request.args.get("cliente"), limit=limit, offset=offset, before=before
+    )
+    records = [
+        {
+            "id": summary.get("id"),
+            "created_at": summary.get("created_at"),
+            "nome_cliente": summary.get("nome_cliente"),
+            "nome_empresa": summary.get("nome_empresa"),
+        }
+        for summary in summaries
+    ]
+    return _tag_response(_paged_response(records, summaries, limit), etag)
+
+
+@app.get("/simulations/search")
+def search_simulations() -> Any:
+    if not _require_auth():
+        return _json_error("Nao autorizado", 401)
+    kv_guard = _require_kv_if_vercel()
+    if kv_guard:
+        return kv_guard
+
+    from backend.search import parse_ranges
+
+    try:
+        limit, offset, _ = _parse_page_args()
+        ranges = parse_ranges(request.args)
+    except ValueError as exc:
+        return _json_error(str(exc), 400)
+    etag = _storage_etag()
+    not_modified = _not_modified(etag)
+    if not_modified:
+        return not_modified
+
+    fuzzy = (request.args.get("fuzzy") or "").lower() in ("1", "true", "yes", "on")
+    total, summaries = _search_summaries(request.args.get("q"), fuzzy, ranges, limit or 50, offset)
+    return _tag_response(jsonify({"total": total, "items": summaries}), etag)
 
 
 @app.get("/simulations/<path:sim_id>")
@@ -426,10 +1023,8 @@ def delete_simulation(sim_id: str) -> Any:
         return kv_guard
 
     safe_id = sim_id.replace("..", "").strip("/")
-    payload = _get_record(safe_id)
-    if not payload:
+    if not _delete_record(safe_id):
         return _json_error("Simulacao nao encontrada", 404)
-    _delete_record(safe_id)
     return jsonify({"status": "deleted"})
 
 
@@ -441,35 +1036,81 @@ def analysis() -> Any:
     if kv_guard:
         return kv_guard
 
-    rows: list[dict[str, Any]] = []
-    for payload in _load_records():
-        output = payload.get("output", {})
-        pf = output.get("pf", {})
-        pj = output.get("pj", {})
-        comparativo = output.get("comparativo", {})
-        rows.append(
-            {
-                "created_at": payload.get("created_at"),
-                "nome_empresa": payload.get("nome_empresa"),
-                "nome_cliente": payload.get("nome_cliente"),
-                "rendimento_anual": pf.get("rendimento_anual"),
-                "total_tributos_pf": pf.get("total_tributos"),
-                "total_impostos_pj": pj.get("total_impostos"),
-                "impacto_pf": pj.get("impacto_pf"),
-                "aliquota_pf": pf.get("aliquota_efetiva"),
-                "aliquota_pj_final": pj.get("aliquota_efetiva_final"),
-                "economia_tributaria": comparativo.get("economia_tributaria"),
-            }
-        )
-    rows.sort(key=lambda item: item.get("created_at", ""), reverse=True)
-    return jsonify(rows)
+    try:
+        limit, offset, before = _parse_page_args()
+    except ValueError as exc:
+        return _json_error(str(exc), 400)
+    etag = _storage_etag()
+    not_modified = _not_modified(etag)
+    if not_modified:
+        return not_modified
+
+    summaries = _list_summaries(
+        request.args.get("empresa"), request.args.get("cliente"), limit=limit, offset=offset, before=before
+    )
+    rows = [{key: value for key, value in summary.items() if key != "id"} for summary in summaries]
+    return _tag_response(_paged_response(rows, summaries, limit), etag)
+
+
+@app.get("/analysis/summary")
+def analysis_summary() -> Any:
+    if not _require_auth():
+        return _json_error("Nao autorizado", 401)
+    kv_guard = _require_kv_if_vercel()
+    if kv_guard:
+        return kv_guard
+    etag = _storage_etag()
+    not_modified = _not_modified(etag)
+    if not_modified:
+        return not_modified
+
+    return _tag_response(jsonify(_analysis_aggregates()), etag)
+
+
+@app.get("/export/analysis")
+def export_analysis_route() -> Any:
+    if not _require_auth():
+        return _json_error("Nao autorizado", 401)
+    kv_guard = _require_kv_if_vercel()
+    if kv_guard:
+        return kv_guard
+
+    try:
+        export_format, filters = _parse_export_args()
+    except ValueError as exc:
+        return _json_error(str(exc), 400)
+    from backend.export import export_analysis
+
+    return _export_response(export_analysis(_list_summaries, export_format, **filters), export_format, "analise")
+
+
+@app.get("/export/simulations")
+def export_simulations_route() -> Any:
+    if not _require_auth():
+        return _json_error("Nao autorizado", 401)
+    kv_guard = _require_kv_if_vercel()
+    if kv_guard:
+        return kv_guard
+
+    try:
+        export_format, filters = _parse_export_args()
+    except ValueError as exc:
+        return _json_error(str(exc), 400)
+    from backend.export import export_simulations
+
+    chunks = export_simulations(_list_summaries, _get_records, export_format, **filters)
+    return _export_response(chunks, export_format, "simulacoes")
 
 
 @app.get("/config")
 def get_config() -> Any:
     if not _require_auth():
         return _json_error("Nao autorizado", 401)
-    return jsonify(get_rules())
+    etag = get_rules_version()
+    not_modified = _not_modified(etag)
+    if not_modified:
+        return not_modified
+    return _tag_response(jsonify(get_rules()), etag)
 
 
 @app.put("/config")
@@ -499,14 +1140,106 @@ def config_slash() -> Any:
     return get_config()
 
 
+@app.cli.command("backfill-summaries")
+def backfill_summaries_command() -> None:
+    """Gera os resumos compactos das simulacoes gravadas antes deles existirem."""
+    if not _storage_use_kv():
+        FILE_STORAGE.rebuild()
+        total = len(FILE_STORAGE.list_summaries())
+        click.echo(f"{total} resumos no catalogo {FILE_STORAGE.catalog_path}")
+        return
+
+    total = backfilled = 0
+    while True:
+        ids = _kv_client().command("ZRANGE", "sim:index", total, total + KV_SCAN_CHUNK - 1) or []
+        if ids:
+            raw_items = _kv_client().command("HMGET", KV_SUMMARIES_KEY, *ids) or []
+            missing = [sim_id for sim_id, raw in zip(ids, raw_items) if not raw]
+            if missing:
+                backfilled += len(_kv_backfill_summaries(missing))
+        total += len(ids)
+        if len(ids) < KV_SCAN_CHUNK:
+            break
+    click.echo(f"{backfilled} resumos gerados para {total} simulacoes no KV")
+
+
+@app.cli.command("bulk-import")
+@click.argument("arquivo", type=click.Path(exists=True, dir_okay=False, path_type=Path))
+@click.option("--planilha", help="Nome da aba no XLSX (padrao: a primeira).")
+@click.option(
+    "--lote",
+    type=int,
+    default=lambda: import_module("backend.bulk").DEFAULT_BATCH_SIZE,
+    show_default="DEFAULT_BATCH_SIZE de backend.bulk",
+    help="Linhas calculadas/gravadas por vez.",
+)
+@click.option("--validar", is_flag=True, help="Apenas valida e calcula, sem gravar.")
+def bulk_import_command(arquivo: Path, planilha: Optional[str], lote: int, validar: bool) -> None:
+    """Importa simulacoes de um CSV ou XLSX para o armazenamento configurado."""
+    from backend.bulk import import_payloads, iter_payloads, print_report
+
+    payloads = iter_payloads(arquivo, planilha)
+    if validar:
+        report = import_payloads(payloads, None, max(lote, 1))
+    else:
+        with FILE_STORAGE.deferred_catalog():
+            report = import_payloads(payloads, _save_records, max(lote, 1))
+    print_report(report)
+    if report.erros:
+        raise SystemExit(1)
+
+
+@app.cli.command("recompute")
+@click.option(
+    "--limite",
+    type=float,
+    default=lambda: import_module("backend.recompute").DEFAULT_THRESHOLD,
+    show_default="DEFAULT_THRESHOLD de backend.recompute",
+    help="Variacao minima da economia (R$).",
+)
+@click.option(
+    "--lote",
+    type=int,
+    default=lambda: import_module("backend.recompute").DEFAULT_BATCH_SIZE,
+    show_default="DEFAULT_BATCH_SIZE de backend.recompute",
+    help="Simulacoes por lote.",
+)
+@click.option("--processos", default=os.cpu_count() or 1, show_default=True, help="Processos de calculo.")
+@click.option("--relatorio", type=click.Path(dir_okay=False, path_type=Path), help="Arquivo NDJSON do relatorio.")
+@click.option("--forcar", is_flag=True, help="Recalcula tambem os registros ja na versao atual.")
+@click.option("--simular", is_flag=True, help="Gera o relatorio sem regravar as simulacoes.")
+def recompute_command(
+    limite: float, lote: int, processos: int, relatorio: Optional[Path], forcar: bool, simular: bool
+) -> None:
+    """Recalcula as simulacoes gravadas com as regras tributarias vigentes."""
+    from backend.recompute import print_report as print_recompute_report
+    from backend.recompute import recompute_archive
+
+    report_path = relatorio or Path(f"recalculo_{get_rules_version()}.ndjson")
+    with report_path.open("w", encoding="utf-8") as stream, FILE_STORAGE.deferred_catalog():
+        report = recompute_archive(
+            _list_summaries,
+            _get_records,
+            None if simular else (lambda records: _save_records(records, replace=True)),
+            threshold=limite,
+            batch_size=max(lote, 1),
+            processes=max(processos, 1),
+            force=forcar,
+            report_stream=stream,
+        )
+    print_recompute_report(report)
+    click.echo(f"relatorio: {report_path}")
+    if report.erros:
+        raise SystemExit(1)
+
+
 @app.get("/kv-health")
 def kv_health() -> Any:
     config = _kv_config()
     if not config:
         return _json_error("KV nao configurado", 500)
     try:
-        _kv_set("kv:health", "ok")
-        value = _kv_get("kv:health")
+        _, value = _kv_client().pipeline([["SET", "kv:health", "ok"], ["GET", "kv:health"]])
         return jsonify({"status": "ok", "value": value})
     except Exception as exc:
         return _json_error(f"KV erro: {exc}", 500)
@@ -0,0 +1,172 @@
+"""Agregados da analise mantidos incrementalmente a cada gravacao/exclusao.
+
+Os agregados sao calculados a partir dos resumos de ``storage.summarize_record``
+e agrupados em: total geral, por empresa e por faixa de rendimento anual.
+Somas e contagens sao atualizadas em O(1); minimo/maximo da economia so
+precisam ser recalculados quando o registro removido era o extremo do grupo.
+"""
+
+from __future__ import annotations
+
+from bisect import bisect_right
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+# Limites inferiores das faixas de rendimento anual.
+INCOME_BANDS = (0.0, 120_000.0, 360_000.0, 720_000.0, 1_200_000.0, 2_400_000.0, 4_800_000.0)
+
+TOTAL_GROUP = "total"
+
+_SUM_FIELDS = {
+    "economia_soma": "economia_tributaria",
+    "rendimento_soma": "rendimento_anual",
+    "aliquota_pf_soma": "aliquota_pf",
+    "aliquota_pj_soma": "aliquota_pj_final",
+}
+
+
+def _empty_stats() -> Dict[str, Any]:
+    stats: Dict[str, Any] = {"count": 0, "pj_vantajosa": 0, "economia_min": None, "economia_max": None}
+    stats.update({name: 0.0 for name in _SUM_FIELDS})
+    return stats
+
+
+def company_key(summary: Dict[str, Any]) -> str:
+    sim_id = summary.get("id") or ""
+    slug = sim_id.split("/", 1)[0] if "/" in sim_id else (summary.get("nome_empresa") or "")
+    return f"empresa:{slug}"
+
+
+def band_index(rendimento_anual: Optional[float]) -> int:
+    return max(bisect_right(INCOME_BANDS, rendimento_anual or 0.0) - 1, 0)
+
+
+def groups_for(summary: Dict[str, Any]) -> List[str]:
+    return [TOTAL_GROUP, company_key(summary), f"faixa:{band_index(summary.get('rendimento_anual'))}"]
+
+
+class Aggregates:
+    """Estatisticas por grupo, serializaveis em JSON (``to_dict``/``from_dict``)."""
+
+    def __init__(self, groups: Optional[Dict[str, Dict[str, Any]]] = None) -> None:
+        self.groups: Dict[str, Dict[str, Any]] = groups or {}
+        self.names: Dict[str, str] = {}
+
+    @classmethod
+    def from_summaries(cls, summaries: Iterable[Dict[str, Any]]) -> "Aggregates":
+        aggregates = cls()
+        for summary in summaries:
+            aggregates.add(summary)
+        return aggregates
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Aggregates":
+        aggregates = cls(data.get("groups") or {})
+        aggregates.names = data.get("names") or {}
+        return aggregates
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"groups": self.groups, "names": self.names}
+
+    @property
+    def count(self) -> int:
+        return self.groups.get(TOTAL_GROUP, {}).get("count", 0)
+
+    def add(self, summary: Dict[str, Any]) -> None:
+        economia = summary.get("economia_tributaria")
+        key = company_key(summary)
+        if summary.get("nome_empresa"):
+            self.names[key] = summary["nome_empresa"]
+        for group in groups_for(summary):
+            stats = self.groups.setdefault(group, _empty_stats())
+            stats["count"] += 1
+            for name, field in _SUM_FIELDS.items():
+                stats[name] += summary.get(field) or 0.0
+            if economia is None:
+                continue
+            if economia > 0:
+                stats["pj_vantajosa"] += 1
+            if stats["economia_min"] is None or economia < stats["economia_min"]:
+                stats["economia_min"] = economia
+            if stats["economia_max"] is None or economia > stats["economia_max"]:
+                stats["economia_max"] = economia
+
+    def remove(self, summary: Dict[str, Any]) -> Set[str]:
+        """Remove o resumo e devolve os grupos cujo minimo/maximo precisa ser recalculado."""
+        economia = summary.get("economia_tributaria")
+        stale: Set[str] = set()
+        for group in groups_for(summary):
+            stats = self.groups.get(group)
+            if not stats:
+                continue
+            stats["count"] -= 1
+            if stats["count"] <= 0:
+                del self.groups[group]
+                self.names.pop(group, None)
+                continue
+            for name, field in _SUM_FIELDS.items():
+                stats[name] -= summary.get(field) or 0.0
+            if economia is None:
+                continue
+            if economia > 0:
+                stats["pj_vantajosa"] -= 1
+            if economia in (stats["economia_min"], stats["economia_max"]):
+                stale.add(group)
+        return stale
+
+    def refresh_extremes(self, groups: Set[str], summaries: Iterable[Dict[str, Any]]) -> None:
+        """Recalcula minimo/maximo dos ``groups`` a partir dos resumos atuais."""
+        for group in groups:
+            if group in self.groups:
+                self.groups[group]["economia_min"] = None
+                self.groups[group]["economia_max"] = None
+        for summary in summaries:
+            economia = summary.get("economia_tributaria")
+            if economia is None:
+                continue
+            for group in groups.intersection(groups_for(summary)):
+                stats = self.groups.get(group)
+                if stats is None:
+                    continue
+                if stats["economia_min"] is None or economia < stats["economia_min"]:
+                    stats["economia_min"] = economia
+                if stats["economia_max"] is None or economia > stats["economia_max"]:
+                    stats["economia_max"] = economia
+
+    def report(self) -> Dict[str, Any]:
+        """Resumo para dashboards: total, por empresa e distribuicao por faixa."""
+        empresas = []
+        faixas = []
+        for group, stats in self.groups.items():
+            if group.startswith("empresa:"):
+                item = _describe(stats)
+                item["empresa"] = self.names.get(group, group.split(":", 1)[1])
+                empresas.append(item)
+        for index, lower in enumerate(INCOME_BANDS):
+            stats = self.groups.get(f"faixa:{index}")
+            if not stats:
+                continue
+            item = _describe(stats)
+            item["rendimento_min"] = lower
+            item["rendimento_max"] = INCOME_BANDS[index + 1] if index + 1 < len(INCOME_BANDS) else None
+            faixas.append(item)
+        empresas.sort(key=lambda item: item["empresa"].casefold())
+        return {
+            "total": _describe(self.groups.get(TOTAL_GROUP) or _empty_stats()),
+            "empresas": empresas,
+            "faixas": faixas,
+        }
+
+
+def _describe(stats: Dict[str, Any]) -> Dict[str, Any]:
+    count = stats["count"]
+    return {
+        "quantidade": count,
+        "pj_vantajosa": stats["pj_vantajosa"],
+        "economia_total": stats["economia_soma"],
+        "economia_media": stats["economia_soma"] / count if count else None,
+        "economia_min": stats["economia_min"],
+        "economia_max": stats["economia_max"],
+        "rendimento_medio": stats["rendimento_soma"] / count if count else None,
+        "aliquota_pf_media": stats["aliquota_pf_soma"] / count if count else None,
+        "aliquota_pj_media": stats["aliquota_pj_soma"] / count if count else None,
+    }
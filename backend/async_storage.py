@@ -0,0 +1,167 @@
+"""Acesso assincrono ao armazenamento para as rotas ``async`` do FastAPI.
+
+``AsyncStorage`` envolve qualquer ``storage.Storage`` e executa as chamadas
+bloqueantes (leitura e escrita de arquivos, SQLite) num pool de threads
+proprio, fora do threadpool das rotas sincronas: o laco de eventos continua
+livre e centenas de requisicoes podem esperar I/O ao mesmo tempo num unico
+worker. O tamanho do pool vem de ``STORAGE_IO_THREADS``.
+
+Leituras identicas em andamento sao compartilhadas (``list_summaries``,
+``search``, ``generation``, ``aggregates``): quem chega enquanto a mesma leitura ja esta
+rodando aguarda o mesmo resultado em vez de ocupar outra thread. Uma leitura
+so e reaproveitada se nenhuma gravacao terminou desde que ela comecou.
+``get_many`` divide os ids em blocos lidos em paralelo.
+
+Com um ``writer.WriteBehind``, ``save`` so enfileira o registro; as leituras
+esperam a fila ser gravada antes de consultar o armazenamento (``get`` de um
+registro ainda na fila o devolve direto). A espera tem prazo
+(``writer.FLUSH_TIMEOUT``); se ele passa, a leitura levanta
+``writer.WriteTimeout``.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Mapping, Optional, Tuple
+
+from .storage import Cursor, Storage
+from .writer import FLUSH_TIMEOUT, WriteBehind, WriteTimeout
+
+FANOUT_CHUNK = 64
+
+_EXECUTOR: Optional[ThreadPoolExecutor] = None
+_EXECUTOR_LOCK = threading.Lock()
+
+
+def io_executor() -> ThreadPoolExecutor:
+    """Pool de threads compartilhado para o I/O do armazenamento."""
+    global _EXECUTOR
+    if _EXECUTOR is None:
+        with _EXECUTOR_LOCK:
+            if _EXECUTOR is None:
+                workers = int(os.getenv("STORAGE_IO_THREADS") or 0) or None
+                _EXECUTOR = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="calctribut-io")
+    return _EXECUTOR
+
+
+async def run_io(func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    """Executa ``func`` no pool de I/O, preservando o contexto (metricas da requisicao)."""
+    context = contextvars.copy_context()
+    call = partial(context.run, func, *args, **kwargs)
+    return await asyncio.get_running_loop().run_in_executor(io_executor(), call)
+
+
+class AsyncStorage:
+    """Versao ``async`` dos metodos de ``Storage`` sobre ``storage``."""
+
+    def __init__(self, storage: Storage, writer: Optional[WriteBehind] = None) -> None:
+        self.storage = storage
+        self.writer = writer
+        # gravacoes concluidas por este processo; separa leituras anteriores
+        self._writes = 0
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+
+    async def flushed(self) -> None:
+        """Espera a fila de gravacao (se houver algo pendente), no maximo ``FLUSH_TIMEOUT``."""
+        if self.writer is not None and self.writer.busy:
+            if not await run_io(self.writer.wait, FLUSH_TIMEOUT):
+                raise WriteTimeout("fila de gravacao atrasada")
+
+    async def close(self) -> None:
+        """Grava o que estiver na fila e encerra a thread escritora."""
+        if self.writer is not None:
+            await run_io(self.writer.close)
+
+    async def _write(self, func: Callable[..., Any], *args: Any) -> Any:
+        try:
+            return await run_io(func, *args)
+        finally:
+            self._writes += 1
+
+    async def _shared(self, key: Tuple[Any, ...], func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        await self.flushed()
+        written = self.writer.written if self.writer is not None else 0
+        key = (self._writes, written, *key)
+        future = self._inflight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(run_io(func, *args, **kwargs))
+            self._inflight[key] = future
+            future.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # shield: um cliente que desiste nao cancela a leitura dos demais
+        return await asyncio.shield(future)
+
+    async def save(self, record: Dict[str, Any]) -> None:
+        if self.writer is not None:
+            self.writer.submit(record)
+            return
+        await self._write(self.storage.save, record)
+
+    async def save_many(self, records: Iterable[Dict[str, Any]]) -> int:
+        return await self._write(self.storage.save_many, list(records))
+
+    async def delete(self, sim_id: str) -> bool:
+        await self.flushed()
+        return await self._write(self.storage.delete, sim_id)
+
+    async def get(self, sim_id: str) -> Optional[Dict[str, Any]]:
+        if self.writer is not None:
+            record = self.writer.pending(sim_id)
+            if record is not None:
+                return record
+        return await run_io(self.storage.get, sim_id)
+
+    async def get_many(self, sim_ids: List[str]) -> List[Optional[Dict[str, Any]]]:
+        """Registros na ordem de ``sim_ids``, lidos em blocos concorrentes."""
+        await self.flushed()
+        if len(sim_ids) <= FANOUT_CHUNK:
+            return await run_io(self.storage.get_many, sim_ids)
+        chunks = await asyncio.gather(
+            *(
+                run_io(self.storage.get_many, sim_ids[start : start + FANOUT_CHUNK])
+                for start in range(0, len(sim_ids), FANOUT_CHUNK)
+            )
+        )
+        return [record for chunk in chunks for record in chunk]
+
+    async def list_summaries(
+        self,
+        empresa: Optional[str] = None,
+        cliente: Optional[str] = None,
+        reverse: bool = True,
+        limit: Optional[int] = None,
+        offset: int = 0,
+        before: Optional[Cursor] = None,
+    ) -> List[Dict[str, Any]]:
+        key = ("list_summaries", empresa, cliente, reverse, limit, offset, before)
+        return await self._shared(
+            key,
+            self.storage.list_summaries,
+            empresa=empresa,
+            cliente=cliente,
+            reverse=reverse,
+            limit=limit,
+            offset=offset,
+            before=before,
+        )
+
+    async def search(
+        self,
+        text: Optional[str] = None,
+        fuzzy: bool = False,
+        ranges: Optional[Mapping[str, Tuple[Optional[float], Optional[float]]]] = None,
+        limit: Optional[int] = None,
+        offset: int = 0,
+    ) -> Tuple[int, List[Dict[str, Any]]]:
+        key = ("search", text, fuzzy, tuple(sorted((ranges or {}).items())), limit, offset)
+        return await self._shared(key, self.storage.search, text, fuzzy, ranges, limit, offset)
+
+    async def generation(self) -> str:
+        return await self._shared(("generation",), self.storage.generation)
+
+    async def aggregates(self) -> Dict[str, Any]:
+        return await self._shared(("aggregates",), self.storage.aggregates)
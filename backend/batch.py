@@ -0,0 +1,278 @@
+"""Motor de calculo em lote (colunar) para PF x PJ.
+
+Reproduz exatamente as formulas de ``calculations.py``, mas opera sobre
+colunas inteiras de entrada: as regras sao lidas uma unica vez e cada campo
+de ``PFResult``/``PJResult`` e calculado como uma lista, sem criar dataclasses
+nem chamar ``asdict`` por linha.
+"""
+
+from __future__ import annotations
+
+from math import isfinite
+from typing import Dict, List, Mapping, Optional, Sequence
+
+from .constants import DEFAULT_MIN_WAGE, get_rules
+
+EXPENSE_FIELDS = ("secretaria", "aluguel_condominio", "contador", "outras_despesas")
+
+Columns = Dict[str, List[float]]
+
+
+def _column(values: Optional[Sequence[float]], size: int) -> List[float]:
+    if values is None:
+        return [0.0] * size
+    column = list(map(float, values))
+    if len(column) != size:
+        raise ValueError("todas as colunas devem ter o mesmo tamanho")
+    return column
+
+
+def _expense_totals(annual_expenses: Mapping[str, Sequence[float]], size: int) -> List[float]:
+    secretaria, aluguel, contador, outras = (
+        _column(annual_expenses.get(name), size) for name in EXPENSE_FIELDS
+    )
+    return [s + a + c + o for s, a, c, o in zip(secretaria, aluguel, contador, outras)]
+
+
+def calculate_batch(
+    monthly_income: Sequence[float],
+    annual_expenses: Mapping[str, Sequence[float]],
+    pro_labore_monthly: Optional[Sequence[float]] = None,
+    iss_fixo: Optional[Sequence[float]] = None,
+    salario_minimo: Optional[Sequence[float]] = None,
+    rules: Optional[Mapping] = None,
+) -> Dict[str, Columns]:
+    """Equivalente colunar de ``calculate_all``.
+
+    ``annual_expenses`` recebe uma coluna por despesa (as mesmas chaves de
+    ``calculate_all``); ``total`` e calculado quando nao informado. Retorna
+    ``{"pf": {...}, "pj": {...}, "comparativo": {...}}`` com uma lista por campo.
+    """
+    rules = rules if rules is not None else get_rules()
+    pf_rules = rules["pf"]
+    pj_rules = rules["pj"]
+
+    income = list(map(float, monthly_income))
+    size = len(income)
+    secretaria = _column(annual_expenses.get("secretaria"), size)
+    if annual_expenses.get("total") is not None:
+        expenses_total = _column(annual_expenses["total"], size)
+    else:
+        expenses_total = _expense_totals(annual_expenses, size)
+    pro_labore = _column(pro_labore_monthly, size)
+    iss = _column(iss_fixo, size)
+    min_wage = [value or DEFAULT_MIN_WAGE for value in _column(salario_minimo, size)]
+
+    annual_income = [value * 12 for value in income]
+
+    # Pessoa Fisica
+    inss_pf_rate = pf_rules["inss_pf_rate"]
+    irpf_flat = pf_rules["irpf_flat"]
+    pf_inss = [(sm * inss_pf_rate) + (sec * inss_pf_rate) for sm, sec in zip(min_wage, secretaria)]
+    pf_total_despesas = [e + i + s for e, i, s in zip(expenses_total, pf_inss, iss)]
+    pf_renda_liquida = [a - d for a, d in zip(annual_income, pf_total_despesas)]
+    pf_irpf = [r * irpf_flat for r in pf_renda_liquida]
+    pf_total_tributos = [ir + s + i for ir, s, i in zip(pf_irpf, iss, pf_inss)]
+    pf_aliquota = [(t / a) if a > 0 else 0.0 for t, a in zip(pf_total_tributos, annual_income)]
+    pf_receita_liquida = [r - t for r, t in zip(pf_renda_liquida, pf_total_tributos)]
+
+    # Pessoa Juridica
+    presumed_rate = pj_rules["presumed_profit_rate"]
+    irpj_rate = pj_rules["irpj_rate"]
+    threshold = pj_rules["irpj_additional_threshold"]
+    additional_rate = pj_rules["irpj_additional_rate"]
+    csll_rate = pj_rules["csll_rate"]
+    pis_rate = pj_rules["pis_rate"]
+    cofins_rate = pj_rules["cofins_rate"]
+    cbs_rate = pj_rules["cbs_rate"] if pj_rules.get("cbs_enabled") else None
+    ibs_rate = pj_rules["ibs_rate"] if pj_rules.get("ibs_enabled") else None
+    folha_rate = pj_rules["inss_folha_rate"]
+    prolabore_inss_rate = pf_rules["prolabore_inss_rate"]
+
+    base_presumida = [a * presumed_rate for a in annual_income]
+    irpj = [b * irpj_rate for b in base_presumida]
+    irpj_adicional = [max(b - threshold, 0.0) * additional_rate for b in base_presumida]
+    irpj_total = [i + ad for i, ad in zip(irpj, irpj_adicional)]
+    csll = [b * csll_rate for b in base_presumida]
+    irpj_csll = [t + c for t, c in zip(irpj_total, csll)]
+    pis = [a * pis_rate for a in annual_income]
+    cofins = [a * cofins_rate for a in annual_income]
+    cbs = [a * cbs_rate for a in annual_income] if cbs_rate is not None else [0.0] * size
+    ibs = [a * ibs_rate for a in annual_income] if ibs_rate is not None else [0.0] * size
+    inss_folha = [(sec + folha_rate) * folha_rate for sec in secretaria]
+    total_impostos = [
+        ic + p + co + cb + ib + s + f
+        for ic, p, co, cb, ib, s, f in zip(irpj_csll, pis, cofins, cbs, ibs, iss, inss_folha)
+    ]
+    pro_labore_anual = [p * 12 for p in pro_labore]
+    pj_total_despesas = [e + p for e, p in zip(expenses_total, pro_labore_anual)]
+    if pj_rules.get("double_expense_in_pj"):
+        lucro_liquido = [
+            a - t - (2 * d) for a, t, d in zip(annual_income, total_impostos, pj_total_despesas)
+        ]
+    else:
+        lucro_liquido = [a - t - d for a, t, d in zip(annual_income, total_impostos, pj_total_despesas)]
+    dividendos = lucro_liquido
+    irpf_m_percent = [(d / 60000.0) - 10.0 for d in dividendos]
+    impacto_pf = [d * (m / 100.0) for d, m in zip(dividendos, irpf_m_percent)]
+    pro_labore_liquido = [p - (p * prolabore_inss_rate) for p in pro_labore_anual]
+    pj_aliquota = [
+        ((t + i) / a) if a > 0 else 0.0 for t, i, a in zip(total_impostos, impacto_pf, annual_income)
+    ]
+
+    economia = [t - (i + p) for t, i, p in zip(pf_total_tributos, total_impostos, impacto_pf)]
+
+    return {
+        "pf": {
+            "rendimento_anual": annual_income,
+            "inss": pf_inss,
+            "irpf": pf_irpf,
+            "iss": list(iss),
+            "total_tributos": pf_total_tributos,
+            "aliquota_efetiva": pf_aliquota,
+            "receita_liquida": pf_receita_liquida,
+            "renda_liquida": pf_renda_liquida,
+            "total_despesas": pf_total_despesas,
+        },
+        "pj": {
+            "base_presumida": base_presumida,
+            "irpj": irpj,
+            "irpj_adicional": irpj_adicional,
+            "irpj_total": irpj_total,
+            "csll": csll,
+            "irpj_csll": irpj_csll,
+            "pis": pis,
+            "cofins": cofins,
+            "cbs": cbs,
+            "ibs": ibs,
+            "iss": list(iss),
+            "inss_folha": inss_folha,
+            "total_impostos": total_impostos,
+            "lucro_liquido": lucro_liquido,
+            "dividendos": list(dividendos),
+            "irpf_m_percent": irpf_m_percent,
+            "impacto_pf": impacto_pf,
+            "aliquota_efetiva_final": pj_aliquota,
+            "pro_labore_liquido": pro_labore_liquido,
+        },
+        "comparativo": {
+            "economia_tributaria": economia,
+            "aliquota_pf": pf_aliquota,
+            "aliquota_pj_final": pj_aliquota,
+            "receita_liquida_pf": pf_receita_liquida,
+            "lucro_liquido_pj": lucro_liquido,
+        },
+    }
+
+
+def batch_row(result: Mapping[str, Columns], index: int) -> Dict[str, Dict[str, float]]:
+    """Extrai a linha ``index`` de um resultado colunar no formato de ``calculate_all``."""
+    return {
+        section: {name: values[index] for name, values in columns.items()}
+        for section, columns in result.items()
+    }
+
+
+def all_finite(result: Mapping[str, Columns]) -> bool:
+    """Se nenhuma coluna do resultado tem ``NaN``/``Infinity`` (entradas enormes estouram)."""
+    return all(all(map(isfinite, values)) for columns in result.values() for values in columns.values())
+
+
+def batch_rows(result: Mapping[str, Columns]) -> List[Dict[str, Dict[str, float]]]:
+    """Todas as linhas de um resultado colunar (equivale a ``batch_row`` para cada indice)."""
+    names = list(result)
+    sections = [
+        [dict(zip(list(columns), values)) for values in zip(*columns.values())]
+        for columns in result.values()
+    ]
+    return [dict(zip(names, row)) for row in zip(*sections)]
+
+
+def calculate_comparativo_batch(
+    monthly_income: Sequence[float],
+    annual_expenses: Mapping[str, Sequence[float]],
+    pro_labore_monthly: Optional[Sequence[float]] = None,
+    iss_fixo: Optional[Sequence[float]] = None,
+    salario_minimo: Optional[Sequence[float]] = None,
+    rules: Optional[Mapping] = None,
+) -> Columns:
+    """Versao enxuta de ``calculate_batch`` que devolve so as aliquotas e a economia.
+
+    Calcula ``economia_tributaria``, ``aliquota_pf`` e ``aliquota_pj_final``
+    num unico laco, sem materializar as colunas intermediarias. A ordem das
+    operacoes e a mesma do calculo escalar, entao os valores sao identicos.
+    """
+    rules = rules if rules is not None else get_rules()
+    pf_rules = rules["pf"]
+    pj_rules = rules["pj"]
+
+    income = list(map(float, monthly_income))
+    size = len(income)
+    secretaria = _column(annual_expenses.get("secretaria"), size)
+    if annual_expenses.get("total") is not None:
+        expenses_total = _column(annual_expenses["total"], size)
+    else:
+        expenses_total = _expense_totals(annual_expenses, size)
+    pro_labore = _column(pro_labore_monthly, size)
+    iss = _column(iss_fixo, size)
+    min_wage = _column(salario_minimo, size)
+
+    inss_pf_rate = pf_rules["inss_pf_rate"]
+    irpf_flat = pf_rules["irpf_flat"]
+    presumed_rate = pj_rules["presumed_profit_rate"]
+    irpj_rate = pj_rules["irpj_rate"]
+    threshold = pj_rules["irpj_additional_threshold"]
+    additional_rate = pj_rules["irpj_additional_rate"]
+    csll_rate = pj_rules["csll_rate"]
+    pis_rate = pj_rules["pis_rate"]
+    cofins_rate = pj_rules["cofins_rate"]
+    cbs_rate = pj_rules["cbs_rate"] if pj_rules.get("cbs_enabled") else 0.0
+    ibs_rate = pj_rules["ibs_rate"] if pj_rules.get("ibs_enabled") else 0.0
+    folha_rate = pj_rules["inss_folha_rate"]
+    double_expense = bool(pj_rules.get("double_expense_in_pj"))
+
+    economia: List[float] = []
+    aliquota_pf: List[float] = []
+    aliquota_pj: List[float] = []
+    add_economia = economia.append
+    add_aliquota_pf = aliquota_pf.append
+    add_aliquota_pj = aliquota_pj.append
+    for monthly, sec, expenses, pro, iss_value, wage in zip(
+        income, secretaria, expenses_total, pro_labore, iss, min_wage
+    ):
+        annual = monthly * 12
+        inss = ((wage or DEFAULT_MIN_WAGE) * inss_pf_rate) + (sec * inss_pf_rate)
+        pf_total = ((annual - (expenses + inss + iss_value)) * irpf_flat) + iss_value + inss
+
+        base = annual * presumed_rate
+        excess = base - threshold
+        irpj_total = (base * irpj_rate) + ((excess if excess > 0.0 else 0.0) * additional_rate)
+        total_impostos = (
+            (irpj_total + base * csll_rate)
+            + annual * pis_rate
+            + annual * cofins_rate
+            + annual * cbs_rate
+            + annual * ibs_rate
+            + iss_value
+            + (sec + folha_rate) * folha_rate
+        )
+        pj_expenses = expenses + pro * 12
+        if double_expense:
+            lucro = annual - total_impostos - (2 * pj_expenses)
+        else:
+            lucro = annual - total_impostos - pj_expenses
+        pj_total = total_impostos + lucro * (((lucro / 60000.0) - 10.0) / 100.0)
+
+        add_economia(pf_total - pj_total)
+        if annual > 0:
+            add_aliquota_pf(pf_total / annual)
+            add_aliquota_pj(pj_total / annual)
+        else:
+            add_aliquota_pf(0.0)
+            add_aliquota_pj(0.0)
+
+    return {
+        "economia_tributaria": economia,
+        "aliquota_pf": aliquota_pf,
+        "aliquota_pj_final": aliquota_pj,
+    }
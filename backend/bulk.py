@@ -0,0 +1,362 @@
+"""Importacao em massa de simulacoes a partir de CSV ou XLSX.
+
+    python -m backend.bulk clientes.csv --data-dir data/simulacoes
+
+A primeira linha nao vazia e o cabecalho, com os nomes dos campos da API
+(``nome_empresa``, ``rendimento_mensal``, ``secretaria``, ``pro_labore``...;
+maiusculas, acentos e prefixos ``input.``/``despesas_anuais.`` sao aceitos).
+Cada linha e validada com ``CalculationInput``, as validas sao calculadas em
+lotes com ``calculate_batch`` e gravadas com ``save_many``. Linhas invalidas
+sao reportadas sem interromper a importacao.
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import re
+import sys
+import time
+import unicodedata
+import zipfile
+from dataclasses import dataclass, field
+from functools import lru_cache
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+from xml.etree.ElementTree import fromstring, iterparse
+
+from .batch import EXPENSE_FIELDS, batch_rows, calculate_batch
+from .constants import RulesSnapshot, get_rules_snapshot
+from .storage import new_record_ids, open_storage, slugify
+
+if TYPE_CHECKING:
+    from pydantic import ValidationError
+
+    from .models import CalculationInput
+
+DEFAULT_BATCH_SIZE = 5000
+TEXT_FIELDS = ("nome_cliente", "nome_empresa")
+NUMBER_FIELDS = ("rendimento_mensal", "pro_labore", "iss_fixo", "salario_minimo")
+
+_HEADER_PREFIXES = ("input_", "despesas_anuais_")
+_XLSX_NS = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+_XLSX_REL = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}id"
+# ponto seguido de exatamente tres digitos (repetido) e separador de milhar: 20.000, 1.500.000
+_THOUSANDS = re.compile(r"[+-]?\d{1,3}(?:\.\d{3})+")
+
+Row = Tuple[int, List[Any]]
+SaveMany = Callable[[List[Dict[str, Any]]], Any]
+
+_slug = lru_cache(maxsize=4096)(slugify)
+
+
+@dataclass
+class ImportReport:
+    linhas: int = 0
+    importadas: int = 0
+    erros: List[Tuple[int, str]] = field(default_factory=list)
+    segundos: float = 0.0
+
+    @property
+    def linhas_por_segundo(self) -> float:
+        return self.linhas / self.segundos if self.segundos else 0.0
+
+
+# -- leitura -------------------------------------------------------------------
+
+
+def normalize_header(name: Any) -> str:
+    text = unicodedata.normalize("NFKD", str(name or "")).encode("ascii", "ignore").decode("ascii")
+    key = re.sub(r"[^a-z0-9]+", "_", text.lower()).strip("_")
+    while key.startswith(_HEADER_PREFIXES):
+        key = next(key[len(prefix):] for prefix in _HEADER_PREFIXES if key.startswith(prefix))
+    return key
+
+
+def iter_csv_rows(path: Path) -> Iterator[Row]:
+    with path.open(encoding="utf-8-sig", newline="") as handle:
+        sample = handle.read(4096)
+        handle.seek(0)
+        try:
+            dialect: Any = csv.Sniffer().sniff(sample, delimiters=",;\t")
+        except csv.Error:
+            dialect = csv.excel
+        reader = csv.reader(handle, dialect)
+        for values in reader:
+            yield reader.line_num, values
+
+
+def _xlsx_column(ref: str) -> int:
+    index = 0
+    for char in ref:
+        if not char.isalpha():
+            break
+        index = index * 26 + (ord(char.upper()) - 64)
+    return index - 1
+
+
+def _xlsx_shared_strings(archive: zipfile.ZipFile) -> List[str]:
+    if "xl/sharedStrings.xml" not in archive.namelist():
+        return []
+    strings = []
+    with archive.open("xl/sharedStrings.xml") as handle:
+        for _, elem in iterparse(handle):
+            if elem.tag == f"{_XLSX_NS}si":
+                strings.append("".join(node.text or "" for node in elem.iter(f"{_XLSX_NS}t")))
+                elem.clear()
+    return strings
+
+
+def _xlsx_sheet_path(archive: zipfile.ZipFile, sheet: Optional[str]) -> str:
+    workbook = fromstring(archive.read("xl/workbook.xml"))
+    rels = fromstring(archive.read("xl/_rels/workbook.xml.rels"))
+    targets = {rel.get("Id"): rel.get("Target") or "" for rel in rels}
+    for node in workbook.iter(f"{_XLSX_NS}sheet"):
+        if sheet is None or node.get("name") == sheet:
+            target = targets[node.get(_XLSX_REL)]
+            return target.lstrip("/") if target.startswith("/") else f"xl/{target}"
+    raise ValueError(f"planilha nao encontrada: {sheet}")
+
+
+def _xlsx_cell(cell: Any, strings: List[str]) -> Any:
+    kind = cell.get("t")
+    if kind == "inlineStr":
+        return "".join(node.text or "" for node in cell.iter(f"{_XLSX_NS}t"))
+    value = cell.find(f"{_XLSX_NS}v")
+    if value is None or value.text is None:
+        return None
+    if kind == "s":
+        return strings[int(value.text)]
+    if kind in ("str", "e"):
+        return value.text
+    if kind == "b":
+        return value.text == "1"
+    return float(value.text)
+
+
+def iter_xlsx_rows(path: Path, sheet: Optional[str] = None) -> Iterator[Row]:
+    """Linhas de uma planilha XLSX lidas em streaming (somente valores)."""
+    with zipfile.ZipFile(path) as archive:
+        strings = _xlsx_shared_strings(archive)
+        with archive.open(_xlsx_sheet_path(archive, sheet)) as handle:
+            for _, elem in iterparse(handle):
+                if elem.tag != f"{_XLSX_NS}row":
+                    continue
+                cells: Dict[int, Any] = {}
+                column = -1
+                for cell in elem.iter(f"{_XLSX_NS}c"):
+                    ref = cell.get("r")
+                    column = _xlsx_column(ref) if ref else column + 1
+                    cells[column] = _xlsx_cell(cell, strings)
+                values = [cells.get(index) for index in range(max(cells) + 1)] if cells else []
+                yield int(elem.get("r") or 0), values
+                elem.clear()
+
+
+def _has_values(values: List[Any]) -> bool:
+    return any(value is not None and str(value).strip() for value in values)
+
+
+def _number(text: str) -> str:
+    if "R$" in text or " " in text:
+        text = text.replace("R$", "").replace(" ", "")
+    if "," in text:
+        # formato brasileiro: 1.234,56
+        text = text.replace(".", "").replace(",", ".")
+    elif _THOUSANDS.fullmatch(text):
+        text = text.replace(".", "")
+    return text
+
+
+def payload_builder(header: List[Any]) -> Callable[[List[Any]], Dict[str, Any]]:
+    """Funcao que converte os valores de uma linha no payload de ``POST /simulations``.
+
+    O mapeamento coluna -> campo e resolvido uma vez a partir do cabecalho;
+    colunas desconhecidas sao ignoradas.
+    """
+    plan = []
+    for index, name in enumerate(header):
+        key = normalize_header(name)
+        if key in EXPENSE_FIELDS:
+            plan.append((index, key, True, True))
+        elif key in NUMBER_FIELDS:
+            plan.append((index, key, False, True))
+        elif key in TEXT_FIELDS:
+            plan.append((index, key, False, False))
+    if not plan:
+        raise ValueError("cabecalho sem nenhum campo conhecido")
+
+    def build(values: List[Any]) -> Dict[str, Any]:
+        payload: Dict[str, Any] = {}
+        expenses: Dict[str, Any] = {}
+        size = len(values)
+        for index, key, expense, numeric in plan:
+            if index >= size or values[index] is None:
+                continue
+            value = values[index]
+            if isinstance(value, str):
+                value = value.strip()
+                if not value:
+                    continue
+                if numeric:
+                    value = _number(value)
+            elif not numeric:
+                value = str(value)
+            (expenses if expense else payload)[key] = value
+        payload["despesas_anuais"] = expenses
+        return payload
+
+    return build
+
+
+def iter_payloads(path: Path, sheet: Optional[str] = None) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """``(numero da linha, payload)`` para cada linha de dados do arquivo."""
+    if path.suffix.lower() in (".xlsx", ".xlsm"):
+        rows = iter_xlsx_rows(path, sheet)
+    else:
+        rows = iter_csv_rows(path)
+    build = None
+    for number, values in rows:
+        if not _has_values(values):
+            continue
+        if build is None:
+            build = payload_builder(values)
+            continue
+        yield number, build(values)
+
+
+# -- validacao e calculo -------------------------------------------------------
+
+
+def format_validation_error(exc: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}" for error in exc.errors())
+
+
+def validate_payload(payload: Dict[str, Any]) -> CalculationInput:
+    """Mesmas regras de ``POST /simulations``: ``CalculationInput`` e empresa obrigatoria."""
+    # pydantic so no primeiro uso: ``app.py`` importa este modulo a cada cold start
+    from pydantic import ValidationError
+
+    from .models import CalculationInput
+
+    try:
+        data = CalculationInput.model_validate(payload)
+    except ValidationError as exc:
+        raise ValueError(format_validation_error(exc))
+    if not (data.nome_empresa or "").strip():
+        raise ValueError("nome_empresa: obrigatorio")
+    return data
+
+
+def calculate_inputs(inputs: List[CalculationInput], rules: Dict[str, Any]) -> List[Dict[str, Dict[str, float]]]:
+    """``output`` de cada entrada (mesmo formato de ``calculate_all``), calculado em lote."""
+    if not inputs:
+        return []
+    result = calculate_batch(
+        monthly_income=[item.rendimento_mensal for item in inputs],
+        annual_expenses={name: [getattr(item.despesas_anuais, name) for item in inputs] for name in EXPENSE_FIELDS},
+        pro_labore_monthly=[item.pro_labore for item in inputs],
+        iss_fixo=[item.iss_fixo for item in inputs],
+        salario_minimo=[item.salario_minimo for item in inputs],
+        rules=rules,
+    )
+    return batch_rows(result)
+
+
+def build_records(inputs: List[CalculationInput], snapshot: RulesSnapshot) -> List[Dict[str, Any]]:
+    """Calcula um lote de entradas e monta os registros como ``save_simulation``.
+
+    Os ids vem de ``new_record_ids`` (o mesmo relogio das gravacoes da API),
+    entao importacoes no mesmo segundo nao se sobrescrevem.
+    """
+    outputs = calculate_inputs(inputs, snapshot.rules)
+    nomes = [(item.nome_empresa or "").strip() for item in inputs]
+    records = []
+    for index, (item, (sim_id, created)) in enumerate(zip(inputs, new_record_ids(nomes, _slug))):
+        records.append(
+            {
+                "id": sim_id,
+                "created_at": created.isoformat(),
+                "nome_cliente": (item.nome_cliente or "").strip(),
+                "nome_empresa": nomes[index],
+                "input": item.model_dump(),
+                "output": outputs[index],
+                "rules_version": snapshot.version,
+            }
+        )
+    return records
+
+
+def import_payloads(
+    payloads: Iterable[Tuple[int, Dict[str, Any]]],
+    save_many: Optional[SaveMany],
+    batch_size: int = DEFAULT_BATCH_SIZE,
+) -> ImportReport:
+    """Valida, calcula e grava os payloads em lotes; ``save_many=None`` so valida."""
+    report = ImportReport()
+    started = time.perf_counter()
+    snapshot = get_rules_snapshot()
+    pending: List[CalculationInput] = []
+
+    def flush() -> None:
+        if not pending:
+            return
+        records = build_records(pending, snapshot)
+        if save_many is not None:
+            save_many(records)
+        report.importadas += len(records)
+        pending.clear()
+
+    for number, payload in payloads:
+        report.linhas += 1
+        try:
+            pending.append(validate_payload(payload))
+        except ValueError as exc:
+            report.erros.append((number, str(exc)))
+            continue
+        if len(pending) >= batch_size:
+            flush()
+    flush()
+    report.segundos = time.perf_counter() - started
+    return report
+
+
+def print_report(report: ImportReport, stream: Any = sys.stdout) -> None:
+    for number, message in report.erros:
+        print(f"linha {number}: {message}", file=sys.stderr)
+    print(
+        f"{report.importadas} de {report.linhas} linhas importadas, {len(report.erros)} com erro, "
+        f"em {report.segundos:.2f}s ({report.linhas_por_segundo:.0f} linhas/s)",
+        file=stream,
+    )
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Importa simulacoes de um arquivo CSV ou XLSX.")
+    parser.add_argument("arquivo", type=Path)
+    parser.add_argument(
+        "--data-dir",
+        type=Path,
+        default=Path(__file__).resolve().parent.parent / "data" / "simulacoes",
+        help="diretorio das simulacoes (formato definido por STORAGE_FORMAT)",
+    )
+    parser.add_argument("--planilha", help="nome da aba no XLSX (padrao: a primeira)")
+    parser.add_argument("--lote", type=int, default=DEFAULT_BATCH_SIZE, help="linhas calculadas/gravadas por vez")
+    parser.add_argument("--validar", action="store_true", help="apenas valida e calcula, sem gravar")
+    args = parser.parse_args(argv)
+
+    payloads = iter_payloads(args.arquivo, args.planilha)
+    batch_size = max(args.lote, 1)
+    if args.validar:
+        report = import_payloads(payloads, None, batch_size)
+    else:
+        storage = open_storage(args.data_dir)
+        # o catalogo e regravado uma vez no fim, nao a cada lote
+        with storage.deferred_catalog():
+            report = import_payloads(payloads, storage.save_many, batch_size)
+    print_report(report)
+    return 1 if report.erros else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
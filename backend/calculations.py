@@ -1,13 +1,53 @@
 ﻿from __future__ import annotations
 
-from dataclasses import asdict, dataclass
-from typing import Dict
+from dataclasses import dataclass, field, fields
+from math import isfinite
+from operator import attrgetter
+from typing import Any, Callable, ClassVar, Dict, Optional, Tuple, TypeVar
 
 from .constants import DEFAULT_MIN_WAGE, get_rules
+from .serialization import dumps, number
 
+R = TypeVar("R")
 
-@dataclass
-class PFResult:
+
+class _Result:
+    """Resultado com campos em ``__slots__``, convertido sem ``asdict``."""
+
+    __slots__ = ()
+    _FIELDS: ClassVar[Tuple[str, ...]] = ()
+    _TEMPLATE: ClassVar[str] = "{}"
+    _values: ClassVar[Callable[[Any], Tuple[float, ...]]]
+
+    def to_dict(self) -> Dict[str, float]:
+        return dict(zip(self._FIELDS, self._values(self)))
+
+    def to_json(self, allow_nan: bool = True) -> str:
+        """Objeto JSON escrito direto dos campos, na ordem da declaracao.
+
+        Com ``allow_nan=False`` valores nao finitos levantam ``ValueError``,
+        como no ``json.dumps``.
+        """
+        values = self._values(self)
+        if all(map(isfinite, values)):
+            # o repr de int e float finitos ja e JSON valido
+            return self._TEMPLATE % values
+        if not allow_nan:
+            raise ValueError("Out of range float values are not JSON compliant")
+        return self._TEMPLATE.replace("%r", "%s") % tuple(map(number, values))
+
+
+def _result_type(cls: type[R]) -> type[R]:
+    cls = dataclass(slots=True)(cls)
+    names = tuple(item.name for item in fields(cls))
+    cls._FIELDS = names
+    cls._TEMPLATE = "{" + ",".join(dumps(name).replace("%", "%%") + ":%r" for name in names) + "}"
+    cls._values = attrgetter(*names)
+    return cls
+
+
+@_result_type
+class PFResult(_Result):
     rendimento_anual: float
     inss: float
     irpf: float
@@ -19,8 +59,8 @@ class PFResult:
     total_despesas: float
 
 
-@dataclass
-class PJResult:
+@_result_type
+class PJResult(_Result):
     base_presumida: float
     irpj: float
     irpj_adicional: float
@@ -42,6 +82,51 @@ class PJResult:
     pro_labore_liquido: float
 
 
+@_result_type
+class ComparativeResult(_Result):
+    economia_tributaria: float
+    aliquota_pf: float
+    aliquota_pj_final: float
+    receita_liquida_pf: float
+    lucro_liquido_pj: float
+
+
+@dataclass(slots=True)
+class CalculationResult:
+    """Resultado completo; ``to_dict`` e o formato devolvido por ``calculate_all``.
+
+    O JSON e gerado uma vez e guardado: o objeto nao deve ser alterado
+    (o cache do ``/calculate`` compartilha a mesma instancia).
+    """
+
+    pf: PFResult
+    pj: PJResult
+    comparativo: ComparativeResult
+    _json: Optional[str] = field(default=None, repr=False, compare=False)
+    _finite: bool = field(default=True, repr=False, compare=False)
+
+    def to_dict(self) -> Dict[str, Dict[str, float]]:
+        return {"pf": self.pf.to_dict(), "pj": self.pj.to_dict(), "comparativo": self.comparativo.to_dict()}
+
+    def to_json(self, extra: Optional[Dict[str, Any]] = None, allow_nan: bool = True) -> str:
+        """JSON de ``to_dict()``, com as chaves de ``extra`` acrescentadas ao final.
+
+        Com ``allow_nan=False`` um resultado com ``NaN``/``Infinity`` levanta
+        ``ValueError`` em vez de gerar JSON invalido.
+        """
+        if self._json is None:
+            parts = (self.pf, self.pj, self.comparativo)
+            self._finite = all(all(map(isfinite, part._values(part))) for part in parts)
+            self._json = (
+                f'{{"pf":{self.pf.to_json()},"pj":{self.pj.to_json()},"comparativo":{self.comparativo.to_json()}}}'
+            )
+        if not allow_nan and not self._finite:
+            raise ValueError("Out of range float values are not JSON compliant")
+        if not extra:
+            return self._json
+        return f"{self._json[:-1]},{dumps(extra)[1:]}"
+
+
 def _calc_irpj_additional(base_presumida_anual: float, threshold: float, rate: float) -> float:
     excedente = max(base_presumida_anual - threshold, 0.0)
     return excedente * rate
@@ -168,13 +253,13 @@ def calculate_pj(
     )
 
 
-def calculate_all(
+def calculate(
     monthly_income: float,
     annual_expenses: Dict[str, float],
     pro_labore_monthly: float,
     iss_fixo: float,
     salario_minimo: float,
-) -> Dict[str, Dict[str, float]]:
+) -> CalculationResult:
     salario_minimo = salario_minimo or DEFAULT_MIN_WAGE
 
     pf = calculate_pf(
@@ -186,16 +271,23 @@ def calculate_all(
     )
     pj = calculate_pj(monthly_income, annual_expenses, pro_labore_monthly, iss_fixo)
 
-    comparativo = {
-        "economia_tributaria": pf.total_tributos - (pj.total_impostos + pj.impacto_pf),
-        "aliquota_pf": pf.aliquota_efetiva,
-        "aliquota_pj_final": pj.aliquota_efetiva_final,
-        "receita_liquida_pf": pf.receita_liquida,
-        "lucro_liquido_pj": pj.lucro_liquido,
-    }
-
-    return {
-        "pf": asdict(pf),
-        "pj": asdict(pj),
-        "comparativo": comparativo,
-    }
+    comparativo = ComparativeResult(
+        economia_tributaria=pf.total_tributos - (pj.total_impostos + pj.impacto_pf),
+        aliquota_pf=pf.aliquota_efetiva,
+        aliquota_pj_final=pj.aliquota_efetiva_final,
+        receita_liquida_pf=pf.receita_liquida,
+        lucro_liquido_pj=pj.lucro_liquido,
+    )
+
+    return CalculationResult(pf=pf, pj=pj, comparativo=comparativo)
+
+
+def calculate_all(
+    monthly_income: float,
+    annual_expenses: Dict[str, float],
+    pro_labore_monthly: float,
+    iss_fixo: float,
+    salario_minimo: float,
+) -> Dict[str, Dict[str, float]]:
+    """``calculate`` no formato de dicts (``pf``, ``pj`` e ``comparativo``)."""
+    return calculate(monthly_income, annual_expenses, pro_labore_monthly, iss_fixo, salario_minimo).to_dict()
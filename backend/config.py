@@ -0,0 +1,107 @@
+"""Snapshots de arquivos de configuracao recarregados apenas quando mudam."""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+from contextlib import nullcontext
+from pathlib import Path
+from typing import Callable, Dict, Generic, Optional, Tuple, TypeVar
+
+from .metrics import stage
+
+T = TypeVar("T")
+
+# Intervalo minimo entre duas verificacoes de mtime do mesmo arquivo (segundos).
+CHECK_INTERVAL = 1.0
+
+Stamp = Optional[Tuple[int, int]]
+
+_NO_STAGE = nullcontext()
+
+
+def file_stamp(path: Path) -> Stamp:
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+class FileSnapshot(Generic[T]):
+    """Valor derivado de um arquivo, mantido em memoria.
+
+    ``loader`` recebe o texto do arquivo (ou ``None`` se ele nao existir) e
+    devolve o valor ja processado. O arquivo so e relido quando mtime/tamanho
+    mudam, e o ``stat`` e feito no maximo uma vez por ``check_interval``.
+    O valor devolvido e compartilhado entre chamadas e nao deve ser alterado.
+    Com ``stage_name``, as releituras sao medidas como essa etapa (metricas).
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        loader: Callable[[Optional[str]], T],
+        check_interval: float = CHECK_INTERVAL,
+        stage_name: Optional[str] = None,
+    ) -> None:
+        self.path = path
+        self.stage_name = stage_name
+        self._loader = loader
+        self._check_interval = check_interval
+        self._lock = threading.Lock()
+        self._stamp: Stamp = None
+        self._value: Optional[T] = None
+        self._loaded = False
+        self._checked_at = 0.0
+
+    def get(self) -> T:
+        now = time.monotonic()
+        if self._loaded and now - self._checked_at < self._check_interval:
+            return self._value  # type: ignore[return-value]
+        with self._lock:
+            stamp = file_stamp(self.path)
+            if not self._loaded or stamp != self._stamp:
+                with stage(self.stage_name) if self.stage_name else _NO_STAGE:
+                    text = self.path.read_text(encoding="utf-8-sig") if stamp is not None else None
+                    self._value = self._loader(text)
+                self._stamp = stamp
+                self._loaded = True
+            self._checked_at = now
+            return self._value  # type: ignore[return-value]
+
+    def set(self, value: T) -> None:
+        """Atualiza o snapshot apos uma escrita feita pelo proprio processo."""
+        with self._lock:
+            self._value = value
+            self._stamp = file_stamp(self.path)
+            self._loaded = True
+            self._checked_at = time.monotonic()
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._loaded = False
+
+
+def parse_env(text: Optional[str]) -> Dict[str, str]:
+    data: Dict[str, str] = {}
+    if not text:
+        return data
+    for line in text.splitlines():
+        if not line or line.strip().startswith("#") or "=" not in line:
+            continue
+        key, value = line.split("=", 1)
+        data[key.strip()] = value.strip()
+    return data
+
+
+_ENV_SNAPSHOTS: Dict[Path, FileSnapshot[Dict[str, str]]] = {}
+
+
+def read_env_file(path: Path) -> Dict[str, str]:
+    """Le um arquivo ``.env`` usando um snapshot em cache por caminho."""
+    snapshot = _ENV_SNAPSHOTS.get(path)
+    if snapshot is None:
+        snapshot = _ENV_SNAPSHOTS.setdefault(path, FileSnapshot(path, parse_env))
+    return snapshot.get()
@@ -2,9 +2,13 @@
 
 from __future__ import annotations
 
+import hashlib
 import json
+import os
 from pathlib import Path
-from typing import Any, Dict
+from typing import Any, Dict, NamedTuple, Optional
+
+from .config import FileSnapshot
 
 DEFAULT_MIN_WAGE = 1621.00
 
@@ -46,16 +50,50 @@ def _deep_merge(base: Dict[str, Any], override: Dict[str, Any]) -> Dict[str, Any
     return merged
 
 
+class RulesSnapshot(NamedTuple):
+    rules: Dict[str, Any]
+    version: str
+
+
+def _rules_version(rules: Dict[str, Any]) -> str:
+    canonical = json.dumps(rules, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:16]
+
+
+def _make_snapshot(rules: Dict[str, Any]) -> RulesSnapshot:
+    return RulesSnapshot(rules=rules, version=_rules_version(rules))
+
+
+def _load_rules(text: Optional[str]) -> RulesSnapshot:
+    if text is None:
+        return _make_snapshot(DEFAULT_RULES)
+    try:
+        data = json.loads(text)
+    except json.JSONDecodeError:
+        return _make_snapshot(DEFAULT_RULES)
+    return _make_snapshot(_deep_merge(DEFAULT_RULES, data))
+
+
+_RULES = FileSnapshot(CONFIG_PATH, _load_rules, stage_name="regras")
+
+
+def get_rules_snapshot() -> RulesSnapshot:
+    return _RULES.get()
+
+
 def get_rules() -> Dict[str, Any]:
-    if CONFIG_PATH.exists():
-        try:
-            data = json.loads(CONFIG_PATH.read_text(encoding="utf-8"))
-            return _deep_merge(DEFAULT_RULES, data)
-        except json.JSONDecodeError:
-            return DEFAULT_RULES
-    return DEFAULT_RULES
+    """Regras vigentes (snapshot compartilhado: nao alterar o dict retornado)."""
+    return _RULES.get().rules
+
+
+def get_rules_version() -> str:
+    """Hash das regras vigentes, util como chave de caches derivados."""
+    return _RULES.get().version
 
 
 def save_rules(data: Dict[str, Any]) -> None:
     merged = _deep_merge(DEFAULT_RULES, data)
-    CONFIG_PATH.write_text(json.dumps(merged, ensure_ascii=False, indent=2), encoding="utf-8")
+    tmp_path = CONFIG_PATH.with_suffix(".json.tmp")
+    tmp_path.write_text(json.dumps(merged, ensure_ascii=False, indent=2), encoding="utf-8")
+    os.replace(tmp_path, CONFIG_PATH)
+    _RULES.set(_make_snapshot(merged))
@@ -0,0 +1,188 @@
+"""Exportacao em streaming (NDJSON ou CSV) de simulacoes e linhas da analise.
+
+Os registros sao lidos do armazenamento em lotes pela paginacao por cursor
+(``before``), do mais novo ao mais antigo, e cada lote e serializado e
+enviado antes do proximo ser lido; a memoria nao cresce com o acervo.
+"""
+
+from __future__ import annotations
+
+import csv
+import io
+import json
+import zlib
+from dataclasses import fields
+from datetime import date, datetime, timedelta
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence
+
+from .batch import EXPENSE_FIELDS
+from .calculations import ComparativeResult, PFResult, PJResult
+from .storage import Cursor, summary_key, summary_score
+
+EXPORT_FORMATS = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+EXPORT_BATCH_SIZE = 500
+
+ANALYSIS_COLUMNS = (
+    "created_at",
+    "nome_cliente",
+    "nome_empresa",
+    "rendimento_anual",
+    "total_tributos_pf",
+    "total_impostos_pj",
+    "impacto_pf",
+    "aliquota_pf",
+    "aliquota_pj_final",
+    "economia_tributaria",
+)
+
+# Colunas fixas do CSV de ``/export/simulations`` (registros achatados em ``a.b.c``).
+# Campos fora desta lista, como o historico em ``outputs_anteriores`` gravado pelo
+# recalculo, so saem no NDJSON, que leva o registro inteiro.
+SIMULATION_COLUMNS = (
+    "id",
+    "created_at",
+    "nome_cliente",
+    "nome_empresa",
+    "rules_version",
+    "input.rendimento_mensal",
+    *(f"input.despesas_anuais.{name}" for name in EXPENSE_FIELDS),
+    "input.pro_labore",
+    "input.iss_fixo",
+    "input.salario_minimo",
+    *(f"output.pf.{item.name}" for item in fields(PFResult)),
+    *(f"output.pj.{item.name}" for item in fields(PJResult)),
+    *(f"output.comparativo.{item.name}" for item in fields(ComparativeResult)),
+)
+
+Fetch = Callable[..., List[Dict[str, Any]]]
+GetMany = Callable[[List[str]], List[Optional[Dict[str, Any]]]]
+
+
+def parse_date_bound(value: Optional[str], end: bool = False) -> Optional[float]:
+    """Converte ``desde``/``ate`` (data ``AAAA-MM-DD`` ou data/hora ISO) em score.
+
+    Com ``end`` o limite e inclusivo: uma data cobre o dia inteiro.
+    """
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        if len(value) == 10:
+            day = date.fromisoformat(value)
+            moment = datetime(day.year, day.month, day.day)
+            if end:
+                moment += timedelta(days=1)
+            return moment.timestamp()
+        moment = datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"data invalida: {value}")
+    return moment.timestamp() + (1e-6 if end else 0.0)
+
+
+def iter_summary_batches(
+    fetch: Fetch,
+    empresa: Optional[str] = None,
+    cliente: Optional[str] = None,
+    desde: Optional[float] = None,
+    ate: Optional[float] = None,
+    batch_size: int = EXPORT_BATCH_SIZE,
+) -> Iterator[List[Dict[str, Any]]]:
+    """Lotes de resumos em ``[desde, ate)``, usando ``fetch(..., limit, before)``.
+
+    ``fetch`` segue a assinatura de ``FileStorage.list_summaries``.
+    """
+    before: Optional[Cursor] = (ate, "") if ate is not None else None
+    while True:
+        page = fetch(empresa=empresa, cliente=cliente, limit=batch_size, before=before)
+        if not page:
+            return
+        if desde is not None and summary_score(page[-1]) < desde:
+            page = [summary for summary in page if summary_score(summary) >= desde]
+            if page:
+                yield page
+            return
+        yield page
+        if len(page) < batch_size:
+            return
+        before = summary_key(page[-1])
+
+
+def flatten_record(record: Dict[str, Any], prefix: str = "") -> Dict[str, Any]:
+    """Achata dicionarios aninhados em colunas ``a.b.c`` (para CSV)."""
+    flat: Dict[str, Any] = {}
+    for key, value in record.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten_record(value, f"{name}."))
+        else:
+            flat[name] = value
+    return flat
+
+
+def _drain(buffer: io.StringIO) -> str:
+    text = buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate()
+    return text
+
+
+def encode_batches(
+    batches: Iterable[List[Dict[str, Any]]],
+    export_format: str,
+    columns: Optional[Sequence[str]] = None,
+) -> Iterator[str]:
+    """Serializa lotes de linhas; um pedaco de texto por lote.
+
+    No CSV sem ``columns`` os registros sao achatados e as colunas saem do
+    primeiro registro (campos ausentes ficam vazios).
+    """
+    if export_format == "ndjson":
+        for batch in batches:
+            yield "".join(json.dumps(row, ensure_ascii=False) + "\n" for row in batch)
+        return
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    header = list(columns) if columns is not None else None
+    if header is not None:
+        writer.writerow(header)
+    for batch in batches:
+        rows = batch if columns is not None else [flatten_record(row) for row in batch]
+        if header is None and rows:
+            header = list(rows[0])
+            writer.writerow(header)
+        for row in rows:
+            writer.writerow(["" if row.get(name) is None else row[name] for name in header or ()])
+        yield _drain(buffer)
+    if header is not None and buffer.tell():
+        yield _drain(buffer)
+
+
+def gzip_chunks(chunks: Iterable[str]) -> Iterator[bytes]:
+    """Comprime o stream em gzip, liberando os bytes de cada pedaco."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode("utf-8")) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_analysis(fetch: Fetch, export_format: str, **filters: Any) -> Iterator[str]:
+    """Linhas de ``/analysis`` (``ANALYSIS_COLUMNS``) no formato pedido."""
+    batches = iter_summary_batches(fetch, **filters)
+    rows = ([{name: summary.get(name) for name in ANALYSIS_COLUMNS} for summary in batch] for batch in batches)
+    return encode_batches(rows, export_format, ANALYSIS_COLUMNS)
+
+
+def export_simulations(fetch: Fetch, get_many: GetMany, export_format: str, **filters: Any) -> Iterator[str]:
+    """Registros completos; os resumos so escolhem quais buscar em cada lote.
+
+    No CSV as colunas sao ``SIMULATION_COLUMNS``, iguais para todo o arquivo.
+    """
+    batches = iter_summary_batches(fetch, **filters)
+    records = ([record for record in get_many([s["id"] for s in batch]) if record] for batch in batches)
+    if export_format == "csv":
+        rows = ([flatten_record(record) for record in batch] for batch in records)
+        return encode_batches(rows, export_format, SIMULATION_COLUMNS)
+    return encode_batches(records, export_format)
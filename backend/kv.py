@@ -0,0 +1,141 @@
+"""Cliente da API REST do Upstash (KV) com conexoes reaproveitadas.
+
+Usa uma ``requests.Session`` com pool de conexoes (keep-alive) e novas
+tentativas com backoff. Comandos sao enviados como JSON no corpo do POST, e
+varios comandos podem ir numa unica ida e volta via ``pipeline`` (sem
+atomicidade) ou ``transaction`` (MULTI/EXEC).
+
+O ``requests`` so e importado ao criar o primeiro cliente: sem KV configurado
+(ou ate a primeira ida ao KV) o cold start da funcao nao paga por ele.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Sequence, Tuple
+
+from .metrics import kv_command
+
+if TYPE_CHECKING:
+    import requests
+
+DEFAULT_TIMEOUT = 10
+POOL_SIZE = 16
+RETRIES = 3
+BACKOFF_FACTOR = 0.2
+
+Command = Sequence[Any]
+
+
+class KVError(RuntimeError):
+    """Erro devolvido pela API do KV."""
+
+
+def kv_config() -> Optional[Dict[str, str]]:
+    url = os.getenv("KV_REST_API_URL") or os.getenv("UPSTASH_REDIS_REST_URL")
+    token = os.getenv("KV_REST_API_TOKEN") or os.getenv("UPSTASH_REDIS_REST_TOKEN")
+    if not url or not token:
+        return None
+    return {"url": url.rstrip("/"), "token": token}
+
+
+def _build_session(url: str, token: str) -> requests.Session:
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+
+    # Comandos avulsos e pipelines sao idempotentes (SET, DEL, ZADD, ZREM,
+    # HSET...), entao o POST pode ser repetido apos 5xx ou erro de leitura.
+    retry = Retry(
+        total=RETRIES,
+        backoff_factor=BACKOFF_FACTOR,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=None,
+        raise_on_status=False,
+    )
+    # As transacoes levam INCR sim:generation e RPUSH sim:changes: uma que ja
+    # foi executada e repetida contaria duas vezes. So se repete quando a
+    # conexao nem chegou a ser aberta (a requisicao nao foi enviada).
+    transaction_retry = Retry(
+        total=RETRIES,
+        connect=RETRIES,
+        read=0,
+        status=0,
+        other=0,
+        backoff_factor=BACKOFF_FACTOR,
+        allowed_methods=None,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE, max_retries=retry)
+    transaction_adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE, max_retries=transaction_retry)
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    # o ``mount`` mais especifico vale para as URLs de transacao
+    session.mount(f"{url}/multi-exec", transaction_adapter)
+    session.headers.update({"Authorization": f"Bearer {token}"})
+    return session
+
+
+class KVClient:
+    def __init__(self, url: str, token: str, timeout: float = DEFAULT_TIMEOUT) -> None:
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+        self._session = _build_session(self.url, token)
+
+    def _post(self, path: str, body: Any, label: str) -> Any:
+        with kv_command(label):
+            response = self._session.post(f"{self.url}{path}", json=body, timeout=self.timeout)
+            response.raise_for_status()
+            return response.json()
+
+    def command(self, *args: Any) -> Any:
+        """Executa um comando e devolve ``result``."""
+        payload = self._post("", [str(arg) for arg in args], str(args[0]))
+        if "error" in payload:
+            raise KVError(payload["error"])
+        return payload.get("result")
+
+    def _batch(self, path: str, commands: Sequence[Command]) -> List[Any]:
+        if not commands:
+            return []
+        payload = self._post(path, [[str(arg) for arg in command] for command in commands], path.lstrip("/"))
+        if isinstance(payload, dict) and "error" in payload:
+            raise KVError(payload["error"])
+        results = []
+        for item in payload:
+            if "error" in item:
+                raise KVError(item["error"])
+            results.append(item.get("result"))
+        return results
+
+    def pipeline(self, commands: Sequence[Command]) -> List[Any]:
+        """Varios comandos numa unica requisicao (sem atomicidade)."""
+        return self._batch("/pipeline", commands)
+
+    def transaction(self, commands: Sequence[Command]) -> List[Any]:
+        """Varios comandos numa unica requisicao, executados como MULTI/EXEC."""
+        return self._batch("/multi-exec", commands)
+
+    def close(self) -> None:
+        self._session.close()
+
+
+_CLIENTS: Dict[Tuple[str, str], KVClient] = {}
+_CLIENTS_LOCK = threading.Lock()
+
+
+def get_kv_client(config: Optional[Dict[str, str]] = None) -> Optional[KVClient]:
+    """Cliente compartilhado para a configuracao atual (``None`` sem KV)."""
+    config = config or kv_config()
+    if not config:
+        return None
+    key = (config["url"], config["token"])
+    client = _CLIENTS.get(key)
+    if client is None:
+        with _CLIENTS_LOCK:
+            client = _CLIENTS.get(key)
+            if client is None:
+                client = _CLIENTS[key] = KVClient(config["url"], config["token"])
+    return client
@@ -1,20 +1,89 @@
 ﻿from __future__ import annotations
 
-import json
+import asyncio
+import math
 import os
-import secrets
-from datetime import datetime
+from contextlib import asynccontextmanager
 from pathlib import Path
-from typing import Dict
+from typing import AsyncIterator, Dict, Optional
 
-from fastapi import Depends, FastAPI, Header, HTTPException, status
+from fastapi import Depends, FastAPI, Header, HTTPException, Query, Request, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 
+from . import metrics
+from .async_storage import AsyncStorage, run_io
+from .batch import all_finite, calculate_batch
 from .calculations import calculate_all
-from .constants import DEFAULT_MIN_WAGE, get_rules, save_rules
-from .models import CalculationInput
+from .config import read_env_file
+from .constants import DEFAULT_MIN_WAGE, get_rules, get_rules_version, save_rules
+from .export import EXPORT_FORMATS, export_analysis, export_simulations, gzip_chunks, parse_date_bound
+from .memo import CALCULATION_CACHE, cached_calculate
+from .models import (
+    AnnualExpenses,
+    BatchCalculationInput,
+    BreakEvenInput,
+    CalculationInput,
+    ProLaboreOptimizationInput,
+    SensitivityInput,
+)
+from .search import parse_ranges
+from .sensitivity import sensitivity_json, sensitivity_ndjson
+from .serialization import make_encoder
+from .sessions import open_sessions
+from .solver import break_even_income, optimize_pro_labore
+from .storage import MAX_PAGE_SIZE, Cursor, format_cursor, new_record_id, next_cursor, open_storage, parse_cursor
+from .writer import WriteBehind, WriteTimeout
+
+
+# Como o ``JSONResponse``: compacto, UTF-8 e sem NaN.
+_JSON_ENCODER = make_encoder(allow_nan=False)
+
+
+class _TimedJSONResponse(JSONResponse):
+    def render(self, content: object) -> bytes:
+        with metrics.stage("serializacao"):
+            return _JSON_ENCODER.encode(content).encode("utf-8")
+
+
+@asynccontextmanager
+async def _lifespan(_app: FastAPI) -> AsyncIterator[None]:
+    yield
+    # grava o que ainda estiver na fila antes de o processo sair
+    global _ASYNC_STORAGE
+    if _ASYNC_STORAGE is not None:
+        await _ASYNC_STORAGE.close()
+        _ASYNC_STORAGE = None
+
+
+app = FastAPI(
+    title="Simulador Financeiro-Tributario",
+    default_response_class=_TimedJSONResponse,
+    lifespan=_lifespan,
+)
+
+
+@app.exception_handler(WriteTimeout)
+async def _write_timeout(_request: Request, exc: WriteTimeout) -> JSONResponse:
+    # a fila de gravacao esta travada: a leitura nao veria as ultimas simulacoes
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": str(exc)},
+        headers={"Retry-After": "5"},
+    )
+
+
+@app.exception_handler(RequestValidationError)
+async def _validation_error(_request: Request, exc: RequestValidationError) -> JSONResponse:
+    # o handler padrao ecoa a entrada, e um NaN/Infinity nao passa no encoder
+    errors = jsonable_encoder(exc.errors())
+    for error in errors:
+        if isinstance(error.get("input"), float) and not math.isfinite(error["input"]):
+            error["input"] = None
+    return JSONResponse(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, content={"detail": errors})
 
-app = FastAPI(title="Simulador Financeiro-Tributario")
 
 # CORS liberado para facilitar o consumo pelo frontend local
 app.add_middleware(
@@ -24,25 +93,23 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Server-Timing e histogramas de /metrics (METRICS_ENABLED=1)
+app.add_middleware(metrics.TimingMiddleware)
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 DATA_DIR = BASE_DIR / "data" / "simulacoes"
 DATA_DIR.mkdir(parents=True, exist_ok=True)
+STORAGE = open_storage(DATA_DIR)
+_ASYNC_STORAGE: Optional[AsyncStorage] = None
+# POST /simulations responde antes de gravar (WRITE_BEHIND=0 grava na requisicao)
+WRITE_BEHIND = os.getenv("WRITE_BEHIND", "1") != "0"
 
-SESSIONS: Dict[str, str] = {}
+# token -> usuario; SESSION_STORE=sqlite|kv compartilha os logins entre workers
+SESSIONS = open_sessions(BASE_DIR / "data")
 
 
 def _load_env() -> Dict[str, str]:
-    env_path = BASE_DIR / ".env"
-    if not env_path.exists():
-        return {}
-    data: Dict[str, str] = {}
-    for line in env_path.read_text(encoding="utf-8").splitlines():
-        if not line or line.strip().startswith("#") or "=" not in line:
-            continue
-        key, value = line.split("=", 1)
-        data[key.strip()] = value.strip()
-    return data
+    return read_env_file(BASE_DIR / ".env")
 
 
 def _get_credentials() -> Dict[str, str]:
@@ -53,57 +120,105 @@ def _get_credentials() -> Dict[str, str]:
     }
 
 
-def _slugify(value: str) -> str:
-    safe = "".join(ch if ch.isalnum() else "_" for ch in value.strip())
-    return "_".join(filter(None, safe.split("_"))).lower() or "empresa"
+def _annual_expenses(despesas: AnnualExpenses) -> Dict[str, float]:
+    annual_expenses = {
+        "secretaria": despesas.secretaria,
+        "aluguel_condominio": despesas.aluguel_condominio,
+        "contador": despesas.contador,
+        "outras_despesas": despesas.outras_despesas,
+    }
+    annual_expenses["total"] = (
+        annual_expenses["secretaria"]
+        + annual_expenses["aluguel_condominio"]
+        + annual_expenses["contador"]
+        + annual_expenses["outras_despesas"]
+    )
+    return annual_expenses
+
+
+def _storage() -> AsyncStorage:
+    """Acesso assincrono ao ``STORAGE`` atual (refeito se ele for trocado)."""
+    global _ASYNC_STORAGE
+    if _ASYNC_STORAGE is None or _ASYNC_STORAGE.storage is not STORAGE:
+        _ASYNC_STORAGE = AsyncStorage(STORAGE, WriteBehind(STORAGE) if WRITE_BEHIND else None)
+    return _ASYNC_STORAGE
 
 
-def _require_auth(x_auth_token: str | None = Header(default=None)) -> str:
-    if not x_auth_token or x_auth_token not in SESSIONS:
+async def _require_auth(x_auth_token: str | None = Header(default=None)) -> str:
+    with metrics.stage("auth"):
+        user = SESSIONS.cached(x_auth_token) if x_auth_token else None
+        if user is None and x_auth_token and SESSIONS.SHARED:
+            # token de outro worker (ou de antes de reiniciar): consulta o armazenamento
+            user = await run_io(SESSIONS.get, x_auth_token)
+    if user is None:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Nao autorizado")
-    return SESSIONS[x_auth_token]
+    return user
+
+
+def _etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or etag in tags or f"W/{etag}" in tags
+
+
+def _conditional(etag: str, response: Response, if_none_match: str | None) -> None:
+    """Responde 304 se o cliente ja tem ``etag``; senao anota o ETag na resposta."""
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache", "Vary": "X-Auth-Token"}
+    if _etag_matches(if_none_match, etag):
+        raise HTTPException(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    response.headers.update(headers)
+
+
+async def _storage_etag(
+    response: Response,
+    if_none_match: str | None = Header(default=None),
+    _user: str = Depends(_require_auth),
+) -> None:
+    generation, rules_version = await asyncio.gather(_storage().generation(), run_io(get_rules_version))
+    _conditional(f'"{generation}.{rules_version}"', response, if_none_match)
+
+
+def _rules_etag(
+    response: Response,
+    if_none_match: str | None = Header(default=None),
+    _user: str = Depends(_require_auth),
+) -> None:
+    _conditional(f'"{get_rules_version()}"', response, if_none_match)
 
 
 @app.get("/health")
-def health_check() -> dict:
+async def health_check() -> dict:
     return {"status": "ok"}
 
 
 @app.post("/login")
-def login(payload: dict) -> dict:
-    credentials = _get_credentials()
+async def login(payload: dict) -> dict:
+    credentials = await run_io(_get_credentials)
     if payload.get("login") != credentials["login"] or payload.get("senha") != credentials["password"]:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Credenciais invalidas")
-    token = secrets.token_urlsafe(24)
-    SESSIONS[token] = credentials["login"]
+    if SESSIONS.SHARED:
+        token = await run_io(SESSIONS.create, credentials["login"])
+    else:
+        token = SESSIONS.create(credentials["login"])
     return {"token": token}
 
 
 @app.post("/calculate")
-def calculate(payload: CalculationInput, _user: str = Depends(_require_auth)) -> dict:
-    annual_expenses = {
-        "secretaria": payload.despesas_anuais.secretaria,
-        "aluguel_condominio": payload.despesas_anuais.aluguel_condominio,
-        "contador": payload.despesas_anuais.contador,
-        "outras_despesas": payload.despesas_anuais.outras_despesas,
-    }
-    annual_expenses["total"] = (
-        annual_expenses["secretaria"]
-        + annual_expenses["aluguel_condominio"]
-        + annual_expenses["contador"]
-        + annual_expenses["outras_despesas"]
-    )
-
-    result = calculate_all(
-        monthly_income=payload.rendimento_mensal,
-        annual_expenses=annual_expenses,
-        pro_labore_monthly=payload.pro_labore,
-        iss_fixo=payload.iss_fixo,
-        salario_minimo=payload.salario_minimo,
-    )
+def calculate(payload: CalculationInput, _user: str = Depends(_require_auth)) -> Response:
+    annual_expenses = _annual_expenses(payload.despesas_anuais)
+
+    with metrics.stage("calculo"):
+        result = cached_calculate(
+            monthly_income=payload.rendimento_mensal,
+            annual_expenses=annual_expenses,
+            pro_labore_monthly=payload.pro_labore,
+            iss_fixo=payload.iss_fixo,
+            salario_minimo=payload.salario_minimo,
+        )
 
     # Include some context to help the UI explain assumptions
-    result["assumptions"] = {
+    assumptions = {
         "annual_expenses": annual_expenses["total"],
         "min_wage_used": payload.salario_minimo or DEFAULT_MIN_WAGE,
         "presumed_profit_rate": 0.32,
@@ -111,126 +226,291 @@ def calculate(payload: CalculationInput, _user: str = Depends(_require_auth)) ->
         "cofins_rate": 0.03,
     }
 
+    # JSON escrito direto do resultado, sem passar pelo jsonable_encoder
+    with metrics.stage("serializacao"):
+        try:
+            body = result.to_json({"assumptions": assumptions}, allow_nan=False)
+        except ValueError:
+            # entradas finitas mas enormes (ex.: 1e308) estouram para Infinity
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail="Valores fora do intervalo numerico",
+            ) from None
+    return Response(content=body, media_type="application/json")
+
+
+@app.get("/calculate/cache")
+def calculate_cache_stats(_user: str = Depends(_require_auth)) -> dict:
+    return CALCULATION_CACHE.stats()
+
+
+@app.get("/metrics", include_in_schema=False)
+def metrics_endpoint() -> Response:
+    if not metrics.ENABLED:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Metricas desligadas (METRICS_ENABLED)")
+    return Response(content=metrics.REGISTRY.render(), media_type=metrics.CONTENT_TYPE)
+
+
+@app.post("/calculate/batch")
+def calculate_batch_route(payload: BatchCalculationInput, _user: str = Depends(_require_auth)) -> dict:
+    with metrics.stage("calculo"):
+        result = calculate_batch(
+            monthly_income=payload.rendimento_mensal,
+            annual_expenses=payload.despesas_anuais.model_dump(),
+            pro_labore_monthly=payload.pro_labore,
+            iss_fixo=payload.iss_fixo,
+            salario_minimo=payload.salario_minimo,
+        )
+    if not all_finite(result):
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Valores fora do intervalo numerico",
+        )
+    result["count"] = len(payload.rendimento_mensal)
     return result
 
 
+@app.post("/break-even")
+def break_even(payload: BreakEvenInput, _user: str = Depends(_require_auth)) -> dict:
+    with metrics.stage("calculo"):
+        return break_even_income(
+            annual_expenses=_annual_expenses(payload.despesas_anuais),
+            pro_labore_monthly=payload.pro_labore,
+            iss_fixo=payload.iss_fixo,
+            salario_minimo=payload.salario_minimo,
+        )
+
+
+@app.post("/optimize/pro-labore")
+def optimize_pro_labore_route(
+    payload: ProLaboreOptimizationInput, _user: str = Depends(_require_auth)
+) -> dict:
+    with metrics.stage("calculo"):
+        return optimize_pro_labore(
+            monthly_income=payload.rendimento_mensal,
+            annual_expenses=_annual_expenses(payload.despesas_anuais),
+            iss_fixo=payload.iss_fixo,
+            salario_minimo=payload.salario_minimo,
+            min_pro_labore=payload.pro_labore_min,
+            max_pro_labore=payload.pro_labore_max,
+            points=payload.pontos,
+        )
+
+
+@app.post("/sensitivity")
+def sensitivity(payload: SensitivityInput, _user: str = Depends(_require_auth)) -> Response:
+    scenario = {
+        "rendimento_mensal": payload.rendimento_mensal,
+        "pro_labore": payload.pro_labore,
+        "iss_fixo": payload.iss_fixo,
+        "salario_minimo": payload.salario_minimo,
+        "annual_expenses": _annual_expenses(payload.despesas_anuais),
+    }
+    x_axis = payload.eixo_x.to_axis()
+    y_axis = payload.eixo_y.to_axis()
+    if payload.stream:
+        return StreamingResponse(
+            sensitivity_ndjson(scenario, x_axis, y_axis), media_type="application/x-ndjson"
+        )
+    return Response(content=sensitivity_json(scenario, x_axis, y_axis), media_type="application/json")
+
+
 @app.post("/simulations")
-def save_simulation(payload: CalculationInput, _user: str = Depends(_require_auth)) -> dict:
+async def save_simulation(payload: CalculationInput, _user: str = Depends(_require_auth)) -> dict:
     nome_empresa = (payload.nome_empresa or "").strip()
     if not nome_empresa:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Nome da empresa obrigatório")
 
-    annual_expenses = {
-        "secretaria": payload.despesas_anuais.secretaria,
-        "aluguel_condominio": payload.despesas_anuais.aluguel_condominio,
-        "contador": payload.despesas_anuais.contador,
-        "outras_despesas": payload.despesas_anuais.outras_despesas,
-    }
-    annual_expenses["total"] = (
-        annual_expenses["secretaria"]
-        + annual_expenses["aluguel_condominio"]
-        + annual_expenses["contador"]
-        + annual_expenses["outras_despesas"]
-    )
+    annual_expenses = _annual_expenses(payload.despesas_anuais)
 
-    result = calculate_all(
-        monthly_income=payload.rendimento_mensal,
-        annual_expenses=annual_expenses,
-        pro_labore_monthly=payload.pro_labore,
-        iss_fixo=payload.iss_fixo,
-        salario_minimo=payload.salario_minimo,
-    )
+    with metrics.stage("calculo"):
+        result = calculate_all(
+            monthly_income=payload.rendimento_mensal,
+            annual_expenses=annual_expenses,
+            pro_labore_monthly=payload.pro_labore,
+            iss_fixo=payload.iss_fixo,
+            salario_minimo=payload.salario_minimo,
+        )
 
-    now = datetime.now()
-    empresa_dir = DATA_DIR / _slugify(nome_empresa)
-    empresa_dir.mkdir(parents=True, exist_ok=True)
-    file_id = now.strftime("%Y-%m-%d_%H%M%S")
+    sim_id, created = new_record_id(nome_empresa)
     record = {
-        "id": f"{_slugify(nome_empresa)}/{file_id}",
-        "created_at": now.isoformat(),
+        "id": sim_id,
+        "created_at": created.isoformat(),
         "nome_cliente": (payload.nome_cliente or "").strip(),
         "nome_empresa": nome_empresa,
         "input": payload.model_dump(),
         "output": result,
+        "rules_version": get_rules_version(),
     }
-    (empresa_dir / f"{file_id}.json").write_text(
-        json.dumps(record, ensure_ascii=False, indent=2),
-        encoding="utf-8",
-    )
+    await _storage().save(record)
     return {"id": record["id"]}
 
 
+def _parse_cursor(before: str | None) -> Cursor | None:
+    if before is None:
+        return None
+    try:
+        return parse_cursor(before)
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="before invalido")
+
+
+def _set_next_cursor(response: Response, page: list[dict], limit: int | None) -> None:
+    cursor = next_cursor(page, limit)
+    if cursor is not None:
+        response.headers["X-Next-Before"] = format_cursor(cursor)
+
+
 @app.get("/simulations")
-def list_simulations(_user: str = Depends(_require_auth)) -> list[dict]:
-    records: list[dict] = []
-    for path in DATA_DIR.rglob("*.json"):
-        try:
-            payload = json.loads(path.read_text(encoding="utf-8"))
-            records.append(
-                {
-                    "id": payload.get("id"),
-                    "created_at": payload.get("created_at"),
-                    "nome_cliente": payload.get("nome_cliente"),
-                    "nome_empresa": payload.get("nome_empresa"),
-                }
-            )
-        except json.JSONDecodeError:
-            continue
-    records.sort(key=lambda item: item.get("created_at", ""), reverse=True)
-    return records
+async def list_simulations(
+    response: Response,
+    empresa: str | None = None,
+    cliente: str | None = None,
+    limit: int | None = Query(default=None, ge=1, le=MAX_PAGE_SIZE),
+    offset: int = Query(default=0, ge=0),
+    before: str | None = None,
+    _etag: None = Depends(_storage_etag),
+) -> list[dict]:
+    summaries = await _storage().list_summaries(
+        empresa=empresa, cliente=cliente, limit=limit, offset=offset, before=_parse_cursor(before)
+    )
+    _set_next_cursor(response, summaries, limit)
+    return [
+        {
+            "id": summary.get("id"),
+            "created_at": summary.get("created_at"),
+            "nome_cliente": summary.get("nome_cliente"),
+            "nome_empresa": summary.get("nome_empresa"),
+        }
+        for summary in summaries
+    ]
+
+
+async def _search_ranges(
+    desde: str | None = None,
+    ate: str | None = None,
+    rendimento_min: float | None = None,
+    rendimento_max: float | None = None,
+    economia_min: float | None = None,
+    economia_max: float | None = None,
+    aliquota_pf_min: float | None = None,
+    aliquota_pf_max: float | None = None,
+    aliquota_pj_min: float | None = None,
+    aliquota_pj_max: float | None = None,
+) -> dict:
+    args = dict(locals())
+    try:
+        return parse_ranges(args)
+    except ValueError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc))
+
+
+@app.get("/simulations/search")
+async def search_simulations(
+    q: str | None = None,
+    fuzzy: bool = False,
+    ranges: dict = Depends(_search_ranges),
+    limit: int = Query(default=50, ge=1, le=MAX_PAGE_SIZE),
+    offset: int = Query(default=0, ge=0),
+    _etag: None = Depends(_storage_etag),
+) -> dict:
+    total, summaries = await _storage().search(q, fuzzy, ranges, limit, offset)
+    return {"total": total, "items": summaries}
 
 
 @app.get("/simulations/{sim_id:path}")
-def load_simulation(sim_id: str, _user: str = Depends(_require_auth)) -> dict:
+async def load_simulation(sim_id: str, _user: str = Depends(_require_auth)) -> dict:
     safe_id = sim_id.replace("..", "").strip("/")
-    path = DATA_DIR / f"{safe_id}.json"
-    if not path.exists():
+    payload = await _storage().get(safe_id)
+    if payload is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Simulacao nao encontrada")
-    return json.loads(path.read_text(encoding="utf-8"))
+    return payload
 
 
 @app.delete("/simulations/{sim_id:path}")
-def delete_simulation(sim_id: str, _user: str = Depends(_require_auth)) -> dict:
+async def delete_simulation(sim_id: str, _user: str = Depends(_require_auth)) -> dict:
     safe_id = sim_id.replace("..", "").strip("/")
-    path = DATA_DIR / f"{safe_id}.json"
-    if not path.exists():
+    if not await _storage().delete(safe_id):
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Simulacao nao encontrada")
-    path.unlink()
     return {"status": "deleted"}
 
 
 @app.get("/analysis")
-def analysis(_user: str = Depends(_require_auth)) -> list[dict]:
-    rows: list[dict] = []
-    for path in DATA_DIR.rglob("*.json"):
-        try:
-            payload = json.loads(path.read_text(encoding="utf-8"))
-        except json.JSONDecodeError:
-            continue
-        output = payload.get("output", {})
-        pf = output.get("pf", {})
-        pj = output.get("pj", {})
-        comparativo = output.get("comparativo", {})
-        rows.append(
-            {
-                "created_at": payload.get("created_at"),
-                "nome_empresa": payload.get("nome_empresa"),
-                "nome_cliente": payload.get("nome_cliente"),
-                "rendimento_anual": pf.get("rendimento_anual"),
-                "total_tributos_pf": pf.get("total_tributos"),
-                "total_impostos_pj": pj.get("total_impostos"),
-                "impacto_pf": pj.get("impacto_pf"),
-                "aliquota_pf": pf.get("aliquota_efetiva"),
-                "aliquota_pj_final": pj.get("aliquota_efetiva_final"),
-                "economia_tributaria": comparativo.get("economia_tributaria"),
-            }
-        )
-    rows.sort(key=lambda item: item.get("created_at", ""), reverse=True)
-    return rows
+async def analysis(
+    response: Response,
+    empresa: str | None = None,
+    cliente: str | None = None,
+    limit: int | None = Query(default=None, ge=1, le=MAX_PAGE_SIZE),
+    offset: int = Query(default=0, ge=0),
+    before: str | None = None,
+    _etag: None = Depends(_storage_etag),
+) -> list[dict]:
+    summaries = await _storage().list_summaries(
+        empresa=empresa, cliente=cliente, limit=limit, offset=offset, before=_parse_cursor(before)
+    )
+    _set_next_cursor(response, summaries, limit)
+    return [{key: value for key, value in summary.items() if key != "id"} for summary in summaries]
+
+
+@app.get("/analysis/summary")
+async def analysis_summary(_etag: None = Depends(_storage_etag)) -> dict:
+    return await _storage().aggregates()
+
+
+async def _export_filters(
+    empresa: str | None = None,
+    cliente: str | None = None,
+    desde: str | None = None,
+    ate: str | None = None,
+) -> dict:
+    try:
+        return {
+            "empresa": empresa,
+            "cliente": cliente,
+            "desde": parse_date_bound(desde),
+            "ate": parse_date_bound(ate, end=True),
+        }
+    except ValueError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc))
+
+
+def _export_response(chunks, formato: str, name: str, accept_encoding: str | None) -> StreamingResponse:
+    headers = {"Content-Disposition": f'attachment; filename="{name}.{formato}"', "Vary": "Accept-Encoding"}
+    if "gzip" in (accept_encoding or ""):
+        headers["Content-Encoding"] = "gzip"
+        chunks = gzip_chunks(chunks)
+    return StreamingResponse(chunks, media_type=EXPORT_FORMATS[formato], headers=headers)
+
+
+@app.get("/export/analysis")
+async def export_analysis_route(
+    formato: str = Query(default="ndjson", pattern="^(ndjson|csv)$"),
+    filters: dict = Depends(_export_filters),
+    accept_encoding: str | None = Header(default=None),
+    _user: str = Depends(_require_auth),
+) -> StreamingResponse:
+    # espera a fila de gravacao: a exportacao ve tudo que ja foi confirmado
+    storage = _storage()
+    await storage.flushed()
+    chunks = export_analysis(storage.storage.list_summaries, formato, **filters)
+    return _export_response(chunks, formato, "analise", accept_encoding)
+
+
+@app.get("/export/simulations")
+async def export_simulations_route(
+    formato: str = Query(default="ndjson", pattern="^(ndjson|csv)$"),
+    filters: dict = Depends(_export_filters),
+    accept_encoding: str | None = Header(default=None),
+    _user: str = Depends(_require_auth),
+) -> StreamingResponse:
+    storage = _storage()
+    await storage.flushed()
+    chunks = export_simulations(storage.storage.list_summaries, storage.storage.get_many, formato, **filters)
+    return _export_response(chunks, formato, "simulacoes", accept_encoding)
 
 
 @app.get("/config")
-def get_config(_user: str = Depends(_require_auth)) -> dict:
+def get_config(_etag: None = Depends(_rules_etag)) -> dict:
     return get_rules()
 
 
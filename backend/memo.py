@@ -0,0 +1,153 @@
+"""Cache de resultados de ``calculate_all`` para o ``/calculate``.
+
+A tela recalcula a cada digitacao e os usuarios alternam entre os mesmos
+valores; o resultado depende apenas da entrada normalizada e das regras
+vigentes, entao a chave e ``(get_rules_version(), entrada)``. Quando as
+regras mudam (``save_rules`` ou edicao do arquivo), a versao muda e as
+entradas antigas sao descartadas na proxima consulta.
+
+O cache guarda o ``CalculationResult``, que tambem guarda o proprio JSON:
+um acerto responde sem recalcular nem reserializar os numeros.
+
+Tamanho e validade vem de ``CALC_CACHE_SIZE`` (padrao 1024; 0 desliga) e
+``CALC_CACHE_TTL`` (segundos; padrao sem expiracao).
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+from .calculations import CalculationResult, calculate
+from .constants import DEFAULT_MIN_WAGE, get_rules_version
+
+_MISSING = object()
+
+
+class MemoCache:
+    """LRU limitado, com TTL opcional e contadores de acertos/falhas."""
+
+    def __init__(
+        self, maxsize: int = 1024, ttl: Optional[float] = None, clock: Callable[[], float] = time.monotonic
+    ) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._items: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._generation: Hashable = None
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            item = self._items.get(key, _MISSING)
+            if item is not _MISSING:
+                expires, value = item
+                if self.ttl is None or expires > self._clock():
+                    self._items.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._items[key]
+            self.misses += 1
+            return default
+
+    def set(self, key: Hashable, value: Any) -> None:
+        if self.maxsize <= 0:
+            return
+        expires = self._clock() + self.ttl if self.ttl is not None else 0.0
+        with self._lock:
+            self._items[key] = (expires, value)
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+
+    def bind(self, generation: Hashable) -> None:
+        """Esvazia o cache quando ``generation`` (ex.: a versao das regras) muda."""
+        if generation != self._generation:
+            with self._lock:
+                if generation != self._generation:
+                    self._items.clear()
+                    self._generation = generation
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "size": len(self._items),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+        }
+
+
+def _env_ttl() -> Optional[float]:
+    value = float(os.getenv("CALC_CACHE_TTL") or 0)
+    return value if value > 0 else None
+
+
+CALCULATION_CACHE = MemoCache(maxsize=int(os.getenv("CALC_CACHE_SIZE") or 1024), ttl=_env_ttl())
+
+
+def calculation_key(
+    monthly_income: float,
+    annual_expenses: Dict[str, float],
+    pro_labore_monthly: float,
+    iss_fixo: float,
+    salario_minimo: float,
+) -> Tuple[Any, ...]:
+    """Entrada canonica: floats, despesas em ordem fixa e salario minimo ja resolvido."""
+    return (
+        float(monthly_income),
+        tuple(sorted((name, float(value)) for name, value in annual_expenses.items())),
+        float(pro_labore_monthly),
+        float(iss_fixo),
+        float(salario_minimo or DEFAULT_MIN_WAGE),
+    )
+
+
+def cached_calculate(
+    monthly_income: float,
+    annual_expenses: Dict[str, float],
+    pro_labore_monthly: float,
+    iss_fixo: float,
+    salario_minimo: float,
+    cache: MemoCache = CALCULATION_CACHE,
+) -> CalculationResult:
+    """``calculate`` com cache; o resultado e compartilhado e nao deve ser alterado."""
+    version = get_rules_version()
+    cache.bind(version)
+    key = (version, calculation_key(monthly_income, annual_expenses, pro_labore_monthly, iss_fixo, salario_minimo))
+    result = cache.get(key)
+    if result is None:
+        result = calculate(
+            monthly_income=monthly_income,
+            annual_expenses=annual_expenses,
+            pro_labore_monthly=pro_labore_monthly,
+            iss_fixo=iss_fixo,
+            salario_minimo=salario_minimo,
+        )
+        cache.set(key, result)
+    return result
+
+
+def cached_calculate_all(
+    monthly_income: float,
+    annual_expenses: Dict[str, float],
+    pro_labore_monthly: float,
+    iss_fixo: float,
+    salario_minimo: float,
+    cache: MemoCache = CALCULATION_CACHE,
+) -> Dict[str, Dict[str, float]]:
+    """``calculate_all`` com cache; devolve dicts novos, que podem receber novas chaves."""
+    return cached_calculate(
+        monthly_income, annual_expenses, pro_labore_monthly, iss_fixo, salario_minimo, cache=cache
+    ).to_dict()
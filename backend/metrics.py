@@ -0,0 +1,219 @@
+"""Tempos por etapa das requisicoes: cabecalho ``Server-Timing`` e ``/metrics``.
+
+Ligado com ``METRICS_ENABLED=1``. Cada requisicao acumula o tempo gasto em
+etapas (``auth``, ``regras``, ``calculo``, ``serializacao``, ``kv``) e o
+devolve no ``Server-Timing``; as duracoes tambem vao para histogramas por
+rota, por etapa e por comando do KV, expostos em ``/metrics`` no formato
+texto do Prometheus.
+
+Desligado, ``stage`` devolve um contexto vazio compartilhado e nada e
+registrado: o custo em cada ponto instrumentado e testar um booleano.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import nullcontext
+from contextvars import ContextVar, Token
+from typing import Any, Awaitable, Callable, ContextManager, Dict, List, Optional, Tuple
+
+ENABLED = (os.getenv("METRICS_ENABLED") or "").lower() in ("1", "true", "yes", "on")
+
+# segundos; os mesmos limites padrao dos clientes do Prometheus
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+REQUEST_SECONDS = "calctribut_http_request_duration_seconds"
+STAGE_SECONDS = "calctribut_stage_duration_seconds"
+KV_SECONDS = "calctribut_kv_command_duration_seconds"
+UNMATCHED_ROUTE = "nao_encontrada"
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    """Contagens por faixa (nao acumuladas), soma e total de observacoes."""
+
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self) -> None:
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(BUCKETS, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: Labels, extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in labels]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Registry:
+    """Histogramas por nome e rotulos, renderizados no formato texto do Prometheus."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._help: Dict[str, str] = {}
+        self._series: Dict[str, Dict[Labels, Histogram]] = {}
+
+    def histogram(self, name: str, help_text: str) -> None:
+        self._help[name] = help_text
+        self._series.setdefault(name, {})
+
+    def observe(self, name: str, labels: Labels, value: float) -> None:
+        with self._lock:
+            series = self._series.setdefault(name, {})
+            histogram = series.get(labels)
+            if histogram is None:
+                histogram = series[labels] = Histogram()
+            histogram.observe(value)
+
+    def clear(self) -> None:
+        with self._lock:
+            for series in self._series.values():
+                series.clear()
+
+    def render(self) -> str:
+        lines: List[str] = []
+        with self._lock:
+            for name, series in self._series.items():
+                lines.append(f"# HELP {name} {self._help.get(name, name)}")
+                lines.append(f"# TYPE {name} histogram")
+                for labels, histogram in sorted(series.items()):
+                    cumulative = 0
+                    for bound, count in zip(BUCKETS + (float("inf"),), histogram.counts):
+                        cumulative += count
+                        le = "+Inf" if bound == float("inf") else repr(bound)
+                        bucket_labels = _format_labels(labels, f'le="{le}"')
+                        lines.append(f"{name}_bucket{bucket_labels} {cumulative}")
+                    lines.append(f"{name}_sum{_format_labels(labels)} {histogram.sum!r}")
+                    lines.append(f"{name}_count{_format_labels(labels)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+REGISTRY.histogram(REQUEST_SECONDS, "Duracao das requisicoes por rota.")
+REGISTRY.histogram(STAGE_SECONDS, "Duracao das etapas das requisicoes.")
+REGISTRY.histogram(KV_SECONDS, "Duracao das idas ao KV por comando.")
+
+# etapa -> segundos acumulados na requisicao corrente
+_TIMINGS: ContextVar[Optional[Dict[str, float]]] = ContextVar("calctribut_timings", default=None)
+_NOOP: ContextManager[None] = nullcontext()
+
+
+def record(stage_name: str, seconds: float) -> None:
+    """Soma ``seconds`` a etapa na requisicao corrente e no histograma da etapa."""
+    timings = _TIMINGS.get()
+    if timings is not None:
+        timings[stage_name] = timings.get(stage_name, 0.0) + seconds
+    REGISTRY.observe(STAGE_SECONDS, (("stage", stage_name),), seconds)
+
+
+class _Stage:
+    __slots__ = ("name", "started")
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.started = 0.0
+
+    def __enter__(self) -> None:
+        self.started = time.perf_counter()
+
+    def __exit__(self, *exc: Any) -> None:
+        record(self.name, time.perf_counter() - self.started)
+
+
+class _KVCommand(_Stage):
+    __slots__ = ()
+
+    def __exit__(self, *exc: Any) -> None:
+        seconds = time.perf_counter() - self.started
+        REGISTRY.observe(KV_SECONDS, (("command", self.name),), seconds)
+        record("kv", seconds)
+
+
+def stage(name: str) -> ContextManager[None]:
+    """Mede o bloco como a etapa ``name`` (nada faz com as metricas desligadas)."""
+    return _Stage(name) if ENABLED else _NOOP
+
+
+def kv_command(command: str) -> ContextManager[None]:
+    """Mede uma ida ao KV (etapa ``kv`` e histograma por comando)."""
+    return _KVCommand(command.upper()) if ENABLED else _NOOP
+
+
+def server_timing(timings: Dict[str, float], total: float) -> str:
+    """Valor do cabecalho ``Server-Timing`` (duracoes em milissegundos)."""
+    entries = [f"{name};dur={seconds * 1000:.2f}" for name, seconds in timings.items()]
+    entries.append(f"total;dur={total * 1000:.2f}")
+    return ", ".join(entries)
+
+
+class RequestTiming:
+    """Medicao de uma requisicao: ``begin_request`` ... ``finish``."""
+
+    __slots__ = ("timings", "started", "_token")
+
+    def __init__(self) -> None:
+        self.timings: Dict[str, float] = {}
+        self.started = time.perf_counter()
+        self._token: Optional[Token] = _TIMINGS.set(self.timings)
+
+    def finish(self, method: str, route: Optional[str], status: int) -> str:
+        """Registra a duracao da rota e devolve o ``Server-Timing``."""
+        total = time.perf_counter() - self.started
+        if self._token is not None:
+            _TIMINGS.reset(self._token)
+            self._token = None
+        labels = (("method", method), ("route", route or UNMATCHED_ROUTE), ("status", str(status)))
+        REGISTRY.observe(REQUEST_SECONDS, labels, total)
+        return server_timing(self.timings, total)
+
+
+def begin_request() -> Optional[RequestTiming]:
+    return RequestTiming() if ENABLED else None
+
+
+Receive = Callable[[], Awaitable[Dict[str, Any]]]
+Send = Callable[[Dict[str, Any]], Awaitable[None]]
+
+
+class TimingMiddleware:
+    """Middleware ASGI que adiciona o ``Server-Timing`` e registra a rota."""
+
+    def __init__(self, app: Callable[..., Awaitable[None]]) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Dict[str, Any], receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not ENABLED:
+            await self.app(scope, receive, send)
+            return
+        timing = RequestTiming()
+        status = [500]
+
+        async def send_with_timing(message: Dict[str, Any]) -> None:
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+                total = time.perf_counter() - timing.started
+                header = (b"server-timing", server_timing(timing.timings, total).encode("latin-1"))
+                message = {**message, "headers": [*message.get("headers", []), header]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            # o roteador do FastAPI guarda a rota encontrada no escopo
+            timing.finish(scope["method"], getattr(scope.get("route"), "path", None), status[0])
@@ -1,14 +1,27 @@
-﻿from pydantic import BaseModel, Field, field_validator
+﻿from typing import Annotated
 
+from pydantic import BaseModel, ConfigDict, Field, field_validator, model_validator
 
-class AnnualExpenses(BaseModel):
+from .sensitivity import MAX_AXIS_STEPS, Axis, validate_axes
+from .solver import DEFAULT_OPTIMIZATION_POINTS, MAX_OPTIMIZATION_POINTS, validate_pro_labore_range
+
+NonNegative = Annotated[float, Field(ge=0)]
+
+
+class _Input(BaseModel):
+    """Entrada das rotas: ``NaN`` e ``Infinity`` sao recusados nos numeros."""
+
+    model_config = ConfigDict(allow_inf_nan=False)
+
+
+class AnnualExpenses(_Input):
     secretaria: float = Field(0, ge=0)
     aluguel_condominio: float = Field(0, ge=0)
     contador: float = Field(0, ge=0)
     outras_despesas: float = Field(0, ge=0)
 
 
-class CalculationInput(BaseModel):
+class CalculationInput(_Input):
     nome_cliente: str | None = None
     nome_empresa: str | None = None
     rendimento_mensal: float = Field(..., ge=0)
@@ -23,3 +36,75 @@ class CalculationInput(BaseModel):
         if value < 0:
             raise ValueError("salario_minimo nao pode ser negativo")
         return value
+
+
+class BreakEvenInput(_Input):
+    despesas_anuais: AnnualExpenses = Field(default_factory=AnnualExpenses)
+    pro_labore: float = Field(0, ge=0)
+    iss_fixo: float = Field(0, ge=0)
+    salario_minimo: float = Field(0, ge=0)
+
+
+class ProLaboreOptimizationInput(_Input):
+    rendimento_mensal: float = Field(..., ge=0)
+    despesas_anuais: AnnualExpenses = Field(default_factory=AnnualExpenses)
+    iss_fixo: float = Field(0, ge=0)
+    salario_minimo: float = Field(0, ge=0)
+    pro_labore_min: float | None = Field(None, ge=0)
+    pro_labore_max: float | None = Field(None, ge=0)
+    pontos: int = Field(DEFAULT_OPTIMIZATION_POINTS, ge=2, le=MAX_OPTIMIZATION_POINTS)
+
+    @model_validator(mode="after")
+    def validate_limites(self) -> "ProLaboreOptimizationInput":
+        validate_pro_labore_range(self.pro_labore_min, self.pro_labore_max)
+        return self
+
+
+class SensitivityAxis(_Input):
+    campo: str
+    inicio: float = Field(..., ge=0)
+    fim: float = Field(..., ge=0)
+    passos: int = Field(..., ge=1, le=MAX_AXIS_STEPS)
+
+    def to_axis(self) -> Axis:
+        return Axis(self.campo, self.inicio, self.fim, self.passos)
+
+
+class SensitivityInput(_Input):
+    rendimento_mensal: float = Field(0, ge=0)
+    despesas_anuais: AnnualExpenses = Field(default_factory=AnnualExpenses)
+    pro_labore: float = Field(0, ge=0)
+    iss_fixo: float = Field(0, ge=0)
+    salario_minimo: float = Field(0, ge=0)
+    eixo_x: SensitivityAxis
+    eixo_y: SensitivityAxis
+    stream: bool = False
+
+    @model_validator(mode="after")
+    def validate_eixos(self) -> "SensitivityInput":
+        validate_axes(self.eixo_x.to_axis(), self.eixo_y.to_axis())
+        return self
+
+
+class BatchExpenses(_Input):
+    secretaria: list[NonNegative] | None = None
+    aluguel_condominio: list[NonNegative] | None = None
+    contador: list[NonNegative] | None = None
+    outras_despesas: list[NonNegative] | None = None
+
+
+class BatchCalculationInput(_Input):
+    rendimento_mensal: list[NonNegative]
+    despesas_anuais: BatchExpenses = Field(default_factory=BatchExpenses)
+    pro_labore: list[NonNegative] | None = None
+    iss_fixo: list[NonNegative] | None = None
+    salario_minimo: list[NonNegative] | None = None
+
+    @model_validator(mode="after")
+    def validate_sizes(self) -> "BatchCalculationInput":
+        size = len(self.rendimento_mensal)
+        columns = [self.pro_labore, self.iss_fixo, self.salario_minimo]
+        columns.extend(getattr(self.despesas_anuais, name) for name in BatchExpenses.model_fields)
+        if any(column is not None and len(column) != size for column in columns):
+            raise ValueError("todas as colunas devem ter o mesmo tamanho de rendimento_mensal")
+        return self
@@ -0,0 +1,248 @@
+"""Recalculo do acervo quando as regras tributarias mudam.
+
+    python -m backend.recompute --data-dir data/simulacoes --limite 500
+
+O ``input`` de cada simulacao gravada e recalculado com as regras vigentes
+(em lotes, com ``calculate_batch``) e o registro e regravado com o novo
+``output`` e o ``rules_version`` dessas regras. O ``output`` anterior nao se
+perde: fica em ``outputs_anteriores``, indexado pela versao das regras que o
+gerou (``sem_versao`` para registros de antes do versionamento). Registros ja
+nessa versao sao pulados, entao o job pode ser interrompido e retomado. Os lotes sao lidos
+pela paginacao por cursor e, com ``--processos``, calculados em paralelo;
+no maximo alguns lotes ficam em memoria ao mesmo tempo.
+
+O relatorio (NDJSON) lista os clientes cujo veredito PF x PJ mudou ou cuja
+economia tributaria variou pelo menos ``--limite`` reais.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, TextIO, Tuple, Union
+
+from .bulk import calculate_inputs, format_validation_error
+from .constants import get_rules_snapshot
+from .export import Fetch, GetMany, iter_summary_batches
+from .storage import open_storage
+
+DEFAULT_BATCH_SIZE = 1000
+DEFAULT_THRESHOLD = 100.0
+# chave em ``outputs_anteriores`` de registros gravados sem ``rules_version``
+UNVERSIONED = "sem_versao"
+
+Output = Dict[str, Dict[str, float]]
+SaveMany = Callable[[List[Dict[str, Any]]], Any]
+
+
+@dataclass
+class RecomputeReport:
+    rules_version: str
+    total: int = 0
+    recalculados: int = 0
+    ja_atualizados: int = 0
+    veredito_alterado: int = 0
+    economia_alterada: int = 0
+    erros: List[Tuple[str, str]] = field(default_factory=list)
+    segundos: float = 0.0
+
+
+def verdict(output: Optional[Dict[str, Any]]) -> Optional[str]:
+    """``"PJ"`` quando a PJ gera economia, ``"PF"`` caso contrario."""
+    economia = ((output or {}).get("comparativo") or {}).get("economia_tributaria")
+    if economia is None:
+        return None
+    return "PJ" if economia > 0 else "PF"
+
+
+def recalculate_inputs(inputs: List[Any], rules: Dict[str, Any]) -> List[Union[Output, str]]:
+    """Novo ``output`` de cada ``input``; entradas invalidas viram a mensagem de erro.
+
+    Funcao de modulo para poder rodar nos processos do pool.
+    """
+    from pydantic import ValidationError
+
+    from .models import CalculationInput
+
+    results: List[Union[Output, str]] = [""] * len(inputs)
+    valid: List[CalculationInput] = []
+    positions: List[int] = []
+    for index, raw in enumerate(inputs):
+        try:
+            valid.append(CalculationInput.model_validate(raw or {}))
+        except ValidationError as exc:
+            results[index] = format_validation_error(exc)
+            continue
+        positions.append(index)
+    for index, output in zip(positions, calculate_inputs(valid, rules)):
+        results[index] = output
+    return results
+
+
+def replace_output(record: Dict[str, Any], output: Output, rules_version: str) -> None:
+    """Grava o novo ``output`` guardando o atual em ``outputs_anteriores[versao]``."""
+    previous = record.get("rules_version") or UNVERSIONED
+    if record.get("output") is not None and previous != rules_version:
+        record.setdefault("outputs_anteriores", {})[previous] = record["output"]
+    record["output"] = output
+    record["rules_version"] = rules_version
+
+
+def compare_outputs(
+    record: Dict[str, Any], output: Output, threshold: float = DEFAULT_THRESHOLD
+) -> Optional[Dict[str, Any]]:
+    """Linha do relatorio quando o veredito mudou ou a economia variou ``>= threshold``."""
+    old = (record.get("output") or {}).get("comparativo") or {}
+    old_economia = old.get("economia_tributaria")
+    new_economia = output["comparativo"]["economia_tributaria"]
+    old_verdict = verdict(record.get("output"))
+    new_verdict = verdict(output)
+    diferenca = None if old_economia is None else new_economia - old_economia
+    if old_verdict == new_verdict and diferenca is not None and abs(diferenca) < threshold:
+        return None
+    return {
+        "id": record.get("id"),
+        "nome_cliente": record.get("nome_cliente"),
+        "nome_empresa": record.get("nome_empresa"),
+        "rules_version_anterior": record.get("rules_version"),
+        "veredito_anterior": old_verdict,
+        "veredito_novo": new_verdict,
+        "economia_anterior": old_economia,
+        "economia_nova": new_economia,
+        "diferenca": diferenca,
+    }
+
+
+def _iter_record_batches(
+    fetch: Fetch, get_many: GetMany, batch_size: int, report: RecomputeReport, force: bool
+) -> Iterator[List[Dict[str, Any]]]:
+    for summaries in iter_summary_batches(fetch, batch_size=batch_size):
+        batch = []
+        for record in get_many([summary["id"] for summary in summaries]):
+            if record is None:
+                continue
+            report.total += 1
+            if not force and record.get("rules_version") == report.rules_version:
+                report.ja_atualizados += 1
+                continue
+            batch.append(record)
+        if batch:
+            yield batch
+
+
+def _recalculate_batches(
+    batches: Iterable[List[Dict[str, Any]]], rules: Dict[str, Any], processes: int
+) -> Iterator[Tuple[List[Dict[str, Any]], List[Union[Output, str]]]]:
+    """``(lote, resultados)`` na ordem de leitura, com no maximo ``processes`` lotes em calculo."""
+    if processes <= 1:
+        for batch in batches:
+            yield batch, recalculate_inputs([record.get("input") for record in batch], rules)
+        return
+    with ProcessPoolExecutor(processes) as pool:
+        pending: deque = deque()
+        for batch in batches:
+            pending.append((batch, pool.submit(recalculate_inputs, [record.get("input") for record in batch], rules)))
+            if len(pending) >= processes:
+                done, future = pending.popleft()
+                yield done, future.result()
+        while pending:
+            done, future = pending.popleft()
+            yield done, future.result()
+
+
+def recompute_archive(
+    fetch: Fetch,
+    get_many: GetMany,
+    save_many: Optional[SaveMany],
+    threshold: float = DEFAULT_THRESHOLD,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    processes: int = 1,
+    force: bool = False,
+    report_stream: Optional[TextIO] = None,
+) -> RecomputeReport:
+    """Recalcula o acervo com as regras vigentes; ``save_many=None`` so gera o relatorio.
+
+    ``fetch``/``get_many`` seguem ``FileStorage.list_summaries``/``get_many``.
+    Cada cliente alterado vira uma linha JSON em ``report_stream``.
+    """
+    snapshot = get_rules_snapshot()
+    report = RecomputeReport(rules_version=snapshot.version)
+    started = time.perf_counter()
+    batches = _iter_record_batches(fetch, get_many, batch_size, report, force)
+    for batch, results in _recalculate_batches(batches, snapshot.rules, processes):
+        updated = []
+        for record, result in zip(batch, results):
+            if isinstance(result, str):
+                report.erros.append((record.get("id", ""), result))
+                continue
+            change = compare_outputs(record, result, threshold)
+            if change is not None:
+                if change["veredito_anterior"] != change["veredito_novo"]:
+                    report.veredito_alterado += 1
+                else:
+                    report.economia_alterada += 1
+                if report_stream is not None:
+                    report_stream.write(json.dumps(change, ensure_ascii=False) + "\n")
+            replace_output(record, result, snapshot.version)
+            updated.append(record)
+        if save_many is not None and updated:
+            save_many(updated)
+        report.recalculados += len(updated)
+    report.segundos = time.perf_counter() - started
+    return report
+
+
+def print_report(report: RecomputeReport, stream: Any = sys.stdout) -> None:
+    for sim_id, message in report.erros:
+        print(f"{sim_id}: {message}", file=sys.stderr)
+    print(
+        f"regras {report.rules_version}: {report.recalculados} de {report.total} simulacoes recalculadas "
+        f"({report.ja_atualizados} ja atualizadas, {len(report.erros)} com erro) em {report.segundos:.2f}s; "
+        f"{report.veredito_alterado} mudaram de veredito, {report.economia_alterada} mudaram de economia",
+        file=stream,
+    )
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Recalcula as simulacoes gravadas com as regras vigentes.")
+    parser.add_argument(
+        "--data-dir",
+        type=Path,
+        default=Path(__file__).resolve().parent.parent / "data" / "simulacoes",
+        help="diretorio das simulacoes (formato definido por STORAGE_FORMAT)",
+    )
+    parser.add_argument("--limite", type=float, default=DEFAULT_THRESHOLD, help="variacao minima da economia (R$)")
+    parser.add_argument("--lote", type=int, default=DEFAULT_BATCH_SIZE, help="simulacoes por lote")
+    parser.add_argument("--processos", type=int, default=os.cpu_count() or 1, help="processos de calculo")
+    parser.add_argument("--relatorio", type=Path, help="arquivo NDJSON do relatorio (padrao: recalculo_<versao>.ndjson)")
+    parser.add_argument("--forcar", action="store_true", help="recalcula tambem os registros ja na versao atual")
+    parser.add_argument("--simular", action="store_true", help="gera o relatorio sem regravar as simulacoes")
+    args = parser.parse_args(argv)
+
+    storage = open_storage(args.data_dir)
+    report_path = args.relatorio or Path(f"recalculo_{get_rules_snapshot().version}.ndjson")
+    with report_path.open("w", encoding="utf-8") as stream, storage.deferred_catalog():
+        report = recompute_archive(
+            storage.list_summaries,
+            storage.get_many,
+            None if args.simular else storage.save_many,
+            threshold=args.limite,
+            batch_size=max(args.lote, 1),
+            processes=max(args.processos, 1),
+            force=args.forcar,
+            report_stream=stream,
+        )
+    print_report(report)
+    print(f"relatorio: {report_path}")
+    return 1 if report.erros else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,345 @@
+"""Busca nas simulacoes salvas: texto nos nomes e faixas numericas.
+
+``SearchIndex`` fica em memoria ao lado do catalogo de resumos e e atualizado
+a cada gravacao/exclusao (``add``/``discard``), sem reconstrucao:
+
+- indice invertido termo -> ids com as palavras de ``nome_cliente`` e
+  ``nome_empresa`` (sem acentos, sem diferenciar maiusculas);
+- vocabulario ordenado: cada palavra da consulta casa, por busca binaria,
+  com todos os termos que comecam com ela;
+- bigramas dos termos: na busca aproximada (``fuzzy``) so os termos com
+  bigramas suficientes em comum passam pela distancia de edicao (1 erro
+  ate 7 letras, 2 acima disso);
+- para ``created_at`` e cada campo de ``NUMERIC_FIELDS``, valores ordenados
+  com os ids; uma faixa vira um intervalo achado por busca binaria.
+
+A consulta parte do filtro mais seletivo (palavra ou faixa) e confere os
+demais so nesses candidatos. O resultado vem do mais novo ao mais antigo.
+"""
+
+from __future__ import annotations
+
+import heapq
+import math
+import re
+import unicodedata
+from bisect import bisect_left, bisect_right, insort
+from collections import Counter
+from functools import lru_cache
+from itertools import islice
+from typing import Any, Dict, FrozenSet, Iterable, Iterator, List, Mapping, Optional, Set, Tuple
+
+from .export import parse_date_bound
+from .storage import summary_score
+
+CREATED_FIELD = "created_at"
+NUMERIC_FIELDS = ("rendimento_anual", "economia_tributaria", "aliquota_pf", "aliquota_pj_final")
+TEXT_FIELDS = ("nome_cliente", "nome_empresa")
+
+# parametro da API (``<nome>_min``/``<nome>_max``) -> campo do resumo
+RANGE_PARAMS = {
+    "rendimento": "rendimento_anual",
+    "economia": "economia_tributaria",
+    "aliquota_pf": "aliquota_pf",
+    "aliquota_pj": "aliquota_pj_final",
+}
+
+Range = Tuple[Optional[float], Optional[float]]
+
+_WORD = re.compile(r"\w+")
+
+
+def normalize(text: str) -> str:
+    """Texto sem acentos e em minusculas (``casefold``)."""
+    if text.isascii():
+        return text.casefold()
+    decomposed = unicodedata.normalize("NFKD", text)
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch)).casefold()
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    return _WORD.findall(normalize(text)) if text else []
+
+
+# os mesmos nomes se repetem muito entre as simulacoes
+@lru_cache(maxsize=65536)
+def _name_terms(text: str) -> FrozenSet[str]:
+    return frozenset(tokenize(text))
+
+
+def max_edits(term: str) -> int:
+    """Erros tolerados na busca aproximada para uma palavra de ``term``."""
+    if len(term) <= 3:
+        return 0
+    return 1 if len(term) <= 7 else 2
+
+
+def within_distance(a: str, b: str, limit: int) -> bool:
+    """Distancia de Levenshtein entre ``a`` e ``b`` e no maximo ``limit``."""
+    if abs(len(a) - len(b)) > limit:
+        return False
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        if min(current) > limit:
+            return False
+        previous = current
+    return previous[-1] <= limit
+
+
+def _bigrams(term: str) -> Set[str]:
+    padded = f"^{term}$"
+    return {padded[i : i + 2] for i in range(len(padded) - 1)}
+
+
+def _numeric(value: Any) -> Optional[float]:
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value):
+        return None
+    return float(value)
+
+
+def parse_ranges(args: Mapping[str, Any]) -> Dict[str, Range]:
+    """Faixas da busca a partir dos parametros da requisicao.
+
+    ``desde``/``ate`` seguem ``export.parse_date_bound`` (``ate`` inclui o dia
+    inteiro); ``<nome>_min``/``<nome>_max`` de ``RANGE_PARAMS`` sao inclusivos.
+    """
+    ranges: Dict[str, Range] = {}
+    desde = parse_date_bound(args.get("desde"))
+    ate = parse_date_bound(args.get("ate"), end=True)
+    if desde is not None or ate is not None:
+        # ``ate`` e exclusivo; as faixas do indice incluem as duas pontas
+        ranges[CREATED_FIELD] = (desde, math.nextafter(ate, -math.inf) if ate is not None else None)
+    for name, field in RANGE_PARAMS.items():
+        bounds = []
+        for suffix in ("_min", "_max"):
+            raw = args.get(name + suffix)
+            try:
+                value = float(raw) if raw not in (None, "") else None
+            except ValueError:
+                raise ValueError(f"{name + suffix} invalido")
+            if value is not None and not math.isfinite(value):
+                raise ValueError(f"{name + suffix} invalido")
+            bounds.append(value)
+        if bounds != [None, None]:
+            ranges[field] = (bounds[0], bounds[1])
+    return ranges
+
+
+class _SortedField:
+    """Valores de um campo em ordem crescente, com os ids na mesma posicao."""
+
+    def __init__(self, pairs: Iterable[Tuple[float, str]] = ()) -> None:
+        ordered = sorted(pairs)
+        self.values: List[float] = [value for value, _ in ordered]
+        self.ids: List[str] = [sim_id for _, sim_id in ordered]
+
+    def add(self, value: float, sim_id: str) -> None:
+        index = bisect_right(self.values, value)
+        self.values.insert(index, value)
+        self.ids.insert(index, sim_id)
+
+    def remove(self, value: float, sim_id: str) -> None:
+        index = bisect_left(self.values, value)
+        while index < len(self.ids) and self.values[index] == value:
+            if self.ids[index] == sim_id:
+                del self.values[index]
+                del self.ids[index]
+                return
+            index += 1
+
+    def span(self, low: Optional[float], high: Optional[float]) -> Tuple[int, int]:
+        start = bisect_left(self.values, low) if low is not None else 0
+        end = bisect_right(self.values, high) if high is not None else len(self.values)
+        return start, max(start, end)
+
+
+class SearchIndex:
+    """Indices de busca sobre resumos (``storage.summarize_record``)."""
+
+    def __init__(self, summaries: Iterable[Dict[str, Any]] = ()) -> None:
+        self._summaries: Dict[str, Dict[str, Any]] = {}
+        # campo -> id -> valor; ``created_at`` guarda o ``summary_score``
+        self._numbers: Dict[str, Dict[str, float]] = {field: {} for field in (CREATED_FIELD, *NUMERIC_FIELDS)}
+        self._postings: Dict[str, Set[str]] = {}
+        self._grams: Dict[str, Set[str]] = {}
+        for summary in summaries:
+            sim_id = summary.get("id")
+            if not sim_id or sim_id in self._summaries:
+                continue
+            self._summaries[sim_id] = summary
+            for field, value in self._values(summary):
+                self._numbers[field][sim_id] = value
+            for term in self._terms_of(summary):
+                self._add_posting(term, sim_id)
+        self._terms: List[str] = sorted(self._postings)
+        self._fields = {
+            field: _SortedField((value, sim_id) for sim_id, value in numbers.items())
+            for field, numbers in self._numbers.items()
+        }
+
+    def __len__(self) -> int:
+        return len(self._summaries)
+
+    # -- manutencao --------------------------------------------------------
+
+    @staticmethod
+    def _terms_of(summary: Dict[str, Any]) -> FrozenSet[str]:
+        return frozenset().union(*(_name_terms(summary.get(field) or "") for field in TEXT_FIELDS))
+
+    @staticmethod
+    def _values(summary: Dict[str, Any]) -> Iterator[Tuple[str, float]]:
+        yield CREATED_FIELD, summary_score(summary)
+        for field in NUMERIC_FIELDS:
+            value = _numeric(summary.get(field))
+            if value is not None:
+                yield field, value
+
+    def _add_posting(self, term: str, sim_id: str) -> bool:
+        """Registra ``sim_id`` em ``term``; ``True`` se o termo e novo."""
+        ids = self._postings.get(term)
+        if ids is not None:
+            ids.add(sim_id)
+            return False
+        self._postings[term] = {sim_id}
+        for gram in _bigrams(term):
+            self._grams.setdefault(gram, set()).add(term)
+        return True
+
+    def add(self, summary: Dict[str, Any]) -> None:
+        """Indexa ``summary``, substituindo a versao anterior do mesmo id."""
+        sim_id = summary["id"]
+        self.discard(sim_id)
+        self._summaries[sim_id] = summary
+        for field, value in self._values(summary):
+            self._numbers[field][sim_id] = value
+            self._fields[field].add(value, sim_id)
+        for term in self._terms_of(summary):
+            if self._add_posting(term, sim_id):
+                insort(self._terms, term)
+
+    def discard(self, sim_id: str) -> bool:
+        summary = self._summaries.pop(sim_id, None)
+        if summary is None:
+            return False
+        for field, numbers in self._numbers.items():
+            value = numbers.pop(sim_id, None)
+            if value is not None:
+                self._fields[field].remove(value, sim_id)
+        for term in self._terms_of(summary):
+            ids = self._postings[term]
+            ids.discard(sim_id)
+            if ids:
+                continue
+            del self._postings[term]
+            del self._terms[bisect_left(self._terms, term)]
+            for gram in _bigrams(term):
+                terms = self._grams[gram]
+                terms.discard(term)
+                if not terms:
+                    del self._grams[gram]
+        return True
+
+    # -- consulta ----------------------------------------------------------
+
+    def _prefixed(self, word: str) -> Iterator[str]:
+        index = bisect_left(self._terms, word)
+        while index < len(self._terms) and self._terms[index].startswith(word):
+            yield self._terms[index]
+            index += 1
+
+    def _similar(self, word: str) -> Iterator[str]:
+        edits = max_edits(word)
+        if not edits:
+            return
+        grams = _bigrams(word)
+        # cada erro destroi no maximo dois bigramas distintos
+        needed = max(len(grams) - 2 * edits, 1)
+        shared = Counter(term for gram in grams for term in self._grams.get(gram, ()))
+        for term, count in shared.items():
+            if count >= needed and within_distance(word, term, edits):
+                yield term
+
+    def _matching_ids(self, word: str, fuzzy: bool) -> Set[str]:
+        terms = set(self._prefixed(word))
+        if fuzzy:
+            terms.update(self._similar(word))
+        if len(terms) == 1:
+            return self._postings[terms.pop()]
+        return set().union(*(self._postings[term] for term in terms))
+
+    def search(
+        self,
+        text: Optional[str] = None,
+        fuzzy: bool = False,
+        ranges: Optional[Mapping[str, Range]] = None,
+        limit: Optional[int] = None,
+        offset: int = 0,
+    ) -> Tuple[int, List[Dict[str, Any]]]:
+        """Total de resultados e a pagina pedida, do mais novo ao mais antigo.
+
+        Cada palavra de ``text`` precisa casar (como prefixo ou, com
+        ``fuzzy``, com poucos erros) com alguma palavra dos nomes; ``ranges``
+        mapeia ``created_at`` ou um campo de ``NUMERIC_FIELDS`` para limites
+        inclusivos (``None`` deixa o lado aberto).
+        """
+        ranges = ranges or {}
+        created = self._fields[CREATED_FIELD]
+        first, last = created.span(*ranges.get(CREATED_FIELD, (None, None)))
+        words = [self._matching_ids(word, fuzzy) for word in set(tokenize(text))]
+        if not words and set(ranges) <= {CREATED_FIELD}:
+            # so a data: a pagina sai direto da fatia ordenada
+            return last - first, self._newest(created.ids, first, last, limit, offset)
+
+        sources: List[Tuple[int, Any]] = [(len(ids), ids) for ids in words]
+        sources += [(end - start, (field, start, end)) for field, (start, end) in self._spans(ranges)]
+        # parte do filtro mais seletivo; os seguintes so reduzem o conjunto
+        sources.sort(key=lambda source: source[0])
+        matches: Optional[Set[str]] = None
+        for size, source in sources:
+            if isinstance(source, set):
+                matches = source if matches is None else matches & source
+            else:
+                field, start, end = source
+                ids = self._fields[field].ids
+                if matches is None:
+                    matches = set(ids[start:end])
+                elif len(matches) * 4 < size:
+                    low, high = ranges[field]
+                    low = -math.inf if low is None else low
+                    high = math.inf if high is None else high
+                    # ausente vira NaN, que nao passa em nenhuma comparacao
+                    get = self._numbers[field].get
+                    matches = {sim_id for sim_id in matches if low <= get(sim_id, math.nan) <= high}
+                else:
+                    matches = matches.intersection(ids[start:end])
+            if not matches:
+                return 0, []
+        assert matches is not None
+
+        total = len(matches)
+        window = offset + limit if limit is not None else total
+        if window * (last - first) < total * total:
+            # muitos resultados: percorre as datas do mais novo ate encher a pagina
+            newest = (created.ids[index] for index in range(last - 1, first - 1, -1))
+            page_ids = list(islice((sim_id for sim_id in newest if sim_id in matches), offset, window))
+        elif limit is not None:
+            page_ids = heapq.nlargest(window, matches, key=self._order)[offset:]
+        else:
+            page_ids = sorted(matches, key=self._order, reverse=True)[offset:]
+        return total, [self._summaries[sim_id] for sim_id in page_ids]
+
+    def _spans(self, ranges: Mapping[str, Range]) -> Iterator[Tuple[str, Tuple[int, int]]]:
+        for field, bounds in ranges.items():
+            yield field, self._fields[field].span(*bounds)
+
+    def _newest(self, ids: List[str], start: int, end: int, limit: Optional[int], offset: int) -> List[Dict[str, Any]]:
+        """Pagina de ``ids[start:end]`` (ja em ordem de data) sem percorrer a faixa."""
+        stop = max(end - offset, start)
+        first = max(stop - limit, start) if limit is not None else start
+        return [self._summaries[sim_id] for sim_id in reversed(ids[first:stop])]
+
+    def _order(self, sim_id: str) -> Tuple[float, str]:
+        return self._numbers[CREATED_FIELD][sim_id], sim_id
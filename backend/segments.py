@@ -0,0 +1,321 @@
+"""Formato compacto: um arquivo de segmentos por empresa.
+
+Cada simulacao e anexada a ``<data_dir>/<empresa>.seg`` como um quadro::
+
+    [tamanho do id: uint16][tamanho do payload: uint32][id][payload]
+
+onde o payload e o JSON compacto do registro comprimido com zlib. Exclusoes
+e regravacoes tambem sao anexadas (a exclusao e um quadro com payload vazio)
+e o ultimo quadro de cada id vale. O indice ``id -> (offset, tamanho)`` e
+montado lendo apenas os cabecalhos e, como o arquivo so cresce, e atualizado
+lendo so o trecho novo. ``compact`` regrava o segmento sem quadros mortos.
+
+Gravacoes e compactacao seguram uma trava exclusiva (``flock``) do segmento:
+com varios processos no mesmo diretorio, quem grava primeiro le os quadros
+anexados pelos outros, e so descarta o fim do arquivo se, com a trava, o
+ultimo quadro estiver mesmo incompleto.
+
+Conversao de uma arvore existente::
+
+    python -m backend.segments data/simulacoes --para segment
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import struct
+import zlib
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, BinaryIO, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .storage import CATALOG_NAME, FileStorage, file_lock, open_storage
+
+SEGMENT_SUFFIX = ".seg"
+COMPRESSION_LEVEL = 6
+# Janela de 4 KiB e memLevel 4: registros tem ~1-2 KiB e o custo dominante e
+# inicializar o compressor; ``zlib.decompress`` le qualquer janela.
+COMPRESSION_WBITS = 12
+COMPRESSION_MEMLEVEL = 4
+
+_HEADER = struct.Struct(">HI")
+
+
+class _SegmentIndex:
+    def __init__(self, inode: int = 0) -> None:
+        # o inode muda quando outro processo compacta o segmento
+        self.inode = inode
+        self.size = 0
+        self.offsets: Dict[str, Tuple[int, int]] = {}
+        self.dead = 0
+
+
+def encode_frame(sim_id: str, record: Optional[Dict[str, Any]]) -> bytes:
+    """Quadro de um registro (``None`` gera o quadro de exclusao)."""
+    key = sim_id.encode("utf-8")
+    payload = b""
+    if record is not None:
+        raw = json.dumps(record, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        compressor = zlib.compressobj(COMPRESSION_LEVEL, zlib.DEFLATED, COMPRESSION_WBITS, COMPRESSION_MEMLEVEL)
+        payload = compressor.compress(raw) + compressor.flush()
+    return _HEADER.pack(len(key), len(payload)) + key + payload
+
+
+def _decode_payload(payload: bytes) -> Optional[Dict[str, Any]]:
+    try:
+        return json.loads(zlib.decompress(payload))
+    except (zlib.error, ValueError):
+        return None
+
+
+class SegmentStorage(FileStorage):
+    """``FileStorage`` com os registros em segmentos comprimidos por empresa."""
+
+    FORMAT = "segment"
+
+    def __init__(self, data_dir: Path, **kwargs: Any) -> None:
+        super().__init__(data_dir, **kwargs)
+        self._indexes: Dict[str, _SegmentIndex] = {}
+
+    def _segment_path(self, slug: str) -> Path:
+        return self.data_dir / f"{slug}{SEGMENT_SUFFIX}"
+
+    @staticmethod
+    def _split(sim_id: str) -> Tuple[str, str]:
+        slug, _, name = sim_id.partition("/")
+        return slug, name
+
+    def _index(self, slug: str) -> _SegmentIndex:
+        """Indice do segmento, lendo apenas os quadros anexados desde a ultima vez."""
+        index = self._indexes.get(slug)
+        try:
+            stat = self._segment_path(slug).stat()
+        except FileNotFoundError:
+            self._indexes.pop(slug, None)
+            return _SegmentIndex()
+        size = stat.st_size
+        if index is None or index.inode != stat.st_ino or size < index.size:
+            # novo ou compactado por outro processo
+            index = self._indexes[slug] = _SegmentIndex(stat.st_ino)
+        if size > index.size:
+            self._scan_frames(slug, index)
+        return index
+
+    def _scan_frames(self, slug: str, index: _SegmentIndex) -> None:
+        with self._segment_path(slug).open("rb") as handle:
+            end = os.fstat(handle.fileno()).st_size
+            handle.seek(index.size)
+            while True:
+                header = handle.read(_HEADER.size)
+                if len(header) < _HEADER.size:
+                    break
+                key_size, payload_size = _HEADER.unpack(header)
+                key = handle.read(key_size)
+                offset = handle.tell()
+                handle.seek(payload_size, os.SEEK_CUR)
+                if len(key) < key_size or handle.tell() > end:
+                    # quadro incompleto (gravacao interrompida)
+                    break
+                sim_id = key.decode("utf-8")
+                if sim_id in index.offsets:
+                    index.dead += 1
+                if payload_size:
+                    index.offsets[sim_id] = (offset, payload_size)
+                else:
+                    index.offsets.pop(sim_id, None)
+                    index.dead += 1
+                index.size = offset + payload_size
+
+    @contextmanager
+    def _locked_segment(self, slug: str) -> Iterator[BinaryIO]:
+        """Segmento aberto para anexar, com a trava exclusiva entre processos."""
+        path = self._segment_path(slug)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        while True:
+            with path.open("ab") as handle, file_lock(handle):
+                try:
+                    current = path.stat().st_ino
+                except FileNotFoundError:
+                    current = None
+                # se outro processo compactou enquanto esperavamos, a trava e do arquivo antigo
+                if current == os.fstat(handle.fileno()).st_ino:
+                    yield handle
+                    return
+
+    def _append(self, slug: str, frames: bytes) -> None:
+        with self._locked_segment(slug) as handle:
+            # com a trava, o indice inclui os quadros anexados por outros processos
+            index = self._index(slug)
+            if handle.seek(0, os.SEEK_END) > index.size:
+                # o que sobra depois do ultimo quadro completo e uma gravacao interrompida
+                handle.truncate(index.size)
+            handle.write(frames)
+            # antes de soltar a trava: senao o proximo processo ve o arquivo sem
+            # estes quadros e os corta como gravacao interrompida
+            handle.flush()
+            if self.fsync:
+                # um fsync por segmento e lote (os quadros do lote vao juntos)
+                os.fsync(handle.fileno())
+        self._index(slug)
+
+    # -- formato -----------------------------------------------------------
+
+    def _write_record(self, sim_id: str, record: Dict[str, Any]) -> None:
+        self._append(self._split(sim_id)[0], encode_frame(sim_id, record))
+
+    def _write_records(self, records: List[Dict[str, Any]]) -> None:
+        frames: Dict[str, List[bytes]] = {}
+        for record in records:
+            sim_id = record["id"]
+            frames.setdefault(self._split(sim_id)[0], []).append(encode_frame(sim_id, record))
+        for slug, chunk in frames.items():
+            self._append(slug, b"".join(chunk))
+
+    def _read_record(self, sim_id: str) -> Optional[Dict[str, Any]]:
+        slug, name = self._split(sim_id)
+        if not slug or not name:
+            return None
+        with self._lock:
+            location = self._index(slug).offsets.get(sim_id)
+        if location is None:
+            return None
+        offset, size = location
+        try:
+            with self._segment_path(slug).open("rb") as handle:
+                handle.seek(offset)
+                payload = handle.read(size)
+        except OSError:
+            return None
+        return _decode_payload(payload)
+
+    def get_many(self, sim_ids: List[str]) -> List[Optional[Dict[str, Any]]]:
+        """Le os registros abrindo cada segmento uma vez, em ordem de offset."""
+        records: List[Optional[Dict[str, Any]]] = [None] * len(sim_ids)
+        by_slug: Dict[str, List[Tuple[int, str]]] = {}
+        for position, sim_id in enumerate(sim_ids):
+            slug, name = self._split(sim_id)
+            if slug and name:
+                by_slug.setdefault(slug, []).append((position, sim_id))
+        for slug, items in by_slug.items():
+            with self._lock:
+                offsets = self._index(slug).offsets
+                located = sorted((offsets[sim_id], position) for position, sim_id in items if sim_id in offsets)
+            if not located:
+                continue
+            try:
+                with self._segment_path(slug).open("rb") as handle:
+                    for (offset, size), position in located:
+                        handle.seek(offset)
+                        records[position] = _decode_payload(handle.read(size))
+            except OSError:
+                continue
+        return records
+
+    def _remove_record(self, sim_id: str) -> bool:
+        slug, name = self._split(sim_id)
+        if not slug or not name or sim_id not in self._index(slug).offsets:
+            return False
+        self._append(slug, encode_frame(sim_id, None))
+        return True
+
+    def _scan_units(self) -> Dict[str, Any]:
+        try:
+            entries = list(os.scandir(self.data_dir))
+        except FileNotFoundError:
+            return {}
+        units = {}
+        for entry in entries:
+            if entry.name.endswith(SEGMENT_SUFFIX) and entry.is_file():
+                stat = entry.stat()
+                units[entry.name[: -len(SEGMENT_SUFFIX)]] = [stat.st_mtime_ns, stat.st_size]
+        return units
+
+    def _unit_stamp(self, slug: str) -> Any:
+        stat = self._segment_path(slug).stat()
+        return [stat.st_mtime_ns, stat.st_size]
+
+    def _unit_ids(self, slug: str) -> Iterable[str]:
+        return list(self._index(slug).offsets)
+
+    # -- manutencao --------------------------------------------------------
+
+    def compact(self, slug: Optional[str] = None) -> int:
+        """Regrava os segmentos sem quadros mortos; devolve quantos foram removidos."""
+        removed = 0
+        with self._lock:
+            slugs = [slug] if slug else list(self._scan_units())
+            for name in slugs:
+                with self._locked_segment(name):
+                    index = self._index(name)
+                    if not index.dead:
+                        continue
+                    path = self._segment_path(name)
+                    tmp_path = path.with_suffix(".tmp")
+                    with tmp_path.open("wb") as handle:
+                        for sim_id in self._unit_ids(name):
+                            record = self._read_record(sim_id)
+                            if record is not None:
+                                handle.write(encode_frame(sim_id, record))
+                    os.replace(tmp_path, path)
+                    removed += index.dead
+                self._indexes.pop(name, None)
+                self._touch_unit(name)
+            if removed:
+                self._write_catalog()
+        return removed
+
+
+def convert_tree(data_dir: Path, target: str, keep: bool = False) -> int:
+    """Converte as simulacoes de ``data_dir`` para o formato ``target``.
+
+    Os registros sao copiados para o novo formato, o catalogo e reconstruido
+    e, a menos que ``keep`` seja verdadeiro, os arquivos antigos sao removidos.
+    Devolve quantas simulacoes foram convertidas.
+    """
+    source: FileStorage = open_storage(data_dir, "json" if target == "segment" else "segment")
+    destination = open_storage(data_dir, target)
+    converted: List[str] = []
+    for slug in source._scan_units():
+        for sim_id in list(source._unit_ids(slug)):
+            record = source._read_record(sim_id)
+            if record is None:
+                continue
+            record.setdefault("id", sim_id)
+            destination._write_record(sim_id, record)
+            converted.append(sim_id)
+    if not keep:
+        for slug in source._scan_units():
+            if isinstance(source, SegmentStorage):
+                source._segment_path(slug).unlink()
+                continue
+            for sim_id in converted:
+                if sim_id.startswith(f"{slug}/"):
+                    source._remove_record(sim_id)
+            try:
+                (data_dir / slug).rmdir()
+            except OSError:
+                pass
+    (data_dir / CATALOG_NAME).unlink(missing_ok=True)
+    destination.rebuild()
+    return len(converted)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Converte o armazenamento das simulacoes.")
+    parser.add_argument("data_dir", type=Path, help="diretorio das simulacoes (ex.: data/simulacoes)")
+    parser.add_argument("--para", choices=("segment", "json"), default="segment", help="formato de destino")
+    parser.add_argument("--manter", action="store_true", help="nao remove os arquivos no formato antigo")
+    parser.add_argument("--compactar", action="store_true", help="apenas compacta os segmentos existentes")
+    args = parser.parse_args(argv)
+    if args.compactar:
+        removed = SegmentStorage(args.data_dir).compact()
+        print(f"{removed} quadros removidos")
+        return
+    total = convert_tree(args.data_dir, args.para, keep=args.manter)
+    print(f"{total} simulacoes convertidas para {args.para}")
+
+
+if __name__ == "__main__":
+    main()
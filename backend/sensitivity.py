@@ -0,0 +1,147 @@
+"""Grade de sensibilidade sobre dois campos de entrada.
+
+Cada linha da grade (um valor do eixo ``y``) e calculada de uma vez com
+``calculate_comparativo_batch`` e ja serializada em JSON, para que grades
+grandes possam ser enviadas linha a linha (NDJSON).
+"""
+
+from __future__ import annotations
+
+from math import isfinite
+from typing import Any, Dict, Iterator, List, Mapping, NamedTuple, Optional
+
+from .batch import EXPENSE_FIELDS, calculate_comparativo_batch
+from .constants import get_rules
+from .serialization import dumps
+
+SCENARIO_FIELDS = ("rendimento_mensal", "pro_labore", "iss_fixo", "salario_minimo")
+SENSITIVITY_FIELDS = SCENARIO_FIELDS + EXPENSE_FIELDS
+MAX_AXIS_STEPS = 1000
+MAX_GRID_CELLS = 1_000_000
+
+# Saidas da grade e casas decimais usadas na serializacao.
+OUTPUTS = {
+    "economia_tributaria": 2,
+    "aliquota_pf": 6,
+    "aliquota_pj_final": 6,
+}
+
+
+class Axis(NamedTuple):
+    campo: str
+    inicio: float
+    fim: float
+    passos: int
+
+    def values(self) -> List[float]:
+        if self.passos == 1:
+            return [self.inicio]
+        step = (self.fim - self.inicio) / (self.passos - 1)
+        return [self.inicio + step * index for index in range(self.passos)]
+
+
+def validate_axes(x_axis: Axis, y_axis: Axis) -> None:
+    for axis in (x_axis, y_axis):
+        if axis.campo not in SENSITIVITY_FIELDS:
+            raise ValueError(f"campo de eixo invalido: {axis.campo}")
+        if not 1 <= axis.passos <= MAX_AXIS_STEPS:
+            raise ValueError(f"passos deve estar entre 1 e {MAX_AXIS_STEPS}")
+        if not (isfinite(axis.inicio) and isfinite(axis.fim)):
+            raise ValueError(f"{axis.campo}: inicio e fim devem ser finitos")
+        if axis.inicio < 0 or axis.fim < 0:
+            raise ValueError(f"{axis.campo} nao pode ser negativo")
+    if x_axis.campo == y_axis.campo:
+        raise ValueError("os eixos devem usar campos diferentes")
+    if x_axis.passos * y_axis.passos > MAX_GRID_CELLS:
+        raise ValueError(f"a grade deve ter no maximo {MAX_GRID_CELLS} celulas")
+
+
+def _format_column(values: List[float], decimals: int) -> str:
+    """Coluna em JSON com ``decimals`` casas; celulas que estouram viram ``null``."""
+    template = f"%.{decimals}f"
+    if all(map(isfinite, values)):
+        return "[" + ",".join(map(template.__mod__, values)) + "]"
+    return "[" + ",".join(template % value if isfinite(value) else "null" for value in values) + "]"
+
+
+def _axis_json(axis: Axis, values: List[float]) -> Dict[str, Any]:
+    return {"campo": axis.campo, "inicio": axis.inicio, "fim": axis.fim, "passos": axis.passos, "valores": values}
+
+
+def _scenario_columns(scenario: Mapping[str, Any], axis: Axis, values: List[float]) -> Dict[str, Any]:
+    size = len(values)
+    columns: Dict[str, Any] = {name: [scenario[name]] * size for name in SCENARIO_FIELDS}
+    expenses = {name: [scenario["annual_expenses"][name]] * size for name in EXPENSE_FIELDS}
+    if axis.campo in EXPENSE_FIELDS:
+        expenses[axis.campo] = values
+    else:
+        columns[axis.campo] = values
+    columns["annual_expenses"] = expenses
+    return columns
+
+
+def iter_sensitivity_rows(
+    scenario: Mapping[str, Any],
+    x_axis: Axis,
+    y_axis: Axis,
+    rules: Optional[Mapping[str, Any]] = None,
+) -> Iterator[Dict[str, str]]:
+    """Gera, para cada valor de ``y``, as saidas da linha ja em texto JSON.
+
+    ``scenario`` segue o formato de ``_parse_calculation_payload``: os campos
+    de ``SCENARIO_FIELDS`` mais ``annual_expenses`` com as despesas anuais.
+    """
+    rules = rules if rules is not None else get_rules()
+    x_values = x_axis.values()
+    for y_value in y_axis.values():
+        row_scenario = dict(scenario)
+        row_scenario["annual_expenses"] = dict(scenario["annual_expenses"])
+        if y_axis.campo in EXPENSE_FIELDS:
+            row_scenario["annual_expenses"][y_axis.campo] = y_value
+        else:
+            row_scenario[y_axis.campo] = y_value
+        columns = _scenario_columns(row_scenario, x_axis, x_values)
+        result = calculate_comparativo_batch(
+            monthly_income=columns["rendimento_mensal"],
+            annual_expenses=columns["annual_expenses"],
+            pro_labore_monthly=columns["pro_labore"],
+            iss_fixo=columns["iss_fixo"],
+            salario_minimo=columns["salario_minimo"],
+            rules=rules,
+        )
+        row = {name: _format_column(result[name], decimals) for name, decimals in OUTPUTS.items()}
+        row["y"] = dumps(y_value)
+        yield row
+
+
+def sensitivity_header(x_axis: Axis, y_axis: Axis) -> Dict[str, Any]:
+    return {"x": _axis_json(x_axis, x_axis.values()), "y": _axis_json(y_axis, y_axis.values())}
+
+
+def sensitivity_json(
+    scenario: Mapping[str, Any],
+    x_axis: Axis,
+    y_axis: Axis,
+    rules: Optional[Mapping[str, Any]] = None,
+) -> str:
+    """Grade completa como um objeto JSON com uma matriz ``[y][x]`` por saida."""
+    matrices: Dict[str, List[str]] = {name: [] for name in OUTPUTS}
+    for row in iter_sensitivity_rows(scenario, x_axis, y_axis, rules):
+        for name in OUTPUTS:
+            matrices[name].append(row[name])
+    header = dumps(sensitivity_header(x_axis, y_axis))
+    body = ",".join(f'"{name}":[{",".join(rows)}]' for name, rows in matrices.items())
+    return header[:-1] + "," + body + "}"
+
+
+def sensitivity_ndjson(
+    scenario: Mapping[str, Any],
+    x_axis: Axis,
+    y_axis: Axis,
+    rules: Optional[Mapping[str, Any]] = None,
+) -> Iterator[str]:
+    """Grade em NDJSON: uma linha de cabecalho com os eixos e uma por valor de ``y``."""
+    yield dumps(sensitivity_header(x_axis, y_axis)) + "\n"
+    for row in iter_sensitivity_rows(scenario, x_axis, y_axis, rules):
+        fields = ",".join(f'"{name}":{row[name]}' for name in ("y", *OUTPUTS))
+        yield "{" + fields + "}\n"
@@ -0,0 +1,44 @@
+"""Serializacao JSON compartilhada pelas duas APIs.
+
+``make_encoder`` monta um ``json.JSONEncoder`` compacto, sem escapar
+acentos e sem a checagem de referencias circulares (as respostas sao
+arvores simples de dicts e listas); o ``encode`` roda no acelerador em C.
+``number`` escreve um numero como o ``json`` escreveria, e e usado pelos
+tipos de resultado do calculo para gerar o JSON direto dos campos.
+"""
+
+from __future__ import annotations
+
+import json
+from typing import Any, Callable, Optional
+
+_INFINITY = float("inf")
+
+
+def make_encoder(default: Optional[Callable[[Any], Any]] = None, allow_nan: bool = True) -> json.JSONEncoder:
+    return json.JSONEncoder(
+        ensure_ascii=False,
+        check_circular=False,
+        allow_nan=allow_nan,
+        separators=(",", ":"),
+        default=default,
+    )
+
+
+ENCODER = make_encoder()
+
+
+def dumps(obj: Any) -> str:
+    """JSON compacto de ``obj`` (so tipos nativos do ``json``)."""
+    return ENCODER.encode(obj)
+
+
+def number(value: float) -> str:
+    """Numero em JSON, com ``NaN``/``Infinity`` como no ``json.dumps``."""
+    if value != value:
+        return "NaN"
+    if value == _INFINITY:
+        return "Infinity"
+    if value == -_INFINITY:
+        return "-Infinity"
+    return repr(value)
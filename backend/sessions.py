@@ -0,0 +1,180 @@
+"""Sessoes de login do FastAPI (token -> usuario) com validade.
+
+``SESSION_STORE`` escolhe onde as sessoes ficam:
+
+- ``memory`` (padrao): so no processo, num LRU limitado (``SESSION_MAX``).
+  Some ao reiniciar e nao e visto pelos outros workers.
+- ``sqlite``: banco ``sessoes.sqlite3`` em modo WAL no diretorio de dados,
+  compartilhado pelos workers da mesma maquina e mantido entre reinicios.
+- ``kv``: chaves ``sess:<hash>`` no KV (Upstash), com expiracao no proprio
+  KV; serve para varias maquinas.
+
+Os armazenamentos compartilhados tem um cache local de leitura: um token ja
+visto pelo processo e validado sem I/O, e so um token desconhecido consulta
+o banco ou o KV. A validade (``SESSION_TTL``, em segundos; padrao 12 h) conta
+a partir do login e vale tambem para o cache local. Os tokens so sao
+gravados como hash SHA-256.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Callable, Optional, Tuple
+
+from .memo import MemoCache
+
+if TYPE_CHECKING:
+    from .kv import KVClient
+
+DEFAULT_TTL = 12 * 3600
+DEFAULT_MAX_SESSIONS = 10_000
+DATABASE_NAME = "sessoes.sqlite3"
+BUSY_TIMEOUT_MS = 5000
+KV_PREFIX = "sess:"
+# a cada quantos logins o SQLite apaga as sessoes vencidas
+PURGE_EVERY = 100
+
+Clock = Callable[[], float]
+
+
+def _token_key(token: str) -> str:
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+class MemorySessions:
+    """Sessoes no processo: LRU com ``maxsize`` entradas e validade ``ttl``.
+
+    Os armazenamentos compartilhados estendem esta classe com ``_load`` e
+    ``_store``; o LRU passa a ser o cache local deles.
+    """
+
+    SHARED = False
+
+    def __init__(self, ttl: float = DEFAULT_TTL, maxsize: int = DEFAULT_MAX_SESSIONS, clock: Clock = time.time) -> None:
+        self.ttl = ttl
+        self._clock = clock
+        # token -> (usuario, vencimento); o MemoCache descarta pelo mesmo relogio
+        self._local = MemoCache(maxsize=maxsize, ttl=ttl, clock=clock)
+
+    def create(self, user: str) -> str:
+        """Novo token para ``user``."""
+        token = secrets.token_urlsafe(24)
+        expires = self._clock() + self.ttl
+        self._store(token, user, expires)
+        self._local.set(token, (user, expires))
+        return token
+
+    def cached(self, token: str) -> Optional[str]:
+        """Usuario do token se ele estiver no cache local e valido (sem I/O)."""
+        entry: Optional[Tuple[str, float]] = self._local.get(token)
+        if entry is None or entry[1] <= self._clock():
+            return None
+        return entry[0]
+
+    def get(self, token: str) -> Optional[str]:
+        """Usuario do token, consultando o armazenamento compartilhado se preciso."""
+        user = self.cached(token)
+        if user is not None or not self.SHARED:
+            return user
+        loaded = self._load(token)
+        if loaded is None:
+            return None
+        user, expires = loaded
+        self._local.set(token, (user, expires))
+        return user
+
+    def _store(self, token: str, user: str, expires: float) -> None:
+        pass
+
+    def _load(self, token: str) -> Optional[Tuple[str, float]]:
+        return None
+
+
+class SQLiteSessions(MemorySessions):
+    """Sessoes num banco SQLite (WAL) compartilhado pelos processos da maquina."""
+
+    SHARED = True
+
+    def __init__(self, data_dir: Path, **kwargs: Any) -> None:
+        super().__init__(**kwargs)
+        self.data_dir = data_dir
+        self.path = data_dir / DATABASE_NAME
+        self._thread = threading.local()
+        self._created = 0
+        self._connection().execute(
+            "CREATE TABLE IF NOT EXISTS sessoes (token TEXT PRIMARY KEY, usuario TEXT NOT NULL, expira REAL NOT NULL)"
+        )
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._thread, "conn", None)
+        if conn is None:
+            self.data_dir.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT_MS / 1000, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+            self._thread.conn = conn
+        return conn
+
+    def _store(self, token: str, user: str, expires: float) -> None:
+        conn = self._connection()
+        conn.execute("INSERT OR REPLACE INTO sessoes VALUES (?, ?, ?)", (_token_key(token), user, expires))
+        self._created += 1
+        if self._created % PURGE_EVERY == 0:
+            conn.execute("DELETE FROM sessoes WHERE expira <= ?", (self._clock(),))
+
+    def _load(self, token: str) -> Optional[Tuple[str, float]]:
+        row = self._connection().execute(
+            "SELECT usuario, expira FROM sessoes WHERE token = ? AND expira > ?", (_token_key(token), self._clock())
+        ).fetchone()
+        return (row[0], row[1]) if row else None
+
+
+class KVSessions(MemorySessions):
+    """Sessoes no KV, com ``SET ... EX`` (o proprio KV expira as chaves)."""
+
+    SHARED = True
+
+    def __init__(self, client: KVClient, **kwargs: Any) -> None:
+        super().__init__(**kwargs)
+        self.client = client
+
+    def _store(self, token: str, user: str, expires: float) -> None:
+        self.client.command("SET", KV_PREFIX + _token_key(token), f"{expires!r}:{user}", "EX", max(int(self.ttl), 1))
+
+    def _load(self, token: str) -> Optional[Tuple[str, float]]:
+        raw = self.client.command("GET", KV_PREFIX + _token_key(token))
+        if not raw:
+            return None
+        expires, _, user = raw.partition(":")
+        try:
+            return user, float(expires)
+        except ValueError:
+            return None
+
+
+def open_sessions(data_dir: Path, store: Optional[str] = None) -> MemorySessions:
+    """Sessoes no armazenamento ``store`` ou da variavel ``SESSION_STORE``."""
+    store = (store or os.getenv("SESSION_STORE") or "memory").lower()
+    options = {
+        "ttl": float(os.getenv("SESSION_TTL") or DEFAULT_TTL),
+        "maxsize": int(os.getenv("SESSION_MAX") or DEFAULT_MAX_SESSIONS),
+    }
+    if store == "sqlite":
+        return SQLiteSessions(data_dir, **options)
+    if store == "kv":
+        from .kv import get_kv_client
+
+        client = get_kv_client()
+        if client is None:
+            raise ValueError("SESSION_STORE=kv exige KV_REST_API_URL e KV_REST_API_TOKEN")
+        return KVSessions(client, **options)
+    if store != "memory":
+        raise ValueError(f"armazenamento de sessoes invalido: {store}")
+    return MemorySessions(**options)
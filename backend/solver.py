@@ -0,0 +1,255 @@
+"""Solucoes analiticas sobre as formulas de ``calculations.py``.
+
+Para despesas, pro-labore e ISS fixos, a ``economia_tributaria`` e uma
+funcao quadratica por partes da receita anual ``A``:
+
+* PF: ``total_tributos`` e linear em ``A``;
+* PJ: ``total_impostos`` e linear em ``A`` com uma quebra no limite do
+  adicional de IRPJ (``A = threshold / presumed_profit_rate``);
+* ``impacto_pf = L * (L / 60000 - 10) / 100`` e quadratico no lucro ``L``,
+  que por sua vez e linear em ``A``.
+
+Assim cada trecho e resolvido em forma fechada, sem varredura. O mesmo vale
+para o pro-labore: com a receita fixa, ``L`` e linear no pro-labore e a carga
+da PJ e uma parabola convexa, cujo vertice e o pro-labore otimo.
+"""
+
+from __future__ import annotations
+
+import math
+from typing import Any, Dict, List, Mapping, NamedTuple, Optional
+
+from .batch import calculate_batch
+from .constants import DEFAULT_MIN_WAGE, get_rules
+
+# impacto_pf = L^2 / IMPACT_QUADRATIC - L / IMPACT_LINEAR
+IMPACT_QUADRATIC = 6_000_000.0
+IMPACT_LINEAR = 10.0
+
+DEFAULT_OPTIMIZATION_POINTS = 41
+MAX_OPTIMIZATION_POINTS = 1001
+
+
+class _Segment(NamedTuple):
+    start: float
+    end: float
+    c2: float
+    c1: float
+    c0: float
+
+
+def _pj_tax_slope(pj_rules: Mapping[str, Any]) -> float:
+    presumed = pj_rules["presumed_profit_rate"]
+    slope = presumed * pj_rules["irpj_rate"] + presumed * pj_rules["csll_rate"]
+    slope += pj_rules["pis_rate"] + pj_rules["cofins_rate"]
+    if pj_rules.get("cbs_enabled"):
+        slope += pj_rules["cbs_rate"]
+    if pj_rules.get("ibs_enabled"):
+        slope += pj_rules["ibs_rate"]
+    return slope
+
+
+def _savings_segments(
+    annual_expenses: Mapping[str, float],
+    pro_labore_monthly: float,
+    iss_fixo: float,
+    salario_minimo: float,
+    rules: Mapping[str, Any],
+) -> List[_Segment]:
+    """Coeficientes de ``economia_tributaria(A) = c2*A^2 + c1*A + c0`` por trecho."""
+    pf_rules = rules["pf"]
+    pj_rules = rules["pj"]
+    secretaria = annual_expenses.get("secretaria", 0.0)
+    total_expenses = annual_expenses["total"]
+
+    # PF: total_tributos = f*A + pf_const
+    irpf_flat = pf_rules["irpf_flat"]
+    inss = (salario_minimo * pf_rules["inss_pf_rate"]) + (secretaria * pf_rules["inss_pf_rate"])
+    pf_const = -irpf_flat * (total_expenses + inss + iss_fixo) + iss_fixo + inss
+
+    # PJ: total_impostos = a*A + b em cada trecho
+    folha_rate = pj_rules["inss_folha_rate"]
+    inss_folha = (secretaria + folha_rate) * folha_rate
+    factor = 2 if pj_rules.get("double_expense_in_pj") else 1
+    pj_expenses = factor * (total_expenses + pro_labore_monthly * 12)
+
+    presumed = pj_rules["presumed_profit_rate"]
+    threshold = pj_rules["irpj_additional_threshold"]
+    additional = pj_rules["irpj_additional_rate"]
+    slope = _pj_tax_slope(pj_rules)
+    kink = threshold / presumed if presumed > 0 else math.inf
+
+    pieces = [
+        (0.0, max(kink, 0.0), slope, iss_fixo + inss_folha),
+        (max(kink, 0.0), math.inf, slope + additional * presumed, iss_fixo + inss_folha - additional * threshold),
+    ]
+    segments = []
+    for start, end, a, b in pieces:
+        if end <= start:
+            continue
+        # lucro L = alpha*A + beta
+        alpha = 1.0 - a
+        beta = -b - pj_expenses
+        c2 = -(alpha * alpha) / IMPACT_QUADRATIC
+        c1 = irpf_flat - a - (2 * alpha * beta) / IMPACT_QUADRATIC + alpha / IMPACT_LINEAR
+        c0 = pf_const - b - (beta * beta) / IMPACT_QUADRATIC + beta / IMPACT_LINEAR
+        segments.append(_Segment(start, end, c2, c1, c0))
+    return segments
+
+
+def _quadratic_roots(c2: float, c1: float, c0: float) -> List[float]:
+    if c2 == 0.0:
+        return [] if c1 == 0.0 else [-c0 / c1]
+    discriminant = c1 * c1 - 4 * c2 * c0
+    if discriminant < 0:
+        return []
+    # forma numericamente estavel (evita cancelamento entre c1 e sqrt)
+    q = -0.5 * (c1 + math.copysign(math.sqrt(discriminant), c1))
+    roots = [q / c2]
+    if q != 0.0:
+        roots.append(c0 / q)
+    return sorted(roots)
+
+
+def break_even_income(
+    annual_expenses: Dict[str, float],
+    pro_labore_monthly: float,
+    iss_fixo: float,
+    salario_minimo: float,
+    rules: Optional[Mapping[str, Any]] = None,
+) -> Dict[str, Any]:
+    """Rendimentos mensais em que ``economia_tributaria`` cruza zero.
+
+    ``pontos`` lista todos os cruzamentos em ordem crescente; ``direcao``
+    indica quem passa a compensar acima do ponto (``"pf"`` ou ``"pj"``).
+    ``break_even`` e o primeiro rendimento a partir do qual a PJ passa a
+    compensar (ou ``None``).
+    """
+    rules = rules if rules is not None else get_rules()
+    salario_minimo = salario_minimo or DEFAULT_MIN_WAGE
+    segments = _savings_segments(annual_expenses, pro_labore_monthly, iss_fixo, salario_minimo, rules)
+
+    pontos: List[Dict[str, Any]] = []
+    for segment in segments:
+        for root in _quadratic_roots(segment.c2, segment.c1, segment.c0):
+            if not segment.start <= root < segment.end:
+                continue
+            if pontos and math.isclose(pontos[-1]["rendimento_anual"], root, rel_tol=1e-12, abs_tol=1e-9):
+                continue
+            derivative = 2 * segment.c2 * root + segment.c1
+            if derivative == 0.0:
+                # tangente: a economia encosta em zero sem trocar de sinal
+                continue
+            pontos.append(
+                {
+                    "rendimento_mensal": root / 12,
+                    "rendimento_anual": root,
+                    "direcao": "pj" if derivative > 0 else "pf",
+                }
+            )
+
+    break_even = next((ponto["rendimento_mensal"] for ponto in pontos if ponto["direcao"] == "pj"), None)
+    return {
+        "break_even": break_even,
+        "pontos": pontos,
+        # quem compensa com rendimento zero, antes do primeiro cruzamento
+        "vantagem_inicial": "pj" if segments[0].c0 > 0 else "pf",
+    }
+
+
+def _pro_labore_curve_rows(
+    result: Mapping[str, Mapping[str, List[float]]], pro_labores: List[float]
+) -> List[Dict[str, float]]:
+    pj = result["pj"]
+    rows = []
+    for index, pro_labore in enumerate(pro_labores):
+        inss_pro_labore = pro_labore * 12 - pj["pro_labore_liquido"][index]
+        rows.append(
+            {
+                "pro_labore": pro_labore,
+                "carga_total": pj["total_impostos"][index] + pj["impacto_pf"][index] + inss_pro_labore,
+                "total_impostos": pj["total_impostos"][index],
+                "impacto_pf": pj["impacto_pf"][index],
+                "inss_pro_labore": inss_pro_labore,
+                "lucro_liquido": pj["lucro_liquido"][index],
+                "pro_labore_liquido": pj["pro_labore_liquido"][index],
+                "economia_tributaria": result["comparativo"]["economia_tributaria"][index],
+            }
+        )
+    return rows
+
+
+def validate_pro_labore_range(min_pro_labore: Optional[float], max_pro_labore: Optional[float]) -> None:
+    if min_pro_labore is not None and max_pro_labore is not None and min_pro_labore > max_pro_labore:
+        raise ValueError("pro_labore_min nao pode ser maior que pro_labore_max")
+
+
+def optimize_pro_labore(
+    monthly_income: float,
+    annual_expenses: Dict[str, float],
+    iss_fixo: float,
+    salario_minimo: float,
+    min_pro_labore: Optional[float] = None,
+    max_pro_labore: Optional[float] = None,
+    points: int = DEFAULT_OPTIMIZATION_POINTS,
+    rules: Optional[Mapping[str, Any]] = None,
+) -> Dict[str, Any]:
+    """Pro-labore mensal que minimiza a carga da PJ.
+
+    A carga considerada e ``total_impostos + impacto_pf`` mais o INSS retido
+    sobre o pro-labore. O minimo padrao e o salario minimo e o maximo padrao e
+    o pro-labore que zera o lucro distribuido. A curva e avaliada em lote com
+    ``points`` valores igualmente espacados entre os limites. Limites informados
+    invertidos levantam ``ValueError``; se um limite padrao cruzar o informado,
+    o padrao cede.
+    """
+    validate_pro_labore_range(min_pro_labore, max_pro_labore)
+    rules = rules if rules is not None else get_rules()
+    salario_minimo = salario_minimo or DEFAULT_MIN_WAGE
+    factor = 2 if rules["pj"].get("double_expense_in_pj") else 1
+    inss_rate = rules["pf"]["prolabore_inss_rate"]
+
+    # L(P) = L0 - 12*factor*P; dCarga/dP = 0  =>  L* = Q * (1/IMPACT_LINEAR + r/factor) / 2
+    base = calculate_batch(
+        monthly_income=[monthly_income],
+        annual_expenses={name: [value] for name, value in annual_expenses.items()},
+        pro_labore_monthly=[0.0],
+        iss_fixo=[iss_fixo],
+        salario_minimo=[salario_minimo],
+        rules=rules,
+    )
+    lucro_sem_pro_labore = base["pj"]["lucro_liquido"][0]
+    lucro_otimo = IMPACT_QUADRATIC * (1 / IMPACT_LINEAR + inss_rate / factor) / 2
+    irrestrito = (lucro_sem_pro_labore - lucro_otimo) / (12 * factor)
+
+    lower = salario_minimo if min_pro_labore is None else min_pro_labore
+    upper = max(lucro_sem_pro_labore / (12 * factor), 0.0) if max_pro_labore is None else max_pro_labore
+    if upper < lower:
+        if max_pro_labore is None:
+            upper = lower
+        else:
+            lower = upper
+    otimo = min(max(irrestrito, lower), upper)
+
+    points = max(points, 2)
+    step = (upper - lower) / (points - 1)
+    pro_labores = [lower + step * index for index in range(points)]
+    pro_labores.append(otimo)
+
+    size = len(pro_labores)
+    result = calculate_batch(
+        monthly_income=[monthly_income] * size,
+        annual_expenses={name: [value] * size for name, value in annual_expenses.items()},
+        pro_labore_monthly=pro_labores,
+        iss_fixo=[iss_fixo] * size,
+        salario_minimo=[salario_minimo] * size,
+        rules=rules,
+    )
+    rows = _pro_labore_curve_rows(result, pro_labores)
+    return {
+        "pro_labore_otimo": otimo,
+        "pro_labore_irrestrito": irrestrito,
+        "limites": {"min": lower, "max": upper},
+        "otimo": rows[-1],
+        "curva": rows[:-1],
+    }
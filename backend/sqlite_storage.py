@@ -0,0 +1,470 @@
+"""Formato SQLite: todas as simulacoes num unico banco em modo WAL.
+
+``<data_dir>/simulacoes.sqlite3`` guarda os campos do resumo
+(``summarize_record``) em colunas indexadas da tabela ``simulacoes`` e o
+registro completo, como JSON compacto comprimido com zlib, em ``registros``;
+assim as varreduras de filtros e agregados nao passam pelos registros
+completos. Filtros, ordenacao,
+paginacao e os agregados da analise sao consultas SQL; nada e carregado
+para a memoria alem da pagina pedida.
+
+A busca por nome e faixas (``search``) usa um ``search.SearchIndex`` em
+memoria, montado a partir da tabela de resumos e atualizado pelas gravacoes
+do proprio processo. Cada gravacao registra os ids alterados na tabela
+``mudancas`` com a sua geracao; se outro processo gravou, a proxima busca
+aplica ao indice so os resumos desses ids. O indice so e remontado se a
+diferenca for mais antiga que as ultimas ``CHANGE_LOG_SIZE`` geracoes.
+
+Com WAL, leitores nao bloqueiam o escritor nem o contrario, inclusive entre
+processos. Cada thread usa a sua conexao.
+
+Importacao de uma arvore existente (``json`` ou ``segment``)::
+
+    python -m backend.sqlite_storage data/simulacoes --de json
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sqlite3
+import threading
+import uuid
+import zlib
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, Optional, Tuple
+
+from .aggregates import TOTAL_GROUP, Aggregates, band_index, company_key
+from .search import Range, SearchIndex
+from .segments import SegmentStorage
+from .storage import FSYNC, Cursor, FileStorage, summarize_record, summary_score
+
+DATABASE_NAME = "simulacoes.sqlite3"
+SCHEMA_VERSION = 1
+BUSY_TIMEOUT_MS = 5000
+COMPRESSION_LEVEL = 6
+# limite de parametros por consulta nas versoes antigas do SQLite
+_CHUNK = 500
+# geracoes mantidas na tabela ``mudancas``
+CHANGE_LOG_SIZE = 10000
+
+SUMMARY_COLUMNS = (
+    "id",
+    "created_at",
+    "nome_cliente",
+    "nome_empresa",
+    "rendimento_anual",
+    "total_tributos_pf",
+    "total_impostos_pj",
+    "impacto_pf",
+    "aliquota_pf",
+    "aliquota_pj_final",
+    "economia_tributaria",
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (chave TEXT PRIMARY KEY, valor TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS simulacoes (
+    id TEXT PRIMARY KEY,
+    created_at TEXT,
+    score REAL NOT NULL,
+    nome_cliente TEXT,
+    nome_empresa TEXT,
+    cliente_busca TEXT NOT NULL,
+    empresa_busca TEXT NOT NULL,
+    empresa_grupo TEXT NOT NULL,
+    faixa INTEGER NOT NULL,
+    rendimento_anual REAL,
+    total_tributos_pf REAL,
+    total_impostos_pj REAL,
+    impacto_pf REAL,
+    aliquota_pf REAL,
+    aliquota_pj_final REAL,
+    economia_tributaria REAL
+);
+CREATE TABLE IF NOT EXISTS registros (id TEXT PRIMARY KEY, registro BLOB NOT NULL);
+-- ids gravados ou excluidos em cada geracao (para atualizar a busca dos outros processos)
+CREATE TABLE IF NOT EXISTS mudancas (geracao INTEGER NOT NULL, id TEXT NOT NULL);
+CREATE INDEX IF NOT EXISTS mudancas_geracao ON mudancas (geracao);
+-- com cliente_busca no indice o filtro por trecho do cliente nao precisa ler a linha
+CREATE INDEX IF NOT EXISTS simulacoes_score ON simulacoes (score, id, cliente_busca);
+CREATE INDEX IF NOT EXISTS simulacoes_empresa ON simulacoes (empresa_busca, score, id);
+CREATE INDEX IF NOT EXISTS simulacoes_economia ON simulacoes (economia_tributaria);
+-- cobre a consulta dos agregados: uma varredura do indice, sem ler as linhas
+CREATE INDEX IF NOT EXISTS simulacoes_grupo ON simulacoes (
+    empresa_grupo, faixa, economia_tributaria, rendimento_anual, aliquota_pf, aliquota_pj_final, nome_empresa
+);
+"""
+
+_INSERT_SUMMARY = f"""
+INSERT OR REPLACE INTO simulacoes (
+    id, created_at, score, nome_cliente, nome_empresa, cliente_busca, empresa_busca, empresa_grupo, faixa,
+    rendimento_anual, total_tributos_pf, total_impostos_pj, impacto_pf, aliquota_pf, aliquota_pj_final,
+    economia_tributaria
+) VALUES ({", ".join("?" * 16)})
+"""
+_INSERT_RECORD = "INSERT OR REPLACE INTO registros (id, registro) VALUES (?, ?)"
+
+# estatisticas por (empresa, faixa); empresa, faixa e total sao somados a partir delas
+_AGGREGATES_SQL = """
+SELECT empresa_grupo, faixa, count(*), count(CASE WHEN economia_tributaria > 0 THEN 1 END),
+    min(economia_tributaria), max(economia_tributaria), total(economia_tributaria), total(rendimento_anual),
+    total(aliquota_pf), total(aliquota_pj_final), max(nullif(nome_empresa, ''))
+FROM simulacoes GROUP BY empresa_grupo, faixa
+"""
+
+
+def _pack(record: Dict[str, Any]) -> bytes:
+    raw = json.dumps(record, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return zlib.compress(raw, COMPRESSION_LEVEL)
+
+
+def _unpack(payload: bytes) -> Optional[Dict[str, Any]]:
+    try:
+        return json.loads(zlib.decompress(payload))
+    except (zlib.error, ValueError):
+        return None
+
+
+def _summary_row(record: Dict[str, Any]) -> Tuple[Any, ...]:
+    summary = summarize_record(record, record["id"])
+    return (
+        summary["id"],
+        summary["created_at"],
+        summary_score(summary),
+        summary["nome_cliente"],
+        summary["nome_empresa"],
+        (summary["nome_cliente"] or "").casefold(),
+        (summary["nome_empresa"] or "").casefold(),
+        company_key(summary),
+        band_index(summary["rendimento_anual"]),
+        summary["rendimento_anual"],
+        summary["total_tributos_pf"],
+        summary["total_impostos_pj"],
+        summary["impacto_pf"],
+        summary["aliquota_pf"],
+        summary["aliquota_pj_final"],
+        summary["economia_tributaria"],
+    )
+
+
+def _following(generation: str) -> str:
+    """Geracao depois de uma transacao que alterou o banco."""
+    database, _, count = generation.rpartition("-")
+    return f"{database}-{int(count, 16) + 1:x}"
+
+
+def _log_changes(conn: sqlite3.Connection, sim_ids: List[str]) -> None:
+    """Registra ``sim_ids`` na geracao que a transacao vai criar e descarta as mais antigas."""
+    (current,) = conn.execute("SELECT CAST(valor AS INTEGER) FROM meta WHERE chave = 'geracao'").fetchone()
+    conn.executemany("INSERT INTO mudancas VALUES (?, ?)", [(current + 1, sim_id) for sim_id in sim_ids])
+    conn.execute("DELETE FROM mudancas WHERE geracao <= ?", (current + 1 - CHANGE_LOG_SIZE,))
+
+
+def _merge_stats(groups: Dict[str, Dict[str, Any]], group: str, row: Tuple[Any, ...]) -> None:
+    count, pj_vantajosa, economia_min, economia_max, economia, rendimento, aliquota_pf, aliquota_pj = row
+    stats = groups.get(group)
+    if stats is None:
+        stats = groups[group] = {
+            "count": 0,
+            "pj_vantajosa": 0,
+            "economia_min": None,
+            "economia_max": None,
+            "economia_soma": 0.0,
+            "rendimento_soma": 0.0,
+            "aliquota_pf_soma": 0.0,
+            "aliquota_pj_soma": 0.0,
+        }
+    stats["count"] += count
+    stats["pj_vantajosa"] += pj_vantajosa
+    stats["economia_soma"] += economia
+    stats["rendimento_soma"] += rendimento
+    stats["aliquota_pf_soma"] += aliquota_pf
+    stats["aliquota_pj_soma"] += aliquota_pj
+    if economia_min is not None and (stats["economia_min"] is None or economia_min < stats["economia_min"]):
+        stats["economia_min"] = economia_min
+    if economia_max is not None and (stats["economia_max"] is None or economia_max > stats["economia_max"]):
+        stats["economia_max"] = economia_max
+
+
+class SQLiteStorage:
+    """Mesma interface de ``FileStorage`` (``storage.Storage``) sobre um banco SQLite."""
+
+    FORMAT = "sqlite"
+
+    def __init__(self, data_dir: Path, fsync: bool = FSYNC, **_: Any) -> None:
+        self.data_dir = data_dir
+        self.fsync = fsync
+        self.catalog_path = data_dir / DATABASE_NAME
+        self._local = threading.local()
+        self._report: Optional[Tuple[str, Dict[str, Any]]] = None
+        # (geracao, indice) da busca; as gravacoes deste processo o mantem em dia
+        self._search: Optional[Tuple[str, SearchIndex]] = None
+        self._search_lock = threading.Lock()
+        self._connection().executescript(_SCHEMA)
+        with self._transaction() as conn:
+            conn.execute("INSERT OR IGNORE INTO meta VALUES ('schema', ?)", (str(SCHEMA_VERSION),))
+            # o identificador do banco entra na geracao: recriar o arquivo nao repete ETags
+            conn.execute("INSERT OR IGNORE INTO meta VALUES ('banco', ?)", (uuid.uuid4().hex[:12],))
+            conn.execute("INSERT OR IGNORE INTO meta VALUES ('geracao', '0')")
+
+    # -- conexoes ----------------------------------------------------------
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            self.data_dir.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.catalog_path, timeout=BUSY_TIMEOUT_MS / 1000, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            # NORMAL no WAL sincroniza so nos checkpoints; FULL a cada commit
+            conn.execute(f"PRAGMA synchronous={'FULL' if self.fsync else 'NORMAL'}")
+            conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        """Transacao de escrita (``BEGIN IMMEDIATE``); se algo mudou, incrementa a geracao."""
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        changes = conn.total_changes
+        try:
+            yield conn
+            if conn.total_changes != changes:
+                conn.execute("UPDATE meta SET valor = CAST(valor AS INTEGER) + 1 WHERE chave = 'geracao'")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def close(self) -> None:
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    # -- registros ---------------------------------------------------------
+
+    def save(self, record: Dict[str, Any]) -> None:
+        self.save_many([record])
+
+    def save_many(self, records: Iterable[Dict[str, Any]]) -> int:
+        records = list(records)
+        if not records:
+            return 0
+        summaries = [_summary_row(record) for record in records]
+        packed = [(record["id"], _pack(record)) for record in records]
+        with self._transaction() as conn:
+            generation = self.generation()
+            conn.executemany(_INSERT_SUMMARY, summaries)
+            conn.executemany(_INSERT_RECORD, packed)
+            _log_changes(conn, [record["id"] for record in records])
+        self._update_search(generation, added=[summarize_record(record, record["id"]) for record in records])
+        return len(records)
+
+    def get(self, sim_id: str) -> Optional[Dict[str, Any]]:
+        row = self._connection().execute("SELECT registro FROM registros WHERE id = ?", (sim_id,)).fetchone()
+        return _unpack(row[0]) if row else None
+
+    def get_many(self, sim_ids: List[str]) -> List[Optional[Dict[str, Any]]]:
+        found: Dict[str, bytes] = {}
+        conn = self._connection()
+        for start in range(0, len(sim_ids), _CHUNK):
+            chunk = sim_ids[start : start + _CHUNK]
+            query = f"SELECT id, registro FROM registros WHERE id IN ({', '.join('?' * len(chunk))})"
+            found.update(conn.execute(query, chunk).fetchall())
+        return [_unpack(found[sim_id]) if sim_id in found else None for sim_id in sim_ids]
+
+    def delete(self, sim_id: str) -> bool:
+        with self._transaction() as conn:
+            generation = self.generation()
+            conn.execute("DELETE FROM registros WHERE id = ?", (sim_id,))
+            deleted = conn.execute("DELETE FROM simulacoes WHERE id = ?", (sim_id,)).rowcount > 0
+            if deleted:
+                _log_changes(conn, [sim_id])
+        if deleted:
+            self._update_search(generation, removed=[sim_id])
+        return deleted
+
+    def list_summaries(
+        self,
+        empresa: Optional[str] = None,
+        cliente: Optional[str] = None,
+        reverse: bool = True,
+        limit: Optional[int] = None,
+        offset: int = 0,
+        before: Optional[Cursor] = None,
+    ) -> List[Dict[str, Any]]:
+        """Resumos ordenados por ``created_at`` e id (mesmos filtros e cursor do ``FileStorage``)."""
+        where: List[str] = []
+        params: List[Any] = []
+        if empresa and empresa.strip():
+            where.append("empresa_busca = ?")
+            params.append(empresa.strip().casefold())
+        if cliente and cliente.strip():
+            where.append("instr(cliente_busca, ?) > 0")
+            params.append(cliente.strip().casefold())
+        if before is not None:
+            where.append("(score, id) < (?, ?)")
+            params += before
+        order = "DESC" if reverse else "ASC"
+        query = f"SELECT {', '.join(SUMMARY_COLUMNS)} FROM simulacoes"
+        if where:
+            query += " WHERE " + " AND ".join(where)
+        query += f" ORDER BY score {order}, id {order} LIMIT ? OFFSET ?"
+        params += [limit if limit is not None else -1, offset]
+        rows = self._connection().execute(query, params).fetchall()
+        return [dict(zip(SUMMARY_COLUMNS, row)) for row in rows]
+
+    def search(
+        self,
+        text: Optional[str] = None,
+        fuzzy: bool = False,
+        ranges: Optional[Mapping[str, Range]] = None,
+        limit: Optional[int] = None,
+        offset: int = 0,
+    ) -> Tuple[int, List[Dict[str, Any]]]:
+        """Total e pagina da busca por nome e faixas (ver ``search.SearchIndex.search``)."""
+        with self._search_lock:
+            generation = self.generation()
+            cached = self._search
+            if cached is None or cached[0] != generation:
+                conn = self._connection()
+                # geracao e resumos lidos na mesma transacao
+                conn.execute("BEGIN")
+                try:
+                    generation = self.generation()
+                    index = self._replay_changes(cached, generation) if cached is not None else None
+                    if index is None:
+                        index = SearchIndex(self.list_summaries(reverse=False))
+                finally:
+                    conn.execute("COMMIT")
+                cached = self._search = (generation, index)
+            return cached[1].search(text, fuzzy, ranges, limit, offset)
+
+    def _replay_changes(self, cached: Tuple[str, SearchIndex], generation: str) -> Optional[SearchIndex]:
+        """Aplica ao indice as mudancas entre a geracao dele e ``generation`` (``None`` se faltam)."""
+        start, index = cached
+        database, _, since = start.rpartition("-")
+        current_database, _, now = generation.rpartition("-")
+        since_count, now_count = int(since, 16), int(now, 16)
+        if database != current_database or not now_count - CHANGE_LOG_SIZE < since_count <= now_count:
+            return None
+        conn = self._connection()
+        ids = [row[0] for row in conn.execute("SELECT DISTINCT id FROM mudancas WHERE geracao > ?", (since_count,))]
+        found = {}
+        for start_at in range(0, len(ids), _CHUNK):
+            chunk = ids[start_at : start_at + _CHUNK]
+            query = f"SELECT {', '.join(SUMMARY_COLUMNS)} FROM simulacoes WHERE id IN ({', '.join('?' * len(chunk))})"
+            found.update((row[0], dict(zip(SUMMARY_COLUMNS, row))) for row in conn.execute(query, chunk))
+        for sim_id in ids:
+            if sim_id in found:
+                index.add(found[sim_id])
+            else:
+                index.discard(sim_id)
+        return index
+
+    def _update_search(
+        self, generation: str, added: Iterable[Dict[str, Any]] = (), removed: Iterable[str] = ()
+    ) -> None:
+        """Aplica uma gravacao ao indice de busca se ele estava na geracao anterior a ela."""
+        with self._search_lock:
+            cached = self._search
+            if cached is None:
+                return
+            if cached[0] != generation:
+                self._search = None
+                return
+            index = cached[1]
+            for summary in added:
+                index.add(summary)
+            for sim_id in removed:
+                index.discard(sim_id)
+            self._search = (_following(generation), index)
+
+    def generation(self) -> str:
+        """Identificador do estado do banco; muda a cada gravacao ou exclusao, em qualquer processo."""
+        rows = dict(self._connection().execute("SELECT chave, valor FROM meta WHERE chave IN ('banco', 'geracao')"))
+        return f"{rows.get('banco', '')}-{int(rows.get('geracao', 0)):x}"
+
+    def aggregates(self) -> Dict[str, Any]:
+        """Agregados da analise via ``GROUP BY``, reaproveitados ate a proxima gravacao.
+
+        O dict devolvido e compartilhado entre chamadas e nao deve ser alterado.
+        """
+        conn = self._connection()
+        # uma transacao de leitura: geracao e agrupamentos veem o mesmo estado
+        conn.execute("BEGIN")
+        try:
+            generation = self.generation()
+            cached = self._report
+            if cached is not None and cached[0] == generation:
+                return cached[1]
+            rows = conn.execute(_AGGREGATES_SQL).fetchall()
+        finally:
+            conn.execute("COMMIT")
+        aggregates = Aggregates()
+        for company, band, *stats, name in rows:
+            for group in (TOTAL_GROUP, company, f"faixa:{band}"):
+                _merge_stats(aggregates.groups, group, tuple(stats))
+            if name is not None and name > aggregates.names.get(company, ""):
+                aggregates.names[company] = name
+        report = aggregates.report()
+        self._report = (generation, report)
+        return report
+
+    # -- manutencao --------------------------------------------------------
+
+    @contextmanager
+    def deferred_catalog(self) -> Iterator[None]:
+        """Sem catalogo separado: cada ``save_many`` ja e uma unica transacao."""
+        yield
+
+    def rebuild(self) -> None:
+        """Recalcula as colunas indexadas a partir dos registros (ex.: apos mudar o resumo)."""
+        conn = self._connection()
+        ids = [row[0] for row in conn.execute("SELECT id FROM simulacoes")]
+        for start in range(0, len(ids), _CHUNK):
+            chunk = ids[start : start + _CHUNK]
+            records = []
+            # pareia antes de descartar os ausentes, senao os ids seguintes se deslocam
+            for record, sim_id in zip(self.get_many(chunk), chunk):
+                if record is not None:
+                    record.setdefault("id", sim_id)
+                    records.append(record)
+            self.save_many(records)
+        conn.execute("PRAGMA optimize")
+
+
+def import_tree(data_dir: Path, source_format: str, batch_size: int = 1000) -> int:
+    """Copia as simulacoes gravadas em ``source_format`` para o banco de ``data_dir``."""
+    source = SegmentStorage(data_dir) if source_format == "segment" else FileStorage(data_dir)
+    destination = SQLiteStorage(data_dir)
+    batch: List[Dict[str, Any]] = []
+    total = 0
+    for slug in source._scan_units():
+        for sim_id in list(source._unit_ids(slug)):
+            record = source._read_record(sim_id)
+            if record is None:
+                continue
+            record.setdefault("id", sim_id)
+            batch.append(record)
+            if len(batch) >= batch_size:
+                total += destination.save_many(batch)
+                batch = []
+    total += destination.save_many(batch)
+    return total
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Importa as simulacoes para o banco SQLite.")
+    parser.add_argument("data_dir", type=Path, help="diretorio das simulacoes (ex.: data/simulacoes)")
+    parser.add_argument("--de", choices=("json", "segment"), default="json", help="formato de origem")
+    args = parser.parse_args(argv)
+    total = import_tree(args.data_dir, args.de)
+    print(f"{total} simulacoes importadas para {args.data_dir / DATABASE_NAME}")
+
+
+if __name__ == "__main__":
+    main()
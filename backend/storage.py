@@ -0,0 +1,848 @@
+"""Persistencia das simulacoes em arquivos JSON com catalogo indexado.
+
+Cada simulacao continua gravada em ``<data_dir>/<empresa>/<id>.json``. Ao lado
+dos arquivos e mantido um catalogo (``_catalogo.idx``) com o resumo de cada
+registro. Listagens e analises leem so o catalogo. Se o diretorio de alguma
+empresa mudar por fora (mtime diferente do registrado), apenas essa empresa e
+reescaneada.
+
+Gravacoes e exclusoes nao regravam o catalogo: cada lote vira uma linha
+numerada no diario ``_catalogo.log``, anexada com a trava exclusiva do diario.
+Antes de anexar, o processo aplica as linhas que outros processos gravaram,
+entao varios processos no mesmo diretorio nao perdem atualizacoes. Quando o
+diario fica maior que o catalogo, o catalogo e regravado (num temporario com o
+pid do processo) e o diario e esvaziado.
+
+A busca por nome e faixas (``search``) usa um ``search.SearchIndex`` montado
+do catalogo na primeira consulta e atualizado a cada gravacao/exclusao, tambem
+as de outros processos (linhas do diario, diretorios reescaneados ou a
+diferenca para o catalogo regravado); so ``rebuild`` o descarta.
+
+A paginacao por cursor usa o par ``(score, id)`` (``summary_key``), com o
+mesmo ``score`` do indice ordenado do KV: ``before`` devolve apenas registros
+anteriores a ele nessa ordem, entao registros com o mesmo ``created_at`` na
+virada de uma pagina nao sao pulados.
+
+Os registros sao gravados num temporario e renomeados (``os.replace``), entao
+um leitor nunca ve um arquivo pela metade. Com ``STORAGE_FSYNC=1`` cada lote
+sincroniza os arquivos e depois cada diretorio uma unica vez.
+"""
+
+from __future__ import annotations
+
+import json
+import math
+import os
+import secrets
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from itertools import islice
+from pathlib import Path
+from typing import (
+    IO,
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    ContextManager,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Protocol,
+    Sequence,
+    Set,
+    Tuple,
+)
+
+from .aggregates import Aggregates
+from .config import CHECK_INTERVAL, Stamp, file_stamp
+
+try:
+    import fcntl
+except ImportError:  # Windows: sem trava entre processos
+    fcntl = None  # type: ignore[assignment]
+
+if TYPE_CHECKING:
+    from .search import Range, SearchIndex
+
+CATALOG_NAME = "_catalogo.idx"
+JOURNAL_NAME = "_catalogo.log"
+CATALOG_VERSION = 2
+# o diario so e incorporado ao catalogo depois de passar deste tamanho
+JOURNAL_MIN_SIZE = 1 << 20
+MAX_PAGE_SIZE = 1000
+FSYNC = (os.getenv("STORAGE_FSYNC") or "").lower() in ("1", "true", "yes", "on")
+
+# posicao na listagem: ``(summary_score, id)``
+Cursor = Tuple[float, str]
+
+
+def summarize_record(record: Dict[str, Any], sim_id: Optional[str] = None) -> Dict[str, Any]:
+    """Campos de listagem e analise extraidos de um registro completo."""
+    output = record.get("output") or {}
+    pf = output.get("pf") or {}
+    pj = output.get("pj") or {}
+    comparativo = output.get("comparativo") or {}
+    return {
+        "id": record.get("id") or sim_id,
+        "created_at": record.get("created_at"),
+        "nome_cliente": record.get("nome_cliente"),
+        "nome_empresa": record.get("nome_empresa"),
+        "rendimento_anual": pf.get("rendimento_anual"),
+        "total_tributos_pf": pf.get("total_tributos"),
+        "total_impostos_pj": pj.get("total_impostos"),
+        "impacto_pf": pj.get("impacto_pf"),
+        "aliquota_pf": pf.get("aliquota_efetiva"),
+        "aliquota_pj_final": pj.get("aliquota_efetiva_final"),
+        "economia_tributaria": comparativo.get("economia_tributaria"),
+    }
+
+
+def slugify(value: str) -> str:
+    """Nome da empresa no formato usado no id (``<slug>/<data>``)."""
+    safe = "".join(ch if ch.isalnum() else "_" for ch in value.strip())
+    return "_".join(filter(None, safe.split("_"))).lower() or "empresa"
+
+
+class _RecordClock:
+    """Instantes estritamente crescentes no processo, com uma marca do processo."""
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.last: Optional[datetime] = None
+        self.reset()
+
+    def reset(self) -> None:
+        # processos filhos de um fork ganham outra marca
+        self.tag = secrets.token_hex(3)
+
+    def next(self, count: int = 1) -> datetime:
+        """Primeiro de ``count`` instantes consecutivos (um microssegundo entre eles)."""
+        with self.lock:
+            now = datetime.now()
+            if self.last is not None and now <= self.last:
+                now = self.last + timedelta(microseconds=1)
+            self.last = now + timedelta(microseconds=count - 1)
+            return now
+
+
+_CLOCK = _RecordClock()
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_CLOCK.reset)
+
+
+def new_record_id(nome_empresa: str) -> Tuple[str, datetime]:
+    """Id e ``created_at`` de uma nova simulacao.
+
+    ``<empresa>/<data>_<hora>_<microssegundos>-<marca do processo>``: os
+    instantes nunca se repetem no processo e a marca separa processos, entao
+    duas gravacoes no mesmo segundo nao se sobrescrevem; a ordem dos ids e a
+    dos ``created_at``.
+    """
+    created = _CLOCK.next()
+    return f"{slugify(nome_empresa)}/{created:%Y-%m-%d_%H%M%S}_{created:%f}-{_CLOCK.tag}", created
+
+
+def new_record_ids(
+    nomes_empresa: Sequence[str], slug: Callable[[str], str] = slugify
+) -> List[Tuple[str, datetime]]:
+    """``new_record_id`` de um lote, com os instantes reservados de uma vez."""
+    if not nomes_empresa:
+        return []
+    first = _CLOCK.next(len(nomes_empresa))
+    tag = _CLOCK.tag
+    ids = []
+    for offset, nome_empresa in enumerate(nomes_empresa):
+        created = first + timedelta(microseconds=offset)
+        ids.append((f"{slug(nome_empresa)}/{created:%Y-%m-%d_%H%M%S}_{created:%f}-{tag}", created))
+    return ids
+
+
+@contextmanager
+def file_lock(handle: IO[Any]) -> Iterator[None]:
+    """Trava exclusiva (``flock``) do arquivo aberto em ``handle``, entre processos."""
+    if fcntl is None:
+        yield
+        return
+    fcntl.flock(handle.fileno(), fcntl.LOCK_EX)
+    try:
+        yield
+    finally:
+        fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+
+
+def sync_dirs(paths: Iterable[Path]) -> None:
+    """``fsync`` dos diretorios (torna as renomeacoes duraveis)."""
+    for path in paths:
+        try:
+            fd = os.open(path, os.O_RDONLY)
+        except OSError:
+            continue
+        try:
+            os.fsync(fd)
+        except OSError:
+            pass
+        finally:
+            os.close(fd)
+
+
+def summary_score(summary: Dict[str, Any]) -> float:
+    """Score do indice ordenado: timestamp de ``created_at`` (0 se ausente)."""
+    created_at = summary.get("created_at")
+    if not created_at:
+        return 0.0
+    try:
+        return datetime.fromisoformat(created_at).timestamp()
+    except ValueError:
+        return 0.0
+
+
+def summary_key(summary: Dict[str, Any]) -> Cursor:
+    """Ordem das listagens: ``summary_score`` e, no empate, o id."""
+    return summary_score(summary), summary.get("id") or ""
+
+
+def format_cursor(cursor: Cursor) -> str:
+    """Cursor no formato dos parametros ``before`` (``<score>:<id>``)."""
+    return f"{cursor[0]!r}:{cursor[1]}"
+
+
+def parse_cursor(text: str) -> Cursor:
+    """Le ``before``; so o score (formato antigo) vale como ``(score, "")``."""
+    score_text, _, sim_id = text.partition(":")
+    score = float(score_text)
+    if not math.isfinite(score):
+        raise ValueError("before invalido")
+    return score, sim_id
+
+
+def _matcher(empresa: Optional[str], cliente: Optional[str]):
+    empresa = empresa.strip().casefold() if empresa else None
+    cliente = cliente.strip().casefold() if cliente else None
+
+    def matches(summary: Dict[str, Any]) -> bool:
+        if empresa and (summary.get("nome_empresa") or "").casefold() != empresa:
+            return False
+        if cliente and cliente not in (summary.get("nome_cliente") or "").casefold():
+            return False
+        return True
+
+    return matches
+
+
+def filter_summaries(
+    summaries: List[Dict[str, Any]],
+    empresa: Optional[str] = None,
+    cliente: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    """Filtra por nome da empresa (exato, sem diferenciar maiusculas) e trecho do cliente."""
+    if not empresa and not cliente:
+        return summaries
+    return list(filter(_matcher(empresa, cliente), summaries))
+
+
+def take_summaries(
+    summaries: Iterable[Dict[str, Any]],
+    empresa: Optional[str] = None,
+    cliente: Optional[str] = None,
+    limit: Optional[int] = None,
+    offset: int = 0,
+) -> List[Dict[str, Any]]:
+    """Filtra e pagina ``summaries`` consumindo o iteravel so ate completar a pagina."""
+    if empresa or cliente:
+        summaries = filter(_matcher(empresa, cliente), summaries)
+    end = offset + limit if limit is not None else None
+    return list(islice(summaries, offset, end))
+
+
+def sort_summaries(summaries: List[Dict[str, Any]], reverse: bool = True) -> List[Dict[str, Any]]:
+    return sorted(summaries, key=summary_key, reverse=reverse)
+
+
+def next_cursor(page: List[Dict[str, Any]], limit: Optional[int]) -> Optional[Cursor]:
+    """Valor de ``before`` para a proxima pagina, ou ``None`` se esta nao encheu."""
+    if limit is None or len(page) < limit or not page:
+        return None
+    return summary_key(page[-1])
+
+
+class Storage(Protocol):
+    """Interface comum dos armazenamentos usada pelos dois apps e pelos comandos."""
+
+    FORMAT: str
+    catalog_path: Path
+
+    def save(self, record: Dict[str, Any]) -> None: ...
+
+    def save_many(self, records: Iterable[Dict[str, Any]]) -> int: ...
+
+    def get(self, sim_id: str) -> Optional[Dict[str, Any]]: ...
+
+    def get_many(self, sim_ids: List[str]) -> List[Optional[Dict[str, Any]]]: ...
+
+    def delete(self, sim_id: str) -> bool: ...
+
+    def list_summaries(
+        self,
+        empresa: Optional[str] = None,
+        cliente: Optional[str] = None,
+        reverse: bool = True,
+        limit: Optional[int] = None,
+        offset: int = 0,
+        before: Optional[Cursor] = None,
+    ) -> List[Dict[str, Any]]: ...
+
+    def search(
+        self,
+        text: Optional[str] = None,
+        fuzzy: bool = False,
+        ranges: Optional[Mapping[str, Range]] = None,
+        limit: Optional[int] = None,
+        offset: int = 0,
+    ) -> Tuple[int, List[Dict[str, Any]]]: ...
+
+    def generation(self) -> str: ...
+
+    def aggregates(self) -> Dict[str, Any]: ...
+
+    def deferred_catalog(self) -> ContextManager[None]: ...
+
+    def rebuild(self) -> None: ...
+
+
+def open_storage(data_dir: Path, storage_format: Optional[str] = None) -> Storage:
+    """Armazenamento no formato ``storage_format`` ou da variavel ``STORAGE_FORMAT``.
+
+    ``json`` (padrao) grava um arquivo por simulacao; ``segment`` usa os
+    segmentos comprimidos de ``segments.SegmentStorage``; ``sqlite`` usa um
+    banco unico em modo WAL (``sqlite_storage.SQLiteStorage``).
+    """
+    storage_format = (storage_format or os.getenv("STORAGE_FORMAT") or "json").lower()
+    if storage_format == "segment":
+        from .segments import SegmentStorage
+
+        return SegmentStorage(data_dir)
+    if storage_format == "sqlite":
+        from .sqlite_storage import SQLiteStorage
+
+        return SQLiteStorage(data_dir)
+    if storage_format != "json":
+        raise ValueError(f"formato de armazenamento invalido: {storage_format}")
+    return FileStorage(data_dir)
+
+
+class FileStorage:
+    """Simulacoes em arquivos JSON com um catalogo de resumos em memoria.
+
+    As subclasses trocam o formato dos registros sobrescrevendo os metodos
+    de ``# -- formato``; catalogo, cache e agregados ficam aqui.
+    """
+
+    FORMAT = "json"
+
+    def __init__(self, data_dir: Path, check_interval: float = CHECK_INTERVAL, fsync: bool = FSYNC) -> None:
+        self.data_dir = data_dir
+        self.fsync = fsync
+        self.catalog_path = data_dir / CATALOG_NAME
+        self.journal_path = data_dir / JOURNAL_NAME
+        self._check_interval = check_interval
+        self._lock = threading.RLock()
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._dirs: Dict[str, Any] = {}
+        self._sorted: Optional[List[Dict[str, Any]]] = None
+        self._keys: List[Cursor] = []
+        self._aggregates: Optional[Aggregates] = None
+        self._search: Optional[SearchIndex] = None
+        self._catalog_stamp: Stamp = None
+        self._loaded = False
+        self._checked_at = 0.0
+        self._deferred = 0
+        self._unsaved_changes = 0
+        # numero da ultima mudanca do diario aplicada e ate onde ele foi lido
+        self._seq = 0
+        self._journal_offset = 0
+        # mudancas deste processo ainda nao anexadas ao diario
+        self._pending: Dict[str, Optional[Dict[str, Any]]] = {}
+        self._pending_dirs: Dict[str, Any] = {}
+        self._snapshot_due = False
+
+    # -- formato -----------------------------------------------------------
+
+    def _record_path(self, sim_id: str) -> Path:
+        return self.data_dir / f"{sim_id}.json"
+
+    def _write_record(self, sim_id: str, record: Dict[str, Any]) -> None:
+        self._write_files([(sim_id, record)])
+
+    def _write_records(self, records: List[Dict[str, Any]]) -> None:
+        self._write_files([(record["id"], record) for record in records])
+
+    def _write_files(self, items: List[Tuple[str, Dict[str, Any]]]) -> None:
+        renames: List[Tuple[Path, Path]] = []
+        for sim_id, record in items:
+            path = self._record_path(sim_id)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            # ``.<nome>.tmp`` nao casa com ``*.json`` na varredura do diretorio
+            tmp_path = path.with_name(f".{path.name}.tmp")
+            with open(tmp_path, "w", encoding="utf-8") as handle:
+                handle.write(json.dumps(record, ensure_ascii=False, indent=2))
+                if self.fsync:
+                    handle.flush()
+                    os.fsync(handle.fileno())
+            renames.append((tmp_path, path))
+        dirs: Set[Path] = set()
+        for tmp_path, path in renames:
+            os.replace(tmp_path, path)
+            dirs.add(path.parent)
+        if self.fsync:
+            sync_dirs(dirs)
+
+    def _read_record(self, sim_id: str) -> Optional[Dict[str, Any]]:
+        try:
+            return json.loads(self._record_path(sim_id).read_text(encoding="utf-8"))
+        except (OSError, json.JSONDecodeError):
+            return None
+
+    def _remove_record(self, sim_id: str) -> bool:
+        try:
+            self._record_path(sim_id).unlink()
+        except FileNotFoundError:
+            return False
+        return True
+
+    def _scan_units(self) -> Dict[str, Any]:
+        """Unidades de armazenamento (aqui, diretorios por empresa) e seus carimbos."""
+        try:
+            entries = list(os.scandir(self.data_dir))
+        except FileNotFoundError:
+            return {}
+        return {entry.name: entry.stat().st_mtime_ns for entry in entries if entry.is_dir()}
+
+    def _unit_stamp(self, slug: str) -> Any:
+        return (self.data_dir / slug).stat().st_mtime_ns
+
+    def _unit_ids(self, slug: str) -> Iterable[str]:
+        return (f"{slug}/{path.stem}" for path in (self.data_dir / slug).glob("*.json"))
+
+    # -- registros ---------------------------------------------------------
+
+    def save(self, record: Dict[str, Any]) -> None:
+        self.save_many([record])
+
+    def save_many(self, records: Iterable[Dict[str, Any]]) -> int:
+        """Grava varios registros e atualiza o catalogo uma unica vez."""
+        records = list(records)
+        if not records:
+            return 0
+        with self._lock:
+            self._refresh()
+            self._write_records(records)
+            self._copy_index()
+            slugs = set()
+            for record in records:
+                sim_id = record["id"]
+                summary = self._pending[sim_id] = summarize_record(record, sim_id)
+                self._apply(sim_id, summary)
+                slugs.add(sim_id.split("/", 1)[0])
+            for slug in slugs:
+                self._touch_unit(slug)
+            self._write_catalog()
+        return len(records)
+
+    def get(self, sim_id: str) -> Optional[Dict[str, Any]]:
+        return self._read_record(sim_id)
+
+    def get_many(self, sim_ids: List[str]) -> List[Optional[Dict[str, Any]]]:
+        return [self._read_record(sim_id) for sim_id in sim_ids]
+
+    def delete(self, sim_id: str) -> bool:
+        with self._lock:
+            self._refresh()
+            if not self._remove_record(sim_id):
+                return False
+            self._copy_index()
+            self._pending[sim_id] = None
+            self._apply(sim_id, None)
+            self._touch_unit(sim_id.split("/", 1)[0])
+            self._write_catalog()
+            return True
+
+    def list_summaries(
+        self,
+        empresa: Optional[str] = None,
+        cliente: Optional[str] = None,
+        reverse: bool = True,
+        limit: Optional[int] = None,
+        offset: int = 0,
+        before: Optional[Cursor] = None,
+    ) -> List[Dict[str, Any]]:
+        """Resumos ordenados por ``created_at`` (e id), lidos apenas do catalogo.
+
+        Com ``before`` so entram registros com ``summary_key`` menor que ele;
+        a busca do ponto de corte e binaria e a pagina e montada percorrendo a
+        lista ordenada so ate ``offset + limit`` resultados.
+        """
+        with self._lock:
+            self._refresh()
+            if self._sorted is None:
+                self._sorted = sort_summaries(list(self._entries.values()), reverse=False)
+                self._keys = [summary_key(summary) for summary in self._sorted]
+            ordered, keys = self._sorted, self._keys
+        end = bisect_left(keys, before) if before is not None else len(ordered)
+        indexes = range(end - 1, -1, -1) if reverse else range(end)
+        return take_summaries((ordered[index] for index in indexes), empresa, cliente, limit, offset)
+
+    def search(
+        self,
+        text: Optional[str] = None,
+        fuzzy: bool = False,
+        ranges: Optional[Mapping[str, Range]] = None,
+        limit: Optional[int] = None,
+        offset: int = 0,
+    ) -> Tuple[int, List[Dict[str, Any]]]:
+        """Total e pagina da busca por nome e faixas (ver ``search.SearchIndex.search``)."""
+        from .search import SearchIndex
+
+        with self._lock:
+            self._refresh()
+            if self._search is None:
+                self._search = SearchIndex(self._entries.values())
+            return self._search.search(text, fuzzy, ranges, limit, offset)
+
+    def generation(self) -> str:
+        """Identificador do estado do acervo; muda a cada gravacao ou exclusao.
+
+        Vem do numero da ultima mudanca do diario (e do carimbo do catalogo,
+        que muda se o diretorio for recriado), entao e o mesmo em todos os
+        processos que usam o diretorio e nao exige ler registros nem resumos.
+        Como serve de ETag, ignora ``check_interval``: cada chamada confere o
+        catalogo e o diario (dois ``stat``) e le as mudancas de outro processo.
+        """
+        with self._lock:
+            self._refresh(force=self._loaded and self._disk_changed())
+            mtime, _ = self._catalog_stamp or (0, 0)
+            return f"{mtime:x}-{self._seq:x}-{self._unsaved_changes}"
+
+    def aggregates(self) -> Dict[str, Any]:
+        """Agregados da analise (ver ``aggregates.Aggregates.report``)."""
+        with self._lock:
+            self._refresh()
+            if self._aggregates is None:
+                self._aggregates = Aggregates.from_summaries(self._entries.values())
+            return self._aggregates.report()
+
+    def _update_aggregates(self, old: Optional[Dict[str, Any]], new: Optional[Dict[str, Any]]) -> None:
+        if self._aggregates is None:
+            return
+        stale = self._aggregates.remove(old) if old else set()
+        if new:
+            self._aggregates.add(new)
+        if stale:
+            self._aggregates.refresh_extremes(stale, self._entries.values())
+
+    def _apply(self, sim_id: str, summary: Optional[Dict[str, Any]]) -> None:
+        """Grava (ou, com ``None``, remove) um resumo no catalogo em memoria.
+
+        Quem chama faz ``_copy_index`` antes.
+        """
+        if summary is None:
+            old = self._entries.pop(sim_id, None)
+        else:
+            old = self._entries.get(sim_id)
+            self._entries[sim_id] = summary
+        self._update_aggregates(old, summary)
+        self._update_index(old, summary)
+        if self._search is not None:
+            if summary is None:
+                self._search.discard(sim_id)
+            else:
+                self._search.add(summary)
+
+    def _copy_index(self) -> None:
+        # leitores podem estar percorrendo a lista atual fora do lock
+        if self._sorted is not None:
+            self._sorted = list(self._sorted)
+            self._keys = list(self._keys)
+
+    def _update_index(self, old: Optional[Dict[str, Any]], new: Optional[Dict[str, Any]]) -> None:
+        """Atualiza a lista ordenada sem reordenar o catalogo inteiro."""
+        if self._sorted is None:
+            return
+        ordered, keys = self._sorted, self._keys
+        new_key = summary_key(new) if new is not None else None
+        if old is not None:
+            old_key = summary_key(old)
+            index = bisect_left(keys, old_key)
+            if index == len(ordered) or ordered[index] is not old:
+                self._sorted = None
+                return
+            if new_key == old_key:
+                ordered[index] = new
+                return
+            del ordered[index]
+            del keys[index]
+        if new is not None:
+            index = bisect_right(keys, new_key)
+            ordered.insert(index, new)
+            keys.insert(index, new_key)
+
+    # -- catalogo ----------------------------------------------------------
+
+    def rebuild(self) -> None:
+        """Reconstroi o catalogo inteiro a partir dos arquivos em disco."""
+        with self._lock:
+            self._entries = {}
+            self._dirs = {}
+            self._aggregates = None
+            self._search = None
+            for slug, stamp in self._scan_units().items():
+                self._rescan_unit(slug, stamp)
+            self._pending.clear()
+            self._pending_dirs.clear()
+            self._snapshot_due = True
+            self._loaded = True
+            self._write_catalog()
+            self._checked_at = time.monotonic()
+
+    def _rescan_unit(self, slug: str, stamp: Any) -> None:
+        prefix = f"{slug}/"
+        known = {sim_id for sim_id in self._entries if sim_id.startswith(prefix)}
+        present = set()
+        for sim_id in self._unit_ids(slug):
+            present.add(sim_id)
+            if sim_id in known:
+                continue
+            record = self._read_record(sim_id)
+            if record is not None:
+                summary = self._entries[sim_id] = self._pending[sim_id] = summarize_record(record, sim_id)
+                if self._search is not None:
+                    self._search.add(summary)
+        for sim_id in known - present:
+            del self._entries[sim_id]
+            self._pending[sim_id] = None
+            if self._search is not None:
+                self._search.discard(sim_id)
+        self._dirs[slug] = self._pending_dirs[slug] = stamp
+        self._sorted = None
+        self._aggregates = None
+
+    def _touch_unit(self, slug: str) -> None:
+        self._dirs[slug] = self._pending_dirs[slug] = self._unit_stamp(slug)
+
+    def _update_dirs(self, dirs: Mapping[str, Any]) -> None:
+        for slug, stamp in dirs.items():
+            if stamp is None:
+                self._dirs.pop(slug, None)
+            else:
+                self._dirs[slug] = stamp
+
+    def _load_catalog(self) -> bool:
+        stamp = file_stamp(self.catalog_path)
+        try:
+            data = json.loads(self.catalog_path.read_text(encoding="utf-8"))
+        except (OSError, json.JSONDecodeError):
+            return False
+        if not isinstance(data, dict) or data.get("version") != CATALOG_VERSION:
+            return False
+        if data.get("format", "json") != self.FORMAT:
+            return False
+        previous, self._entries = self._entries, data.get("entries") or {}
+        self._dirs = data.get("dirs") or {}
+        self._seq = data.get("seq") or 0
+        self._journal_offset = 0
+        self._sorted = None
+        self._aggregates = None
+        if self._search is not None:
+            # catalogo regravado por outro processo: o indice recebe so a diferenca
+            for sim_id, summary in self._entries.items():
+                if previous.get(sim_id) != summary:
+                    self._search.add(summary)
+            for sim_id in previous.keys() - self._entries.keys():
+                self._search.discard(sim_id)
+        self._catalog_stamp = stamp
+        return True
+
+    def _catalog_seq(self) -> int:
+        try:
+            data = json.loads(self.catalog_path.read_text(encoding="utf-8"))
+            return int(data["seq"])
+        except (OSError, ValueError, TypeError, KeyError):
+            return 0
+
+    @contextmanager
+    def _locked_journal(self) -> Iterator[IO[bytes]]:
+        """Diario do catalogo aberto para leitura e anexacao, com a trava exclusiva."""
+        self.data_dir.mkdir(parents=True, exist_ok=True)
+        with self.journal_path.open("a+b") as journal, file_lock(journal):
+            yield journal
+
+    def _read_journal(self, journal: IO[bytes]) -> List[Dict[str, Any]]:
+        """Mudancas completas do diario ainda nao aplicadas neste processo."""
+        journal.seek(self._journal_offset)
+        data = journal.read()
+        # uma linha sem ``\n`` no fim e uma gravacao interrompida
+        end = data.rfind(b"\n") + 1
+        self._journal_offset += end
+        changes = []
+        for line in data[:end].splitlines():
+            try:
+                change = json.loads(line)
+            except ValueError:
+                continue
+            if isinstance(change, dict) and change.get("seq", 0) > self._seq:
+                self._seq = change["seq"]
+                changes.append(change)
+        return changes
+
+    def _catch_up(self, journal: IO[bytes]) -> bool:
+        """Traz o catalogo em memoria ao estado em disco (com a trava do diario).
+
+        O catalogo so e relido se outro processo o regravou; senao so as linhas
+        novas do diario sao aplicadas. As mudancas pendentes deste processo
+        ficam por cima. Devolve False se nao ha catalogo valido em disco.
+        """
+        size = journal.seek(0, os.SEEK_END)
+        stale = size < self._journal_offset or file_stamp(self.catalog_path) != self._catalog_stamp
+        if (stale or not self._loaded) and not self._load_catalog():
+            return False
+        self._copy_index()
+        for change in self._read_journal(journal):
+            for sim_id, summary in (change.get("put") or {}).items():
+                self._apply(sim_id, summary)
+            for sim_id in change.get("del") or ():
+                self._apply(sim_id, None)
+            self._update_dirs(change.get("dirs") or {})
+        for sim_id, summary in self._pending.items():
+            if self._entries.get(sim_id) is not summary:
+                self._apply(sim_id, summary)
+        self._update_dirs(self._pending_dirs)
+        return True
+
+    @contextmanager
+    def deferred_catalog(self) -> Iterator[None]:
+        """Adia a gravacao do catalogo para o fim do bloco (importacoes em lote)."""
+        with self._lock:
+            self._deferred += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._deferred -= 1
+                if not self._deferred:
+                    self._write_catalog()
+
+    def _write_catalog(self) -> None:
+        """Anexa as mudancas pendentes ao diario (ou regrava o catalogo inteiro)."""
+        if self._deferred:
+            self._unsaved_changes += 1
+            return
+        if not (self._pending or self._pending_dirs or self._snapshot_due):
+            return
+        self._unsaved_changes = 0
+        with self._locked_journal() as journal:
+            if self._snapshot_due:
+                # o catalogo foi reconstruido dos arquivos: do disco so importa o numero
+                self._seq = max(self._seq, self._catalog_seq())
+                self._journal_offset = 0
+                self._read_journal(journal)
+                self._write_snapshot(journal)
+                return
+            if not self._catch_up(journal):
+                self._snapshot_due = True
+                self._write_snapshot(journal)
+                return
+            change = {
+                "seq": self._seq + 1,
+                "put": {sim_id: summary for sim_id, summary in self._pending.items() if summary is not None},
+                "del": [sim_id for sim_id, summary in self._pending.items() if summary is None],
+                "dirs": self._pending_dirs,
+            }
+            line = (json.dumps(change, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8")
+            _, catalog_size = self._catalog_stamp or (0, 0)
+            if self._journal_offset + len(line) > max(JOURNAL_MIN_SIZE, catalog_size):
+                self._write_snapshot(journal)
+                return
+            if journal.seek(0, os.SEEK_END) > self._journal_offset:
+                # resto de uma gravacao interrompida depois da ultima linha completa
+                journal.truncate(self._journal_offset)
+            journal.write(line)
+            journal.flush()
+            if self.fsync:
+                os.fsync(journal.fileno())
+            self._journal_offset += len(line)
+            self._seq += 1
+            self._pending = {}
+            self._pending_dirs = {}
+
+    def _write_snapshot(self, journal: IO[bytes]) -> None:
+        """Regrava o catalogo com tudo o que esta em memoria e esvazia o diario."""
+        self._seq += 1
+        payload = {
+            "version": CATALOG_VERSION,
+            "format": self.FORMAT,
+            "seq": self._seq,
+            "dirs": self._dirs,
+            "entries": self._entries,
+        }
+        tmp_path = self.catalog_path.with_name(f".{CATALOG_NAME}.{os.getpid()}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as handle:
+            handle.write(json.dumps(payload, ensure_ascii=False, separators=(",", ":")))
+            if self.fsync:
+                handle.flush()
+                os.fsync(handle.fileno())
+        os.replace(tmp_path, self.catalog_path)
+        if self.fsync:
+            sync_dirs([self.data_dir])
+        journal.truncate(0)
+        self._journal_offset = 0
+        self._catalog_stamp = file_stamp(self.catalog_path)
+        self._pending = {}
+        self._pending_dirs = {}
+        self._snapshot_due = False
+
+    def _refresh(self, force: bool = False) -> None:
+        now = time.monotonic()
+        if self._loaded and not force and now - self._checked_at < self._check_interval:
+            return
+        if not self._loaded or self._disk_changed():
+            with self._locked_journal() as journal:
+                loaded = self._catch_up(journal)
+            if not loaded:
+                self.rebuild()
+                return
+        current = self._scan_units()
+        changed = False
+        for slug, stamp in current.items():
+            if self._dirs.get(slug) != stamp:
+                self._rescan_unit(slug, stamp)
+                changed = True
+        for slug in set(self._dirs) - set(current):
+            prefix = f"{slug}/"
+            for sim_id in [sim_id for sim_id in self._entries if sim_id.startswith(prefix)]:
+                del self._entries[sim_id]
+                self._pending[sim_id] = None
+                if self._search is not None:
+                    self._search.discard(sim_id)
+            del self._dirs[slug]
+            self._pending_dirs[slug] = None
+            self._sorted = None
+            self._aggregates = None
+            changed = True
+        if changed:
+            self._write_catalog()
+        self._loaded = True
+        self._checked_at = now
+
+    def _disk_changed(self) -> bool:
+        """Se outro processo mexeu no catalogo ou no diario desde a ultima leitura."""
+        if file_stamp(self.catalog_path) != self._catalog_stamp:
+            return True
+        try:
+            return self.journal_path.stat().st_size != self._journal_offset
+        except FileNotFoundError:
+            return self._journal_offset != 0
@@ -0,0 +1,182 @@
+"""Gravacao em segundo plano (write-behind) das simulacoes salvas pela API.
+
+``WriteBehind.submit`` enfileira o registro e retorna na hora; uma thread
+grava a fila em lotes com ``save_many`` (uma linha no diario do catalogo ou um
+commit por lote; com fsync, cada arquivo e sincronizado e cada diretorio uma
+vez por lote). Enquanto nao foi gravado, o registro e servido por ``pending``;
+leituras de listagem chamam ``wait`` antes, entao quem salvou e listou em
+seguida ve a propria simulacao.
+
+Se a gravacao falha, o lote volta para o inicio da fila e e tentado de novo
+(com espera crescente). ``close`` grava o que restou; e chamado no
+encerramento do app e, por garantia, no ``atexit``. Depois do ``close`` as
+tentativas param no prazo dado: o que nao foi gravado vai para um arquivo
+JSON lines (``_nao_gravadas-<pid>.jsonl`` no diretorio do armazenamento) e
+para o log.
+"""
+
+from __future__ import annotations
+
+import atexit
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from .storage import Storage
+
+MAX_BATCH = 500
+# espera para juntar gravacoes que chegam juntas num so lote (segundos)
+GROUP_DELAY = 0.002
+MAX_RETRY_DELAY = 5.0
+# prazo para gravar o restante da fila depois do ``close`` se o armazenamento continuar falhando
+CLOSE_TIMEOUT = 30.0
+# espera maxima de uma leitura pela fila (``WRITE_BEHIND_TIMEOUT``, segundos)
+FLUSH_TIMEOUT = float(os.getenv("WRITE_BEHIND_TIMEOUT") or 10.0)
+
+logger = logging.getLogger(__name__)
+
+
+class WriteTimeout(TimeoutError):
+    """A fila de gravacao nao esvaziou no prazo (armazenamento falhando ou lento)."""
+
+
+class WriteBehind:
+    """Fila de gravacao de ``storage`` com uma thread escritora."""
+
+    def __init__(
+        self,
+        storage: Storage,
+        max_batch: int = MAX_BATCH,
+        group_delay: float = GROUP_DELAY,
+        dump_path: Optional[Path] = None,
+    ) -> None:
+        self.storage = storage
+        self.max_batch = max_batch
+        self.group_delay = group_delay
+        if dump_path is None:
+            dump_path = Path(getattr(storage, "data_dir", tempfile.gettempdir())) / f"_nao_gravadas-{os.getpid()}.jsonl"
+        self.dump_path = dump_path
+        self._cond = threading.Condition()
+        self._queue: List[Dict[str, Any]] = []
+        self._pending: Dict[str, Dict[str, Any]] = {}
+        self._submitted = 0
+        self._written = 0
+        self._closed = False
+        # fim das novas tentativas depois do ``close``
+        self._deadline = float("inf")
+        self._thread: Optional[threading.Thread] = None
+        atexit.register(self.close)
+
+    @property
+    def busy(self) -> bool:
+        """Ha registros aceitos e ainda nao gravados."""
+        return self._written < self._submitted
+
+    @property
+    def written(self) -> int:
+        """Registros ja gravados desde a criacao da fila."""
+        return self._written
+
+    def submit(self, record: Dict[str, Any]) -> None:
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("fila de gravacao encerrada")
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="calctribut-writer", daemon=True)
+                self._thread.start()
+            self._queue.append(record)
+            self._pending[record["id"]] = record
+            self._submitted += 1
+            self._cond.notify_all()
+
+    def pending(self, sim_id: str) -> Optional[Dict[str, Any]]:
+        """O registro se ele ainda estiver na fila."""
+        return self._pending.get(sim_id)
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Espera a gravacao de tudo o que foi aceito ate agora."""
+        with self._cond:
+            target = self._submitted
+            return self._cond.wait_for(lambda: self._written >= target, timeout)
+
+    def close(self, timeout: float = CLOSE_TIMEOUT) -> None:
+        """Grava o restante da fila e encerra a thread.
+
+        Se o armazenamento ainda falhar depois de ``timeout`` segundos, o
+        restante vai para ``dump_path``.
+        """
+        with self._cond:
+            if not self._closed:
+                self._closed = True
+                self._deadline = time.monotonic() + timeout
+            self._cond.notify_all()
+            thread = self._thread
+        if thread is not None:
+            # folga para a thread salvar o restante em ``dump_path``
+            thread.join(timeout + 1.0)
+            if thread.is_alive():
+                logger.error("fila de gravacao nao encerrou; %d simulacoes nao gravadas", len(self._pending))
+
+    def _take(self) -> List[Dict[str, Any]]:
+        with self._cond:
+            self._cond.wait_for(lambda: self._queue or self._closed)
+        if self.group_delay and not self._closed:
+            time.sleep(self.group_delay)
+        with self._cond:
+            batch = self._queue[: self.max_batch]
+            del self._queue[: len(batch)]
+            return batch
+
+    def _run(self) -> None:
+        retry_delay = 0.05
+        while True:
+            batch = self._take()
+            if not batch:
+                return  # fechada e vazia
+            try:
+                self.storage.save_many(batch)
+            except Exception:
+                remaining = self._deadline - time.monotonic()
+                if remaining <= 0:
+                    logger.exception("falha ao gravar %d simulacoes depois do encerramento", len(batch))
+                    with self._cond:
+                        batch += self._queue
+                        self._queue.clear()
+                    self._dump(batch)
+                    self._done(batch)
+                    return
+                logger.exception("falha ao gravar %d simulacoes; nova tentativa em %.2fs", len(batch), retry_delay)
+                with self._cond:
+                    self._queue[:0] = batch
+                time.sleep(min(retry_delay, remaining))
+                retry_delay = min(retry_delay * 2, MAX_RETRY_DELAY)
+                continue
+            retry_delay = 0.05
+            self._done(batch)
+
+    def _done(self, batch: List[Dict[str, Any]]) -> None:
+        with self._cond:
+            for record in batch:
+                if self._pending.get(record["id"]) is record:
+                    del self._pending[record["id"]]
+            self._written += len(batch)
+            self._cond.notify_all()
+
+    def _dump(self, records: List[Dict[str, Any]]) -> None:
+        """Salva em ``dump_path`` (uma simulacao por linha) o que nao foi gravado."""
+        try:
+            self.dump_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.dump_path, "a", encoding="utf-8") as handle:
+                for record in records:
+                    handle.write(json.dumps(record, ensure_ascii=False) + "\n")
+        except OSError:
+            logger.exception("nao foi possivel salvar as simulacoes em %s", self.dump_path)
+            for record in records:
+                logger.error("simulacao nao gravada: %s", json.dumps(record, ensure_ascii=False))
+            return
+        logger.error("%d simulacoes nao gravadas salvas em %s", len(records), self.dump_path)
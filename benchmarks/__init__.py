@@ -0,0 +1,12 @@
+"""Benchmarks do motor de calculo, do cold start, dos armazenamentos e dos endpoints.
+
+Uso::
+
+    python -m benchmarks                          # micro + startup + macro (10, 10k e 1M simulacoes)
+    python -m benchmarks --so micro
+    python -m benchmarks --so startup --comparar benchmarks/resultados/base.json
+    python -m benchmarks --tamanhos 10,10000 --comparar benchmarks/resultados/base.json
+
+Os resultados vao para ``benchmarks/resultados/<data>.json``; com ``--comparar``
+as variacoes acima de ``--tolerancia`` sao listadas e o comando sai com codigo 1.
+"""
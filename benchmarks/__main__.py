@@ -0,0 +1,98 @@
+"""Linha de comando: ``python -m benchmarks``."""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import time
+from datetime import datetime
+from functools import partial
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from .macro import run_macro
+from .micro import micro_benchmarks
+from .startup import SAMPLES, startup_benchmarks
+from .timing import MIN_TIME, REPEAT, compare, format_us, measure, results_document, save_results
+
+RESULTS_DIR = Path(__file__).resolve().parent / "resultados"
+DEFAULT_SIZES = "10,10000,1000000"
+
+
+def _sizes(value: str) -> Tuple[int, ...]:
+    try:
+        sizes = tuple(int(item) for item in value.split(",") if item.strip())
+    except ValueError:
+        raise argparse.ArgumentTypeError("use numeros separados por virgula (ex.: 10,10000)")
+    if not sizes or min(sizes) < 0:
+        raise argparse.ArgumentTypeError("informe ao menos um tamanho nao negativo")
+    return sizes
+
+
+def run(args: argparse.Namespace) -> Dict[str, Dict[str, Any]]:
+    timer = partial(measure, repeat=args.repeticoes, min_time=args.tempo_minimo)
+    results: Dict[str, Dict[str, Any]] = {}
+    if args.so in (None, "micro"):
+        for name, func in micro_benchmarks().items():
+            result = results[f"micro.{name}"] = timer(func)
+            print(f"{'micro.' + name:<70} {format_us(result['us']):>10}", flush=True)
+    if args.so in (None, "startup"):
+        for name, result in startup_benchmarks(args.amostras).items():
+            results[name] = result
+            print(f"{name:<70} {format_us(result['us']):>10}", flush=True)
+    if args.so in (None, "macro"):
+        started = time.perf_counter()
+        macro = run_macro(args.tamanhos, timer, args.formato, progress=partial(print, file=sys.stderr, flush=True))
+        for name, result in macro.items():
+            print(f"{name:<70} {format_us(result['us']):>10}")
+        print(f"macro: {time.perf_counter() - started:.1f}s (inclui semear os arquivos)")
+        results.update(macro)
+    return results
+
+
+def print_comparison(rows: List[Tuple[str, float, float, float, bool]], stream: Any = sys.stdout) -> None:
+    print(f"\n{'benchmark':<70} {'base':>10} {'atual':>10} {'variacao':>9}", file=stream)
+    for name, before, after, change, regression in rows:
+        flag = "  REGRESSAO" if regression else ""
+        print(f"{name:<70} {format_us(before):>10} {format_us(after):>10} {change:>+9.1%}{flag}", file=stream)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="Benchmarks do calctribut.")
+    parser.add_argument("--so", choices=("micro", "startup", "macro"), help="roda apenas um dos grupos")
+    parser.add_argument("--tamanhos", type=_sizes, default=_sizes(DEFAULT_SIZES), help="tamanhos dos arquivos")
+    parser.add_argument("--formato", choices=("json", "segment", "sqlite"), help="formato do armazenamento em arquivos")
+    parser.add_argument("--repeticoes", type=int, default=REPEAT, help="rodadas por benchmark")
+    parser.add_argument("--tempo-minimo", type=float, default=MIN_TIME, help="segundos minimos por rodada")
+    parser.add_argument("--amostras", type=int, default=SAMPLES, help="processos novos no benchmark de startup")
+    parser.add_argument("--saida", type=Path, help="arquivo JSON de resultados")
+    parser.add_argument("--comparar", type=Path, help="resultados anteriores para comparacao")
+    parser.add_argument("--tolerancia", type=float, default=0.10, help="variacao aceita antes de acusar regressao")
+    args = parser.parse_args(argv)
+
+    results = run(args)
+    options = {
+        "so": args.so,
+        "tamanhos": list(args.tamanhos),
+        "formato": args.formato,
+        "repeticoes": args.repeticoes,
+        "tempo_minimo": args.tempo_minimo,
+        "amostras": args.amostras,
+    }
+    output = args.saida or RESULTS_DIR / f"{datetime.now():%Y-%m-%d_%H%M%S}.json"
+    save_results(results_document(results, options), output)
+    print(f"resultados: {output}")
+
+    if args.comparar is None:
+        return 0
+    baseline = json.loads(args.comparar.read_text(encoding="utf-8"))["resultados"]
+    rows = compare(baseline, results, args.tolerancia)
+    print_comparison(rows)
+    regressions = sum(row[4] for row in rows)
+    print(f"{regressions} regressoes (tolerancia {args.tolerancia:.0%})")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,261 @@
+"""KV local em memoria que fala o protocolo REST do Upstash.
+
+``LocalKV`` implementa o subconjunto de comandos usado por ``app.py`` e
+``LocalKVAdapter`` o expoe como um adaptador do ``requests``: o ``KVClient``
+real continua serializando comandos e respostas em JSON, so nao ha rede.
+Valores grandes de ``SET`` ficam comprimidos para que um arquivo de 1 milhao
+de simulacoes caiba na memoria.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import zlib
+from bisect import bisect_left, bisect_right, insort
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+
+import requests
+from requests.adapters import BaseAdapter
+
+from backend import kv as kv_module
+
+LOCAL_URL = "http://kv.local"
+LOCAL_TOKEN = "local"
+# maior que qualquer id; delimita empates de score nas buscas binarias
+_MAX_MEMBER = "\uffff"
+COMPRESS_FROM = 512
+
+
+class LocalKV:
+    """Strings, hashes, listas e sorted sets em dicionarios (semantica do Redis simplificada)."""
+
+    def __init__(self) -> None:
+        self.strings: Dict[str, Union[str, bytes]] = {}
+        self.hashes: Dict[str, Dict[str, str]] = {}
+        self.lists: Dict[str, List[str]] = {}
+        self.zsets: Dict[str, Tuple[Dict[str, float], List[Tuple[float, str]]]] = {}
+        self.commands = 0
+
+    def execute(self, command: List[str]) -> Any:
+        self.commands += 1
+        name, args = command[0].upper(), command[1:]
+        handler = getattr(self, f"_cmd_{name.lower()}", None)
+        if handler is None:
+            raise ValueError(f"ERR comando nao suportado: {name}")
+        return handler(*args)
+
+    # -- strings -------------------------------------------------------------
+
+    def _string(self, key: str) -> Optional[str]:
+        value = self.strings.get(key)
+        if isinstance(value, bytes):
+            return zlib.decompress(value).decode("utf-8")
+        return value
+
+    def _cmd_get(self, key: str) -> Optional[str]:
+        return self._string(key)
+
+    def _cmd_set(self, key: str, value: str, *options: str) -> str:
+        value = str(value)
+        if len(value) >= COMPRESS_FROM:
+            self.strings[key] = zlib.compress(value.encode("utf-8"), 1)
+        else:
+            self.strings[key] = value
+        return "OK"
+
+    def _cmd_mget(self, *keys: str) -> List[Optional[str]]:
+        return [self._string(key) for key in keys]
+
+    def _cmd_incr(self, key: str) -> int:
+        value = int(self._string(key) or 0) + 1
+        self.strings[key] = str(value)
+        return value
+
+    def _cmd_del(self, *keys: str) -> int:
+        removed = 0
+        for key in keys:
+            for store in (self.strings, self.hashes, self.lists, self.zsets):
+                if store.pop(key, None) is not None:
+                    removed += 1
+        return removed
+
+    # -- hashes --------------------------------------------------------------
+
+    def _cmd_hset(self, key: str, *pairs: str) -> int:
+        values = self.hashes.setdefault(key, {})
+        added = 0
+        for field, value in zip(pairs[::2], pairs[1::2]):
+            added += field not in values
+            values[field] = value
+        return added
+
+    def _cmd_hget(self, key: str, field: str) -> Optional[str]:
+        return self.hashes.get(key, {}).get(field)
+
+    def _cmd_hmget(self, key: str, *fields: str) -> List[Optional[str]]:
+        values = self.hashes.get(key, {})
+        return [values.get(field) for field in fields]
+
+    def _cmd_hdel(self, key: str, *fields: str) -> int:
+        values = self.hashes.get(key, {})
+        return sum(values.pop(field, None) is not None for field in fields)
+
+    def _cmd_hlen(self, key: str) -> int:
+        return len(self.hashes.get(key, {}))
+
+    # -- listas ----------------------------------------------------------------
+
+    def _cmd_rpush(self, key: str, *values: str) -> int:
+        items = self.lists.setdefault(key, [])
+        items.extend(str(value) for value in values)
+        return len(items)
+
+    def _cmd_lrange(self, key: str, start: str, stop: str) -> List[str]:
+        items = self.lists.get(key, [])
+        size = len(items)
+        first, last = int(start), int(stop)
+        first = max(first + size if first < 0 else first, 0)
+        last = last + size if last < 0 else min(last, size - 1)
+        return items[first : last + 1]
+
+    def _cmd_ltrim(self, key: str, start: str, stop: str) -> str:
+        items = self.lists.get(key)
+        if items is not None:
+            items[:] = self._cmd_lrange(key, start, stop)
+        return "OK"
+
+    # -- sorted sets -----------------------------------------------------------
+
+    def _zset(self, key: str) -> Tuple[Dict[str, float], List[Tuple[float, str]]]:
+        return self.zsets.setdefault(key, ({}, []))
+
+    def _cmd_zadd(self, key: str, *pairs: str) -> int:
+        scores, ordered = self._zset(key)
+        added = 0
+        for raw_score, member in zip(pairs[::2], pairs[1::2]):
+            score = float(raw_score)
+            old = scores.get(member)
+            if old is not None:
+                del ordered[bisect_left(ordered, (old, member))]
+            else:
+                added += 1
+            scores[member] = score
+            insort(ordered, (score, member))
+        return added
+
+    def _cmd_zrem(self, key: str, *members: str) -> int:
+        scores, ordered = self._zset(key)
+        removed = 0
+        for member in members:
+            score = scores.pop(member, None)
+            if score is not None:
+                del ordered[bisect_left(ordered, (score, member))]
+                removed += 1
+        return removed
+
+    def _cmd_zcard(self, key: str) -> int:
+        return len(self._zset(key)[0])
+
+    def _cmd_zrange(self, key: str, start: str, stop: str, *options: str) -> List[str]:
+        _, ordered = self._zset(key)
+        flags = [option.upper() for option in options]
+        reverse = "REV" in flags
+        if "BYSCORE" in flags:
+            # com REV o primeiro limite e o maximo
+            high, low = (start, stop) if reverse else (stop, start)
+            lo_value, lo_open = _score_bound(low)
+            hi_value, hi_open = _score_bound(high)
+            first = bisect_right(ordered, (lo_value, _MAX_MEMBER)) if lo_open else bisect_left(ordered, (lo_value, ""))
+            last = bisect_left(ordered, (hi_value, "")) if hi_open else bisect_right(ordered, (hi_value, _MAX_MEMBER))
+            if "LIMIT" in flags:
+                position = flags.index("LIMIT")
+                offset, count = int(options[position + 1]), int(options[position + 2])
+                # recorta antes de copiar: com REV o deslocamento conta a partir do fim
+                if reverse:
+                    last = max(last - offset, first)
+                    if count >= 0:
+                        first = max(first, last - count)
+                else:
+                    first = min(first + offset, last)
+                    if count >= 0:
+                        last = min(last, first + count)
+            members = ordered[first:last]
+            return [member for _, member in (reversed(members) if reverse else members)]
+        size = len(ordered)
+        first, last = int(start), int(stop)
+        first = max(first + size if first < 0 else first, 0)
+        last = last + size if last < 0 else min(last, size - 1)
+        if last < first:
+            return []
+        if reverse:
+            members = ordered[size - 1 - last : size - first]
+            return [member for _, member in reversed(members)]
+        return [member for _, member in ordered[first : last + 1]]
+
+
+def _score_bound(value: str) -> Tuple[float, bool]:
+    if value.startswith("("):
+        return float(value[1:]), True
+    return float(value), False
+
+
+class LocalKVAdapter(BaseAdapter):
+    """Responde as requisicoes do ``KVClient`` a partir de um ``LocalKV``."""
+
+    def __init__(self, store: LocalKV) -> None:
+        super().__init__()
+        self.store = store
+
+    def _run(self, command: List[str]) -> Dict[str, Any]:
+        try:
+            return {"result": self.store.execute(command)}
+        except (ValueError, TypeError) as exc:
+            return {"error": str(exc)}
+
+    def send(self, request: requests.PreparedRequest, **kwargs: Any) -> requests.Response:
+        body = json.loads(request.body or b"[]")
+        if request.path_url.rstrip("/") in ("/pipeline", "/multi-exec"):
+            payload: Any = [self._run(command) for command in body]
+        else:
+            payload = self._run(body)
+        response = requests.Response()
+        response.status_code = 200
+        response._content = json.dumps(payload).encode("utf-8")
+        response.headers["Content-Type"] = "application/json"
+        response.url = request.url or ""
+        response.request = request
+        return response
+
+    def close(self) -> None:
+        pass
+
+
+@contextmanager
+def use_local_kv(store: Optional[LocalKV] = None) -> Iterator[LocalKV]:
+    """Configura o KV (variaveis de ambiente + cliente compartilhado) para ``store``."""
+    store = store if store is not None else LocalKV()
+    client = kv_module.KVClient(LOCAL_URL, LOCAL_TOKEN)
+    adapter = LocalKVAdapter(store)
+    # inclui os prefixos mais especificos do cliente (ex.: ``/multi-exec``)
+    for prefix in [LOCAL_URL, *(prefix for prefix in client._session.adapters if prefix.startswith(LOCAL_URL))]:
+        client._session.mount(prefix, adapter)
+    key = (LOCAL_URL, LOCAL_TOKEN)
+    saved_env = {name: os.environ.get(name) for name in ("KV_REST_API_URL", "KV_REST_API_TOKEN")}
+    saved_client = kv_module._CLIENTS.get(key)
+    os.environ["KV_REST_API_URL"] = LOCAL_URL
+    os.environ["KV_REST_API_TOKEN"] = LOCAL_TOKEN
+    kv_module._CLIENTS[key] = client
+    try:
+        yield store
+    finally:
+        for name, value in saved_env.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+        if saved_client is None:
+            kv_module._CLIENTS.pop(key, None)
+        else:
+            kv_module._CLIENTS[key] = saved_client
@@ -0,0 +1,201 @@
+"""Macro-benchmarks dos endpoints via clientes de teste do Flask e do FastAPI.
+
+O arquivo de simulacoes e semeado com entradas sinteticas deterministicas
+(``bulk.import_payloads``) em um diretorio temporario ou no ``LocalKV``; os
+apps sao apontados para ele durante as medicoes. O FastAPI so tem o backend
+de arquivos, entao roda apenas com ele.
+"""
+
+from __future__ import annotations
+
+import os
+import random
+import tempfile
+from contextlib import ExitStack, contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+from backend.bulk import import_payloads
+from backend.memo import CALCULATION_CACHE
+from backend.storage import open_storage
+
+from .kvlocal import use_local_kv
+
+SEED = 2026
+COMPANIES = 50
+PAGE = 100
+# listagens sem paginacao so ate este tamanho (acima disso medem so serializacao)
+FULL_LIST_LIMIT = 10_000
+CALCULATE_PAYLOAD = {
+    "rendimento_mensal": 30000.0,
+    "despesas_anuais": {"secretaria": 24000.0, "aluguel_condominio": 36000.0, "contador": 6000.0},
+    "pro_labore": 1621.0,
+}
+
+Benchmarks = Dict[str, Callable[[], Any]]
+Measure = Callable[[Callable[[], Any]], Dict[str, Any]]
+
+
+def synthetic_payloads(count: int, seed: int = SEED) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """``(linha, payload)`` como os de ``bulk.iter_payloads``, sempre os mesmos para a mesma semente."""
+    rng = random.Random(seed)
+    for index in range(count):
+        yield index + 1, {
+            "nome_cliente": f"Cliente {index % 5000}",
+            "nome_empresa": f"Clinica {index % COMPANIES}",
+            "rendimento_mensal": round(rng.uniform(3000.0, 150000.0), 2),
+            "despesas_anuais": {
+                "secretaria": round(rng.uniform(0.0, 60000.0), 2),
+                "aluguel_condominio": round(rng.uniform(0.0, 80000.0), 2),
+                "contador": round(rng.uniform(0.0, 12000.0), 2),
+            },
+            "pro_labore": rng.choice((0.0, 1621.0, 5000.0)),
+            "iss_fixo": rng.choice((0.0, 0.0, 120.0)),
+        }
+
+
+@contextmanager
+def _patched(target: Any, name: str, value: Any) -> Iterator[None]:
+    saved = getattr(target, name)
+    setattr(target, name, value)
+    try:
+        yield
+    finally:
+        setattr(target, name, saved)
+
+
+@contextmanager
+def _without_env(*names: str) -> Iterator[None]:
+    saved = {name: os.environ.pop(name) for name in names if name in os.environ}
+    try:
+        yield
+    finally:
+        os.environ.update(saved)
+
+
+@contextmanager
+def file_archive(size: int, storage_format: Optional[str] = None) -> Iterator[Any]:
+    """Armazenamento em arquivos temporario com ``size`` simulacoes, usado pelos dois apps."""
+    import app as flask_app
+    from backend import main as fastapi_app
+
+    with ExitStack() as stack:
+        # sem KV configurado o app Flask usa ``FILE_STORAGE``
+        stack.enter_context(_without_env("KV_REST_API_URL", "KV_REST_API_TOKEN", "VERCEL", "VERCEL_ENV"))
+        tmp = stack.enter_context(tempfile.TemporaryDirectory(prefix="calctribut-bench-"))
+        storage = open_storage(Path(tmp) / "simulacoes", storage_format)
+        with storage.deferred_catalog():
+            import_payloads(synthetic_payloads(size), storage.save_many)
+        stack.enter_context(_patched(flask_app, "FILE_STORAGE", storage))
+        stack.enter_context(_patched(fastapi_app, "STORAGE", storage))
+        yield storage
+
+
+@contextmanager
+def kv_archive(size: int) -> Iterator[Any]:
+    """``LocalKV`` com ``size`` simulacoes gravadas por ``app._save_records``."""
+    import app as flask_app
+
+    with use_local_kv() as store:
+        import_payloads(synthetic_payloads(size), flask_app._save_records)
+        yield store
+
+
+@contextmanager
+def flask_client() -> Iterator[Tuple[Any, Dict[str, str]]]:
+    import app as flask_app
+
+    credentials = flask_app._get_credentials()
+    token = flask_app._make_token(credentials["login"], credentials["password"])
+    yield flask_app.app.test_client(), {"X-Auth-Token": token}
+
+
+@contextmanager
+def fastapi_client() -> Iterator[Tuple[Any, Dict[str, str]]]:
+    from fastapi.testclient import TestClient
+
+    from backend import main as fastapi_app
+
+    credentials = fastapi_app._get_credentials()
+    with TestClient(fastapi_app.app) as client:
+        response = client.post("/login", json={"login": credentials["login"], "senha": credentials["password"]})
+        response.raise_for_status()
+        yield client, {"X-Auth-Token": response.json()["token"]}
+
+
+def _request(
+    client: Any, method: str, path: str, headers: Dict[str, str], expected: int = 200, body: Any = None
+) -> Callable[[], Any]:
+    send = getattr(client, method.lower())
+    kwargs = {"headers": headers} if body is None else {"headers": headers, "json": body}
+
+    def run() -> Any:
+        response = send(path, **kwargs)
+        if response.status_code != expected:
+            raise RuntimeError(f"{method} {path}: status {response.status_code}, esperado {expected}")
+        return response
+
+    return run
+
+
+@contextmanager
+def _calculation_cache(maxsize: int) -> Iterator[None]:
+    saved = CALCULATION_CACHE.maxsize
+    CALCULATION_CACHE.clear()
+    CALCULATION_CACHE.maxsize = maxsize
+    try:
+        yield
+    finally:
+        CALCULATION_CACHE.maxsize = saved
+        CALCULATION_CACHE.clear()
+
+
+def measure_calculate(client: Any, headers: Dict[str, str], measure: Measure) -> Dict[str, Dict[str, Any]]:
+    """``POST /calculate`` sem cache (sempre calcula) e com o resultado ja em cache."""
+    run = _request(client, "POST", "/calculate", headers, body=CALCULATE_PAYLOAD)
+    with _calculation_cache(0):
+        cold = measure(run)
+    with _calculation_cache(CALCULATION_CACHE.maxsize or 1024):
+        warm = measure(run)
+    return {"POST /calculate": cold, "POST /calculate (cache)": warm}
+
+
+def archive_benchmarks(client: Any, headers: Dict[str, str], size: int) -> Benchmarks:
+    """Listagens, analise e o caminho 304 sobre um arquivo de ``size`` simulacoes."""
+    paths = [f"/simulations?limit={PAGE}", f"/analysis?limit={PAGE}", "/analysis/summary"]
+    if size <= FULL_LIST_LIMIT:
+        paths += ["/simulations", "/analysis"]
+    benchmarks = {f"GET {path}": _request(client, "GET", path, headers) for path in paths}
+    page = f"/simulations?limit={PAGE}"
+    etag = _request(client, "GET", page, headers)().headers["ETag"]
+    benchmarks[f"GET {page} (304)"] = _request(client, "GET", page, {**headers, "If-None-Match": etag}, 304)
+    return benchmarks
+
+
+def run_macro(
+    sizes: Tuple[int, ...],
+    measure: Measure,
+    storage_format: Optional[str] = None,
+    progress: Callable[[str], Any] = lambda message: None,
+) -> Dict[str, Dict[str, Any]]:
+    """Mede todos os cenarios; chaves ``macro.<app>[.<backend>.<tamanho>].<endpoint>``."""
+    results: Dict[str, Dict[str, Any]] = {}
+    clients = {"flask": flask_client, "fastapi": fastapi_client}
+
+    for app_name, open_client in clients.items():
+        with file_archive(0, storage_format), open_client() as (client, headers):
+            for name, result in measure_calculate(client, headers, measure).items():
+                results[f"macro.{app_name}.{name}"] = result
+
+    for size in sizes:
+        progress(f"semeando {size} simulacoes em arquivos")
+        with file_archive(size, storage_format) as storage:
+            for app_name, open_client in clients.items():
+                with open_client() as (client, headers):
+                    for name, func in archive_benchmarks(client, headers, size).items():
+                        results[f"macro.{app_name}.{storage.FORMAT}.{size}.{name}"] = measure(func)
+        progress(f"semeando {size} simulacoes no KV local")
+        with kv_archive(size), flask_client() as (client, headers):
+            for name, func in archive_benchmarks(client, headers, size).items():
+                results[f"macro.flask.kv.{size}.{name}"] = measure(func)
+    return results
@@ -0,0 +1,44 @@
+"""Micro-benchmarks do motor de calculo e das regras."""
+
+from __future__ import annotations
+
+from typing import Any, Callable, Dict
+
+from backend import metrics
+from backend.batch import calculate_batch
+from backend.calculations import calculate, calculate_all, calculate_pf, calculate_pj
+from backend.constants import DEFAULT_RULES, _deep_merge, get_rules
+from backend.memo import MemoCache, cached_calculate_all
+
+EXPENSES = {
+    "secretaria": 24000.0,
+    "aluguel_condominio": 36000.0,
+    "contador": 6000.0,
+    "outras_despesas": 3000.0,
+    "total": 69000.0,
+}
+BATCH_SIZE = 1000
+
+
+def _timed_block() -> None:
+    with metrics.stage("calculo"):
+        pass
+
+
+def micro_benchmarks() -> Dict[str, Callable[[], Any]]:
+    override = {"pj": {"cbs_enabled": True, "ibs_enabled": True}, "pf": {"irpf_flat": 0.275}}
+    incomes = [5000.0 + 100.0 * index for index in range(BATCH_SIZE)]
+    batch_expenses = {name: [value] * BATCH_SIZE for name, value in EXPENSES.items() if name != "total"}
+    cache = MemoCache()
+    return {
+        "calculate_pf": lambda: calculate_pf(30000.0, EXPENSES["total"], 0.0, 1621.0, EXPENSES["secretaria"]),
+        "calculate_pj": lambda: calculate_pj(30000.0, EXPENSES, 1621.0, 0.0),
+        "calculate_all": lambda: calculate_all(30000.0, EXPENSES, 1621.0, 0.0, 1621.0),
+        "calculate+to_json": lambda: calculate(30000.0, EXPENSES, 1621.0, 0.0, 1621.0).to_json(),
+        "cached_calculate_all": lambda: cached_calculate_all(30000.0, EXPENSES, 1621.0, 0.0, 1621.0, cache=cache),
+        f"calculate_batch[{BATCH_SIZE}]": lambda: calculate_batch(incomes, batch_expenses),
+        "get_rules": get_rules,
+        "_deep_merge": lambda: _deep_merge(DEFAULT_RULES, override),
+        # custo de um ponto instrumentado com METRICS_ENABLED desligado/ligado
+        f"metrics.stage[{'ligado' if metrics.ENABLED else 'desligado'}]": _timed_block,
+    }
@@ -0,0 +1,93 @@
+"""Tempo de cold start da funcao do Vercel (``app.py``).
+
+Cada amostra roda num interpretador novo: mede o ``import app`` e, em
+seguida, a primeira requisicao (``POST /calculate`` pelo cliente de teste),
+que ainda carrega as regras tributarias. Sem KV configurado, como no
+deploy sem Upstash. Os resultados tem o mesmo formato de ``timing.measure``
+e entram na comparacao com ``--comparar``.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+from typing import Any, Dict, List
+
+from .macro import CALCULATE_PAYLOAD
+
+ROOT = Path(__file__).resolve().parent.parent
+SAMPLES = 15
+# Modulos que o cold start nao deve carregar (so no primeiro uso).
+LAZY_MODULES = (
+    "requests",
+    "urllib3",
+    "pydantic",
+    "backend.models",
+    "backend.bulk",
+    "backend.export",
+    "backend.recompute",
+    "backend.sensitivity",
+    "backend.solver",
+    "concurrent.futures",
+    "multiprocessing",
+)
+
+_PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import app
+imported = time.perf_counter()
+client = app.app.test_client()
+credentials = app._get_credentials()
+token = app._make_token(credentials["login"], credentials["password"])
+response = client.post("/calculate", json=json.loads(sys.argv[1]), headers={"X-Auth-Token": token})
+assert response.status_code == 200, response.status_code
+finished = time.perf_counter()
+print(json.dumps({
+    "import": imported - started,
+    "primeira_requisicao": finished - imported,
+    "carregados": [name for name in json.loads(sys.argv[2]) if name in sys.modules],
+}))
+"""
+
+
+def probe() -> Dict[str, Any]:
+    """Uma amostra: segundos do import e da primeira requisicao num processo novo."""
+    env = {
+        name: value
+        for name, value in os.environ.items()
+        if name not in ("KV_REST_API_URL", "KV_REST_API_TOKEN", "UPSTASH_REDIS_REST_URL", "UPSTASH_REDIS_REST_TOKEN")
+    }
+    output = subprocess.run(
+        [sys.executable, "-c", _PROBE, json.dumps(CALCULATE_PAYLOAD), json.dumps(LAZY_MODULES)],
+        cwd=ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(output.stdout)
+
+
+def _result(samples: List[float]) -> Dict[str, Any]:
+    return {
+        "us": min(samples) * 1e6,
+        "mediana_us": statistics.median(samples) * 1e6,
+        "chamadas": len(samples),
+    }
+
+
+def startup_benchmarks(samples: int = SAMPLES) -> Dict[str, Dict[str, Any]]:
+    """``startup.import app`` e ``startup.primeira requisicao`` (melhor e mediana)."""
+    runs = [probe() for _ in range(max(samples, 1))]
+    loaded = sorted({name for run in runs for name in run["carregados"]})
+    if loaded:
+        raise RuntimeError(f"o import de app.py voltou a carregar: {', '.join(loaded)}")
+    return {
+        "startup.import app": _result([run["import"] for run in runs]),
+        "startup.primeira requisicao": _result([run["primeira_requisicao"] for run in runs]),
+    }
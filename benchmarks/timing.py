@@ -0,0 +1,88 @@
+"""Medicao dos tempos e arquivo de resultados (JSON) comparavel entre execucoes."""
+
+from __future__ import annotations
+
+import json
+import platform
+import statistics
+import subprocess
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+MIN_TIME = 0.2
+REPEAT = 5
+
+
+def measure(func: Callable[[], Any], repeat: int = REPEAT, min_time: float = MIN_TIME) -> Dict[str, Any]:
+    """Tempo por chamada em microssegundos (melhor e mediana de ``repeat`` rodadas).
+
+    Cada rodada repete ``func`` o suficiente para durar ``min_time`` segundos.
+    """
+    number = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(number):
+            func()
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_time or number >= 1 << 20:
+            break
+        number *= 2 if elapsed <= 0 else max(2, min(10, int(min_time / elapsed) + 1))
+    samples = [elapsed / number]
+    for _ in range(repeat - 1):
+        started = time.perf_counter()
+        for _ in range(number):
+            func()
+        samples.append((time.perf_counter() - started) / number)
+    return {
+        "us": min(samples) * 1e6,
+        "mediana_us": statistics.median(samples) * 1e6,
+        "chamadas": number * len(samples),
+    }
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        output = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True, timeout=10
+        )
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return output.stdout.strip() or None
+
+
+def results_document(results: Dict[str, Dict[str, Any]], options: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "criado_em": datetime.now().isoformat(timespec="seconds"),
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "opcoes": options,
+        "resultados": results,
+    }
+
+
+def save_results(document: Dict[str, Any], path: Path) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(document, ensure_ascii=False, indent=2, sort_keys=True), encoding="utf-8")
+
+
+def compare(
+    baseline: Dict[str, Dict[str, Any]], current: Dict[str, Dict[str, Any]], tolerance: float
+) -> List[Tuple[str, float, float, float, bool]]:
+    """``(nome, base_us, atual_us, variacao, regressao)`` para os nomes presentes nos dois."""
+    rows = []
+    for name in sorted(set(baseline) & set(current)):
+        before, after = baseline[name]["us"], current[name]["us"]
+        change = (after - before) / before if before else 0.0
+        rows.append((name, before, after, change, change > tolerance))
+    return rows
+
+
+def format_us(value: float) -> str:
+    if value >= 1e6:
+        return f"{value / 1e6:.2f} s"
+    if value >= 1e3:
+        return f"{value / 1e3:.2f} ms"
+    return f"{value:.1f} us"
@@ -0,0 +1,14 @@
+def make_record(sim_id, created_at, empresa="Clinica", cliente="Ana", rendimento=120000.0, economia=100.0):
+    """Registro minimo de simulacao, com os campos que entram no resumo."""
+    return {
+        "id": sim_id,
+        "created_at": created_at,
+        "nome_cliente": cliente,
+        "nome_empresa": empresa,
+        "input": {},
+        "output": {
+            "pf": {"rendimento_anual": rendimento, "total_tributos": 30000.0, "aliquota_efetiva": 0.25},
+            "pj": {"total_impostos": 15000.0, "impacto_pf": 500.0, "aliquota_efetiva_final": 0.13},
+            "comparativo": {"economia_tributaria": economia},
+        },
+    }
@@ -0,0 +1,93 @@
+import random
+
+import pytest
+
+import app as flask_app
+from backend.aggregates import Aggregates
+from backend.storage import FileStorage
+from benchmarks.kvlocal import use_local_kv
+from conftest import make_record
+
+
+def _summary(index, rng):
+    return {
+        "id": f"empresa_{index % 3}/{index:04d}",
+        "nome_empresa": f"Empresa {index % 3}",
+        "rendimento_anual": rng.uniform(0, 5_000_000),
+        "economia_tributaria": rng.uniform(-200_000, 200_000),
+        "aliquota_pf": rng.uniform(0.1, 0.3),
+        "aliquota_pj_final": rng.uniform(0.05, 0.3),
+    }
+
+
+def _assert_reports_equal(atual, esperado):
+    assert atual.keys() == esperado.keys()
+    assert atual["total"] == pytest.approx(esperado["total"])
+    assert len(atual["empresas"]) == len(esperado["empresas"])
+    for item, esperado_item in zip(atual["empresas"], esperado["empresas"]):
+        assert item == pytest.approx(esperado_item)
+    for item, esperado_item in zip(atual["faixas"], esperado["faixas"]):
+        assert item == pytest.approx(esperado_item)
+
+
+def test_agregados_incrementais_iguais_a_reconstrucao():
+    rng = random.Random(7)
+    summaries = [_summary(index, rng) for index in range(60)]
+    aggregates = Aggregates.from_summaries(summaries)
+
+    # remove primeiro os extremos para forcar o recalculo de minimo/maximo
+    summaries.sort(key=lambda item: item["economia_tributaria"])
+    for removed in (summaries.pop(), summaries.pop(0), summaries.pop(10)):
+        stale = aggregates.remove(removed)
+        aggregates.refresh_extremes(stale, summaries)
+
+    _assert_reports_equal(aggregates.report(), Aggregates.from_summaries(summaries).report())
+
+
+def test_agregados_do_armazenamento_em_arquivo(tmp_path):
+    storage = FileStorage(tmp_path, check_interval=0)
+    for sim_id, economia in (("a/1", 100.0), ("a/2", -50.0), ("b/1", 300.0)):
+        storage.save(
+            {
+                "id": sim_id,
+                "created_at": f"2026-01-0{sim_id[-1]}T00:00:00",
+                "nome_empresa": sim_id[0].upper(),
+                "output": {"pf": {"rendimento_anual": 120000.0}, "comparativo": {"economia_tributaria": economia}},
+            }
+        )
+    assert storage.aggregates()["total"]["economia_max"] == 300.0
+
+    storage.delete("b/1")
+    report = storage.aggregates()
+
+    assert report["total"]["quantidade"] == 2
+    assert report["total"]["economia_max"] == 100.0
+    assert report["total"]["pj_vantajosa"] == 1
+    assert [item["empresa"] for item in report["empresas"]] == ["A"]
+
+
+def test_agregados_do_kv_nao_perdem_gravacoes_concorrentes(monkeypatch):
+    with use_local_kv():
+        for dia in (1, 2, 3):
+            flask_app._save_record(make_record(f"a/2026-01-0{dia}_100000", f"2026-01-0{dia}T10:00:00", economia=dia))
+        assert flask_app._analysis_aggregates()["total"]["quantidade"] == 3
+
+        # duas inclusoes e uma exclusao cujas transacoes se intercalam antes da atualizacao
+        atrasadas = []
+        with monkeypatch.context() as concorrente:
+            concorrente.setattr(flask_app, "_kv_update_aggregates", lambda *args: atrasadas.append(args))
+            flask_app._save_record(make_record("b/2026-01-04_100000", "2026-01-04T10:00:00", economia=40.0))
+            flask_app._save_record(make_record("b/2026-01-05_100000", "2026-01-05T10:00:00", economia=50.0))
+            flask_app._delete_record("a/2026-01-01_100000")
+        for args in reversed(atrasadas):
+            flask_app._kv_update_aggregates(*args)
+        _assert_reports_equal(
+            flask_app._analysis_aggregates(), Aggregates.from_summaries(flask_app._list_summaries()).report()
+        )
+
+        # resumo corrompido: a exclusao conclui e os agregados sao reconstruidos
+        flask_app._kv_client().command("HSET", flask_app.KV_SUMMARIES_KEY, "b/2026-01-05_100000", "{")
+        assert flask_app._delete_record("b/2026-01-05_100000")
+        report = flask_app._analysis_aggregates()
+        assert report["total"]["quantidade"] == 3
+        assert report["total"]["economia_max"] == 40.0
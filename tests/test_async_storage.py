@@ -0,0 +1,49 @@
+import asyncio
+import threading
+
+from backend import async_storage
+from backend.async_storage import AsyncStorage
+from backend.storage import FileStorage
+from conftest import make_record
+
+
+def test_get_many_em_blocos_mantem_a_ordem(tmp_path, monkeypatch):
+    monkeypatch.setattr(async_storage, "FANOUT_CHUNK", 3)
+    storage = AsyncStorage(FileStorage(tmp_path, check_interval=0))
+    ids = [f"clinica/2026-01-{day:02d}_100000" for day in range(1, 11)]
+
+    async def run():
+        await storage.save_many(make_record(sim_id, sim_id[8:18] + "T10:00:00") for sim_id in ids)
+        return await storage.get_many(list(reversed(ids)) + ["clinica/inexistente"])
+
+    records = asyncio.run(run())
+    assert [record["id"] for record in records[:-1]] == list(reversed(ids))
+    assert records[-1] is None
+
+
+def test_leituras_simultaneas_compartilham_a_mesma_chamada(tmp_path):
+    backend = FileStorage(tmp_path, check_interval=0)
+    liberar = threading.Event()
+    chamadas = []
+    original = backend.list_summaries
+
+    def lenta(**kwargs):
+        chamadas.append(kwargs)
+        liberar.wait(5)
+        return original(**kwargs)
+
+    backend.list_summaries = lenta
+    storage = AsyncStorage(backend)
+
+    async def run():
+        pendentes = [asyncio.ensure_future(storage.list_summaries(limit=10)) for _ in range(20)]
+        await asyncio.sleep(0.05)
+        liberar.set()
+        primeiras = await asyncio.gather(*pendentes)
+        await storage.save(make_record("clinica/2026-01-01_100000", "2026-01-01T10:00:00"))
+        return primeiras, await storage.list_summaries(limit=10)
+
+    primeiras, depois = asyncio.run(run())
+    assert all(page == [] for page in primeiras)
+    assert [summary["id"] for summary in depois] == ["clinica/2026-01-01_100000"]
+    assert len(chamadas) == 2
@@ -0,0 +1,113 @@
+import random
+
+import pytest
+from fastapi.testclient import TestClient
+
+import app as flask_app
+from backend import calculations, main
+from backend.batch import (
+    EXPENSE_FIELDS,
+    batch_row,
+    batch_rows,
+    calculate_batch,
+    calculate_comparativo_batch,
+)
+from backend.calculations import calculate_all
+from backend.constants import DEFAULT_RULES, _deep_merge
+
+
+def _cenarios(quantidade):
+    rng = random.Random(42)
+    cenarios = []
+    for _ in range(quantidade):
+        despesas = {name: rng.choice([0.0, rng.uniform(0, 80000)]) for name in EXPENSE_FIELDS}
+        despesas["total"] = sum(despesas[name] for name in EXPENSE_FIELDS)
+        cenarios.append(
+            {
+                "monthly_income": rng.choice([0.0, rng.uniform(1000, 400000)]),
+                "annual_expenses": despesas,
+                "pro_labore_monthly": rng.uniform(0, 20000),
+                "iss_fixo": rng.uniform(0, 3000),
+                "salario_minimo": rng.choice([0.0, 1621.0, 1518.0]),
+            }
+        )
+    return cenarios
+
+
+@pytest.mark.parametrize(
+    "override",
+    [
+        {},
+        {"pj": {"double_expense_in_pj": False}},
+        {"pj": {"cbs_enabled": True, "ibs_enabled": True}},
+    ],
+)
+def test_lote_igual_ao_calculo_escalar(monkeypatch, override):
+    rules = _deep_merge(DEFAULT_RULES, override)
+    monkeypatch.setattr(calculations, "get_rules", lambda: rules)
+    cenarios = _cenarios(200)
+
+    result = calculate_batch(
+        monthly_income=[c["monthly_income"] for c in cenarios],
+        annual_expenses={
+            name: [c["annual_expenses"][name] for c in cenarios] for name in EXPENSE_FIELDS
+        },
+        pro_labore_monthly=[c["pro_labore_monthly"] for c in cenarios],
+        iss_fixo=[c["iss_fixo"] for c in cenarios],
+        salario_minimo=[c["salario_minimo"] for c in cenarios],
+        rules=rules,
+    )
+
+    for index, cenario in enumerate(cenarios):
+        assert batch_row(result, index) == calculate_all(**cenario)
+    assert batch_rows(result) == [batch_row(result, index) for index in range(len(cenarios))]
+
+
+def test_lote_colunas_de_tamanhos_diferentes():
+    with pytest.raises(ValueError):
+        calculate_batch(monthly_income=[1000.0, 2000.0], annual_expenses={}, iss_fixo=[1.0])
+
+
+def test_comparativo_em_lote_igual_ao_lote_completo():
+    cenarios = _cenarios(200)
+    colunas = {
+        "monthly_income": [c["monthly_income"] for c in cenarios],
+        "annual_expenses": {
+            name: [c["annual_expenses"][name] for c in cenarios] for name in EXPENSE_FIELDS
+        },
+        "pro_labore_monthly": [c["pro_labore_monthly"] for c in cenarios],
+        "iss_fixo": [c["iss_fixo"] for c in cenarios],
+        "salario_minimo": [c["salario_minimo"] for c in cenarios],
+    }
+
+    completo = calculate_batch(**colunas)["comparativo"]
+    enxuto = calculate_comparativo_batch(**colunas)
+
+    for name, values in enxuto.items():
+        assert values == completo[name]
+
+
+def test_rotas_recusam_numeros_nao_finitos_nos_dois_apps():
+    enorme = {"rendimento_mensal": [1000.0, 1e308]}
+    infinito = '{"rendimento_mensal": [1000.0, Infinity]}'
+    cliente_flask = flask_app.app.test_client()
+    credenciais = flask_app._get_credentials()
+    cabecalhos = {"X-Auth-Token": flask_app._make_token(credenciais["login"], credenciais["password"])}
+    assert cliente_flask.post("/calculate/batch", json=enorme, headers=cabecalhos).status_code == 422
+    resposta = cliente_flask.post("/calculate/batch", data=infinito, headers=cabecalhos, content_type="application/json")
+    assert resposta.status_code == 400
+
+    with TestClient(main.app) as cliente:
+        credenciais = main._get_credentials()
+        token = cliente.post("/login", json={"login": credenciais["login"], "senha": credenciais["password"]})
+        cabecalhos = {"X-Auth-Token": token.json()["token"], "Content-Type": "application/json"}
+        assert cliente.post("/calculate/batch", json=enorme, headers=cabecalhos).status_code == 422
+        assert cliente.post("/calculate/batch", content=infinito, headers=cabecalhos).status_code == 422
+        outras = {
+            "/break-even": '{"pro_labore": Infinity}',
+            "/optimize/pro-labore": '{"rendimento_mensal": NaN}',
+            "/sensitivity": '{"eixo_x": {"campo": "rendimento_mensal", "inicio": 0, "fim": Infinity, "passos": 2},'
+            ' "eixo_y": {"campo": "pro_labore", "inicio": 0, "fim": 1, "passos": 2}}',
+        }
+        for rota, corpo in outras.items():
+            assert cliente.post(rota, content=corpo, headers=cabecalhos).status_code == 422, rota
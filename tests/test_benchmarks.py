@@ -0,0 +1,24 @@
+from functools import partial
+
+from benchmarks.kvlocal import LocalKV
+from benchmarks.macro import run_macro
+from benchmarks.timing import compare, measure
+
+
+def test_kv_local_zrange_por_score_e_reverso():
+    kv = LocalKV()
+    kv.execute(["ZADD", "idx", "1", "a", "2", "b", "2", "c", "3", "d"])
+    kv.execute(["ZADD", "idx", "0", "d"])
+    assert kv.execute(["ZRANGE", "idx", "0", "-1"]) == ["d", "a", "b", "c"]
+    assert kv.execute(["ZRANGE", "idx", "0", "1", "REV"]) == ["c", "b"]
+    assert kv.execute(["ZRANGE", "idx", "(2", "-inf", "BYSCORE", "REV", "LIMIT", "0", "2"]) == ["a", "d"]
+    assert kv.execute(["ZRANGE", "idx", "1", "2", "BYSCORE"]) == ["a", "b", "c"]
+
+
+def test_macro_pequeno_e_comparacao():
+    resultados = run_macro((10,), partial(measure, repeat=1, min_time=0.0))
+    assert "macro.flask.kv.10.GET /simulations?limit=100 (304)" in resultados
+    assert "macro.fastapi.json.10.GET /analysis/summary" in resultados
+    base = {nome: {"us": 100.0} for nome in resultados}
+    linhas = compare(base, {nome: {"us": 120.0} for nome in resultados}, 0.10)
+    assert len(linhas) == len(resultados) and all(linha[4] for linha in linhas)
@@ -0,0 +1,107 @@
+import zipfile
+
+import pytest
+
+from backend.bulk import import_payloads, iter_payloads, normalize_header, payload_builder
+from backend.segments import SegmentStorage
+from backend.storage import FileStorage
+
+_NS = 'xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"'
+_REL_NS = 'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships"'
+
+
+def _xlsx(path, rows):
+    shared = []
+    sheet_rows = []
+    for number, values in enumerate(rows, start=1):
+        cells = []
+        for column, value in enumerate(values):
+            ref = f"{chr(65 + column)}{number}"
+            if isinstance(value, str):
+                shared.append(value)
+                cells.append(f'<c r="{ref}" t="s"><v>{len(shared) - 1}</v></c>')
+            else:
+                cells.append(f'<c r="{ref}"><v>{value}</v></c>')
+        sheet_rows.append(f'<row r="{number}">{"".join(cells)}</row>')
+    with zipfile.ZipFile(path, "w") as archive:
+        archive.writestr(
+            "xl/workbook.xml",
+            f'<workbook {_NS} {_REL_NS}><sheets><sheet name="Clientes" sheetId="1" r:id="rId1"/></sheets></workbook>',
+        )
+        archive.writestr(
+            "xl/_rels/workbook.xml.rels",
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            '<Relationship Id="rId1" Target="worksheets/sheet1.xml"/></Relationships>',
+        )
+        archive.writestr(
+            "xl/sharedStrings.xml",
+            f"<sst {_NS}>" + "".join(f"<si><t>{text}</t></si>" for text in shared) + "</sst>",
+        )
+        archive.writestr("xl/worksheets/sheet1.xml", f"<worksheet {_NS}><sheetData>{''.join(sheet_rows)}</sheetData></worksheet>")
+
+
+def test_cabecalho_aceita_acentos_e_prefixos():
+    assert normalize_header(" Rendimento Mensal ") == "rendimento_mensal"
+    assert normalize_header("despesas_anuais.Secretária") == "secretaria"
+    assert normalize_header("input.nome_empresa") == "nome_empresa"
+
+
+def test_numeros_com_separador_de_milhar():
+    build = payload_builder(["Rendimento Mensal", "Secretária"])
+    valores = [build([texto, "0"])["rendimento_mensal"] for texto in ("R$ 20.000", "1.500", "1.500.000")]
+    assert valores == ["20000", "1500", "1500000"]
+    assert build(["1.234,56", "1.5"]) == {"rendimento_mensal": "1234.56", "despesas_anuais": {"secretaria": "1.5"}}
+    assert build(["1500.50", "0"])["rendimento_mensal"] == "1500.50"
+
+
+def test_csv_brasileiro_com_linhas_invalidas(tmp_path):
+    arquivo = tmp_path / "clientes.csv"
+    arquivo.write_text(
+        "Nome Cliente;Nome Empresa;Rendimento Mensal;Secretária\n"
+        "Ana;Clínica Sol;R$ 20.000,50;12000\n"
+        "\n"
+        "Bia;;15000;0\n"
+        "Caio;Clínica Sol;abc;0\n"
+        "Duda;Outra;30000;1.500,00\n",
+        encoding="utf-8",
+    )
+    storage = SegmentStorage(tmp_path / "dados", check_interval=0)
+    with storage.deferred_catalog():
+        report = import_payloads(iter_payloads(arquivo), storage.save_many, batch_size=1)
+        assert not storage.catalog_path.exists()
+
+    assert (report.linhas, report.importadas) == (4, 2)
+    assert [numero for numero, _ in report.erros] == [4, 5]
+    assert "nome_empresa" in report.erros[0][1]
+    assert "rendimento_mensal" in report.erros[1][1]
+
+    resumos = SegmentStorage(tmp_path / "dados", check_interval=0)
+    pagina = resumos.list_summaries()
+    assert [s["nome_cliente"] for s in pagina] == ["Duda", "Ana"]
+    registro = resumos.get(pagina[1]["id"])
+    assert pagina[1]["id"].startswith("clínica_sol/")
+    assert registro["input"]["rendimento_mensal"] == pytest.approx(20000.5)
+    assert registro["input"]["despesas_anuais"]["secretaria"] == 12000
+    assert "economia_tributaria" in registro["output"]["comparativo"]
+
+
+def test_xlsx_e_validacao_sem_gravar(tmp_path):
+    arquivo = tmp_path / "clientes.xlsx"
+    _xlsx(arquivo, [["nome_empresa", "rendimento_mensal", "aluguel"], ["Clinica", 25000, 6000], ["Clinica", -1, 0]])
+
+    report = import_payloads(iter_payloads(arquivo), None)
+    assert (report.linhas, report.importadas) == (2, 1)
+    assert report.erros[0][0] == 3
+    assert list(tmp_path.iterdir()) == [arquivo]
+
+
+def test_importacoes_no_mesmo_segundo_nao_se_sobrescrevem(tmp_path):
+    storage = SegmentStorage(tmp_path, check_interval=0)
+    linha = (1, {"nome_empresa": "Clinica", "rendimento_mensal": 20000.0, "despesas_anuais": {}})
+    for _ in range(3):
+        assert import_payloads([linha], storage.save_many).importadas == 1
+    import_payloads([linha, linha], FileStorage(tmp_path / "json", check_interval=0).save_many)
+
+    ids = [summary["id"] for summary in SegmentStorage(tmp_path, check_interval=0).list_summaries()]
+    assert len(set(ids)) == 3
+    assert len(FileStorage(tmp_path / "json", check_interval=0).list_summaries()) == 2
@@ -1,6 +1,12 @@
-﻿import pytest
+﻿import json
+import math
 
-from backend.calculations import calculate_all
+import pytest
+from fastapi.testclient import TestClient
+
+import app as flask_app
+from backend import main
+from backend.calculations import calculate, calculate_all
 
 
 def test_calculo_planilha_referencia():
@@ -40,3 +46,48 @@ def test_calculo_planilha_referencia():
     assert pj["aliquota_efetiva_final"] == pytest.approx(0.13466030859016695, rel=1e-6)
 
     assert comp["economia_tributaria"] == pytest.approx(121378.64875343977, rel=1e-6)
+
+
+def test_resultado_com_slots_gera_o_mesmo_json_que_os_dicts():
+    despesas = {"secretaria": 24000.0, "aluguel_condominio": 30000.0, "contador": 0, "outras_despesas": 0, "total": 54000.0}
+    resultado = calculate(80000, despesas, 1621.0, 0, 1621.0)
+    assert not hasattr(resultado.pf, "__dict__")
+    assert resultado.to_dict() == calculate_all(80000, despesas, 1621.0, 0, 1621.0)
+    assert json.loads(resultado.to_json()) == resultado.to_dict()
+
+    completo = json.loads(resultado.to_json({"assumptions": {"min_wage_used": 1621.0}}))
+    assert completo["assumptions"] == {"min_wage_used": 1621.0}
+    assert completo["pj"] == resultado.to_dict()["pj"]
+
+    resultado.pf.irpf = math.inf
+    assert resultado.pf.to_json() == json.dumps(resultado.pf.to_dict(), separators=(",", ":"))
+    with pytest.raises(ValueError):
+        resultado.pf.to_json(allow_nan=False)
+
+
+def test_calcular_na_api_fastapi_nao_devolve_infinity():
+    with TestClient(main.app) as cliente:
+        credenciais = main._get_credentials()
+        token = cliente.post("/login", json={"login": credenciais["login"], "senha": credenciais["password"]})
+        cabecalhos = {"X-Auth-Token": token.json()["token"]}
+        enorme = cliente.post("/calculate", json={"rendimento_mensal": 1e308, "despesas_anuais": {}}, headers=cabecalhos)
+        assert enorme.status_code == 422
+        assert "Infinity" not in enorme.text
+        nao_finito = cliente.post(
+            "/calculate",
+            content='{"rendimento_mensal": 1000, "despesas_anuais": {"secretaria": NaN}}',
+            headers={**cabecalhos, "Content-Type": "application/json"},
+        )
+        assert nao_finito.status_code == 422
+
+
+def test_calcular_no_flask_nao_devolve_infinity():
+    cliente = flask_app.app.test_client()
+    credenciais = flask_app._get_credentials()
+    cabecalhos = {"X-Auth-Token": flask_app._make_token(credenciais["login"], credenciais["password"])}
+    enorme = cliente.post("/calculate", json={"rendimento_mensal": 1e308, "despesas_anuais": {}}, headers=cabecalhos)
+    assert enorme.status_code == 422
+    assert "Infinity" not in enorme.get_data(as_text=True)
+    for valor in ("nan", "inf"):
+        resposta = cliente.post("/calculate", json={"rendimento_mensal": valor, "despesas_anuais": {}}, headers=cabecalhos)
+        assert resposta.status_code == 400
@@ -0,0 +1,42 @@
+import json
+import os
+
+from backend import constants
+from backend.config import FileSnapshot, parse_env
+
+
+def test_snapshot_recarrega_somente_quando_arquivo_muda(tmp_path):
+    path = tmp_path / ".env"
+    path.write_text("ADMIN_LOGIN=admin\n", encoding="utf-8")
+    leituras = []
+
+    def loader(text):
+        leituras.append(text)
+        return parse_env(text)
+
+    snapshot = FileSnapshot(path, loader, check_interval=0)
+    assert snapshot.get() == {"ADMIN_LOGIN": "admin"}
+    assert snapshot.get() == {"ADMIN_LOGIN": "admin"}
+    assert len(leituras) == 1
+
+    path.write_text("ADMIN_LOGIN=outro\n", encoding="utf-8")
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    assert snapshot.get() == {"ADMIN_LOGIN": "outro"}
+    assert len(leituras) == 2
+
+
+def test_save_rules_atualiza_snapshot_e_versao(tmp_path, monkeypatch):
+    config_path = tmp_path / "regras.json"
+    config_path.write_text(json.dumps({"pj": {"cbs_enabled": False}}), encoding="utf-8")
+    monkeypatch.setattr(constants, "CONFIG_PATH", config_path)
+    monkeypatch.setattr(constants, "_RULES", FileSnapshot(config_path, constants._load_rules))
+
+    versao_inicial = constants.get_rules_version()
+    assert constants.get_rules()["pj"]["cbs_enabled"] is False
+
+    constants.save_rules({"pj": {"cbs_enabled": True}})
+
+    assert constants.get_rules()["pj"]["cbs_enabled"] is True
+    assert constants.get_rules_version() != versao_inicial
+    assert json.loads(config_path.read_text(encoding="utf-8"))["pj"]["cbs_enabled"] is True
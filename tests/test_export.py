@@ -0,0 +1,90 @@
+import csv
+import gzip
+import io
+import json
+
+from backend.export import (
+    ANALYSIS_COLUMNS,
+    SIMULATION_COLUMNS,
+    encode_batches,
+    export_analysis,
+    export_simulations,
+    gzip_chunks,
+    iter_summary_batches,
+    parse_date_bound,
+)
+from backend.storage import FileStorage
+
+
+def _storage(tmp_path):
+    storage = FileStorage(tmp_path, check_interval=0)
+    for dia in range(1, 8):
+        empresa = "Clinica" if dia % 2 else "Outra"
+        storage.save(
+            {
+                "id": f"{empresa.lower()}/2026-01-0{dia}_100000",
+                "created_at": f"2026-01-0{dia}T10:00:00",
+                "nome_cliente": f"Cliente {dia}",
+                "nome_empresa": empresa,
+                "input": {"rendimento_mensal": 1000.0 * dia},
+                "output": {"comparativo": {"economia_tributaria": float(dia)}},
+            }
+        )
+    return storage
+
+
+def test_lotes_respeitam_periodo_e_empresa(tmp_path):
+    storage = _storage(tmp_path)
+    batches = list(
+        iter_summary_batches(
+            storage.list_summaries,
+            desde=parse_date_bound("2026-01-02"),
+            ate=parse_date_bound("2026-01-06", end=True),
+            batch_size=2,
+        )
+    )
+    assert [len(batch) for batch in batches] == [2, 2, 1]
+    assert [s["created_at"][:10] for batch in batches for s in batch] == [
+        "2026-01-06",
+        "2026-01-05",
+        "2026-01-04",
+        "2026-01-03",
+        "2026-01-02",
+    ]
+
+    linhas = "".join(export_analysis(storage.list_summaries, "ndjson", empresa="clinica")).splitlines()
+    assert [json.loads(linha)["economia_tributaria"] for linha in linhas] == [7.0, 5.0, 3.0, 1.0]
+
+
+def test_csv_achatado_e_gzip(tmp_path):
+    storage = _storage(tmp_path)
+    texto = gzip.decompress(
+        b"".join(gzip_chunks(export_simulations(storage.list_summaries, storage.get_many, "csv")))
+    ).decode("utf-8")
+    linhas = list(csv.DictReader(io.StringIO(texto)))
+    assert len(linhas) == 7
+    assert linhas[0]["input.rendimento_mensal"] == "7000.0"
+    assert linhas[-1]["output.comparativo.economia_tributaria"] == "1.0"
+
+
+def test_csv_sem_linhas_ainda_tem_cabecalho():
+    texto = "".join(encode_batches(iter(()), "csv", ANALYSIS_COLUMNS))
+    assert texto.strip() == ",".join(ANALYSIS_COLUMNS)
+
+
+def test_csv_de_simulacoes_tem_colunas_fixas(tmp_path):
+    storage = _storage(tmp_path)
+    recalculado = storage.get("clinica/2026-01-07_100000")
+    recalculado["rules_version"] = "v2"
+    recalculado["outputs_anteriores"] = {"v1": {"comparativo": {"economia_tributaria": 6.5}}}
+    storage.save(recalculado)
+
+    texto = "".join(export_simulations(storage.list_summaries, storage.get_many, "csv"))
+    leitor = csv.DictReader(io.StringIO(texto))
+    linhas = list(leitor)
+    assert tuple(leitor.fieldnames) == SIMULATION_COLUMNS
+    assert (linhas[0]["rules_version"], linhas[1]["rules_version"]) == ("v2", "")
+    assert linhas[1]["input.rendimento_mensal"] == "6000.0"
+
+    ndjson = "".join(export_simulations(storage.list_summaries, storage.get_many, "ndjson")).splitlines()
+    assert json.loads(ndjson[0])["outputs_anteriores"]["v1"]["comparativo"]["economia_tributaria"] == 6.5
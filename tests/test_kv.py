@@ -0,0 +1,62 @@
+import pytest
+
+from backend.kv import KVClient, KVError
+
+
+class _Resposta:
+    def __init__(self, payload):
+        self._payload = payload
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self._payload
+
+
+class _SessaoFalsa:
+    def __init__(self, respostas):
+        self.respostas = list(respostas)
+        self.chamadas = []
+
+    def post(self, url, json=None, timeout=None):
+        self.chamadas.append((url, json))
+        return _Resposta(self.respostas.pop(0))
+
+
+def _cliente(respostas):
+    cliente = KVClient("https://kv.exemplo/", "token")
+    cliente._session = _SessaoFalsa(respostas)
+    return cliente
+
+
+def test_pipeline_envia_varios_comandos_numa_requisicao():
+    cliente = _cliente([[{"result": "OK"}, {"result": 1}]])
+    resultado = cliente.pipeline([["SET", "sim:a/1", "{}"], ["ZADD", "sim:index", 1.5, "a/1"]])
+    assert resultado == ["OK", 1]
+    assert cliente._session.chamadas == [
+        ("https://kv.exemplo/pipeline", [["SET", "sim:a/1", "{}"], ["ZADD", "sim:index", "1.5", "a/1"]])
+    ]
+
+
+def test_transacao_usa_multi_exec_e_propaga_erro():
+    cliente = _cliente([[{"result": 1}, {"error": "WRONGTYPE"}]])
+    with pytest.raises(KVError):
+        cliente.transaction([["DEL", "x"], ["ZREM", "x", "y"]])
+    assert cliente._session.chamadas[0][0] == "https://kv.exemplo/multi-exec"
+
+
+def test_sessao_reaproveita_conexoes_com_retentativas():
+    cliente = KVClient("https://kv.exemplo", "token")
+    adapter = cliente._session.get_adapter("https://kv.exemplo")
+    assert adapter.max_retries.total == 3
+    assert adapter.max_retries.backoff_factor > 0
+    assert cliente._session.headers["Authorization"] == "Bearer token"
+
+
+def test_transacao_so_e_repetida_se_a_conexao_falhar():
+    cliente = KVClient("https://kv.exemplo", "token")
+    retentativas = cliente._session.get_adapter("https://kv.exemplo/multi-exec").max_retries
+    assert retentativas.connect == 3
+    assert (retentativas.read, retentativas.status, retentativas.other) == (0, 0, 0)
+    assert cliente._session.get_adapter("https://kv.exemplo/pipeline").max_retries.read is None
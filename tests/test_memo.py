@@ -0,0 +1,42 @@
+import json
+
+from backend import constants
+from backend.calculations import calculate_all
+from backend.config import FileSnapshot
+from backend.memo import MemoCache, cached_calculate_all
+
+DESPESAS = {"secretaria": 12000.0, "aluguel_condominio": 0.0, "contador": 0.0, "outras_despesas": 0.0, "total": 12000.0}
+
+
+def test_lru_com_ttl_e_contadores():
+    agora = [0.0]
+    cache = MemoCache(maxsize=2, ttl=10.0, clock=lambda: agora[0])
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    agora[0] = 11.0
+    assert cache.get("a") is None
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 2
+
+
+def test_calculo_em_cache_invalida_quando_regras_mudam(tmp_path, monkeypatch):
+    config_path = tmp_path / "regras.json"
+    config_path.write_text(json.dumps({"pj": {"cbs_enabled": False}}), encoding="utf-8")
+    monkeypatch.setattr(constants, "CONFIG_PATH", config_path)
+    monkeypatch.setattr(constants, "_RULES", FileSnapshot(config_path, constants._load_rules, check_interval=0))
+    cache = MemoCache()
+
+    primeiro = cached_calculate_all(30000.0, DESPESAS, 0.0, 0.0, 0.0, cache=cache)
+    primeiro["assumptions"] = {}
+    segundo = cached_calculate_all(30000, dict(reversed(list(DESPESAS.items()))), 0, 0, constants.DEFAULT_MIN_WAGE, cache=cache)
+    assert "assumptions" not in segundo
+    assert segundo == calculate_all(30000.0, DESPESAS, 0.0, 0.0, 0.0)
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    constants.save_rules({"pj": {"cbs_enabled": True}})
+    terceiro = cached_calculate_all(30000.0, DESPESAS, 0.0, 0.0, 0.0, cache=cache)
+    assert cache.misses == 2
+    assert terceiro["pj"] != segundo["pj"]
@@ -0,0 +1,47 @@
+from fastapi.testclient import TestClient
+
+import app as flask_app
+from backend import main, metrics
+
+ENTRADA = {"rendimento_mensal": 30000.0, "despesas_anuais": {"secretaria": 12000.0}}
+
+
+def _etapas(cabecalho):
+    return {item.split(";")[0] for item in cabecalho.split(", ")}
+
+
+def test_histograma_no_formato_prometheus():
+    registro = metrics.Registry()
+    registro.histogram("latencia_seconds", "Latencia.")
+    registro.observe("latencia_seconds", (("route", '/a"b'),), 0.003)
+    registro.observe("latencia_seconds", (("route", '/a"b'),), 20.0)
+    texto = registro.render()
+    assert "# TYPE latencia_seconds histogram" in texto
+    assert 'latencia_seconds_bucket{route="/a\\"b",le="0.0025"} 0' in texto
+    assert 'latencia_seconds_bucket{route="/a\\"b",le="0.005"} 1' in texto
+    assert 'latencia_seconds_bucket{route="/a\\"b",le="+Inf"} 2' in texto
+    assert 'latencia_seconds_count{route="/a\\"b"} 2' in texto
+
+
+def test_server_timing_e_metrics_nos_dois_apps(monkeypatch):
+    monkeypatch.setattr(metrics, "ENABLED", False)
+    cliente_flask = flask_app.app.test_client()
+    credenciais = flask_app._get_credentials()
+    cabecalhos = {"X-Auth-Token": flask_app._make_token(credenciais["login"], credenciais["password"])}
+    desligado = cliente_flask.post("/calculate", json=ENTRADA, headers=cabecalhos)
+    assert desligado.status_code == 200 and "Server-Timing" not in desligado.headers
+    assert cliente_flask.get("/metrics").status_code == 404
+
+    monkeypatch.setattr(metrics, "ENABLED", True)
+    monkeypatch.setattr(metrics, "REGISTRY", metrics.Registry())
+    resposta = cliente_flask.post("/calculate", json=ENTRADA, headers=cabecalhos)
+    assert {"auth", "calculo", "serializacao", "total"} <= _etapas(resposta.headers["Server-Timing"])
+
+    with TestClient(main.app) as cliente:
+        credenciais = main._get_credentials()
+        token = cliente.post("/login", json={"login": credenciais["login"], "senha": credenciais["password"]})
+        resposta = cliente.post("/calculate", json=ENTRADA, headers={"X-Auth-Token": token.json()["token"]})
+        assert {"auth", "calculo", "serializacao", "total"} <= _etapas(resposta.headers["server-timing"])
+        texto = cliente.get("/metrics").text
+    assert 'route="/calculate",status="200"' in texto
+    assert 'stage="calculo"' in texto
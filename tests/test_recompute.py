@@ -0,0 +1,73 @@
+import io
+import json
+
+import pytest
+
+from backend import constants
+from backend.calculations import calculate_all
+from backend.config import FileSnapshot
+from backend.recompute import recompute_archive
+from backend.storage import FileStorage
+
+
+def _regras(tmp_path, monkeypatch, **pj):
+    config_path = tmp_path / "regras.json"
+    config_path.write_text(json.dumps({"pj": pj}), encoding="utf-8")
+    monkeypatch.setattr(constants, "CONFIG_PATH", config_path)
+    monkeypatch.setattr(constants, "_RULES", FileSnapshot(config_path, constants._load_rules, check_interval=0))
+
+
+def _storage(tmp_path):
+    storage = FileStorage(tmp_path / "dados", check_interval=0)
+    for dia, renda in enumerate((8000.0, 30000.0, 90000.0), start=1):
+        entrada = {"rendimento_mensal": renda, "despesas_anuais": {"secretaria": 12000.0}}
+        despesas = {"secretaria": 12000.0, "aluguel_condominio": 0.0, "contador": 0.0, "outras_despesas": 0.0}
+        storage.save(
+            {
+                "id": f"clinica/2026-01-0{dia}_100000",
+                "created_at": f"2026-01-0{dia}T10:00:00",
+                "nome_cliente": f"Cliente {dia}",
+                "nome_empresa": "Clinica",
+                "input": entrada,
+                "output": calculate_all(renda, {**despesas, "total": 12000.0}, 0.0, 0.0, 0.0),
+            }
+        )
+    storage.save({"id": "clinica/2026-01-04_100000", "created_at": "2026-01-04T10:00:00", "input": {}})
+    return storage
+
+
+def test_recalculo_grava_versao_e_relata_mudancas(tmp_path, monkeypatch):
+    _regras(tmp_path, monkeypatch, cbs_enabled=False, ibs_enabled=False)
+    storage = _storage(tmp_path)
+
+    sem_mudanca = recompute_archive(storage.list_summaries, storage.get_many, None, batch_size=2)
+    assert (sem_mudanca.total, sem_mudanca.recalculados) == (4, 3)
+    assert sem_mudanca.veredito_alterado + sem_mudanca.economia_alterada == 0
+    assert [sim_id for sim_id, _ in sem_mudanca.erros] == ["clinica/2026-01-04_100000"]
+
+    versao_anterior = constants.get_rules_version()
+    saida_original = storage.get("clinica/2026-01-02_100000")["output"]
+    _regras(tmp_path, monkeypatch, cbs_enabled=True, ibs_enabled=True)
+    relatorio = io.StringIO()
+    report = recompute_archive(
+        storage.list_summaries, storage.get_many, storage.save_many, batch_size=2, report_stream=relatorio
+    )
+    linhas = [json.loads(linha) for linha in relatorio.getvalue().splitlines()]
+    assert len(linhas) == report.veredito_alterado + report.economia_alterada == 3
+    assert all(linha["diferenca"] < 0 for linha in linhas)
+
+    registro = storage.get("clinica/2026-01-02_100000")
+    assert registro["rules_version"] == constants.get_rules_version()
+    economia = next(linha for linha in linhas if linha["id"] == registro["id"])["economia_nova"]
+    assert registro["output"]["comparativo"]["economia_tributaria"] == pytest.approx(economia)
+    assert registro["outputs_anteriores"] == {"sem_versao": saida_original}
+
+    _regras(tmp_path, monkeypatch, cbs_enabled=False, ibs_enabled=False)
+    recompute_archive(storage.list_summaries, storage.get_many, storage.save_many, batch_size=2)
+    anteriores = storage.get("clinica/2026-01-02_100000")["outputs_anteriores"]
+    assert constants.get_rules_version() == versao_anterior
+    assert anteriores["sem_versao"] == saida_original
+    assert anteriores[registro["rules_version"]] == registro["output"]
+
+    de_novo = recompute_archive(storage.list_summaries, storage.get_many, storage.save_many)
+    assert (de_novo.ja_atualizados, de_novo.recalculados) == (3, 0)
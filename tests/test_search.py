@@ -0,0 +1,113 @@
+from fastapi.testclient import TestClient
+
+import app as flask_app
+from backend import main
+from benchmarks.kvlocal import use_local_kv
+from backend.search import SearchIndex, parse_ranges
+from backend.sqlite_storage import SQLiteStorage
+from backend.storage import FileStorage, open_storage, summarize_record
+from conftest import make_record
+
+
+REGISTROS = [
+    make_record("clinilab/2026-01-10_100000", "2026-01-10T10:00:00", "Clinilab", "Ana Souza", 150000.0, 9000.0),
+    make_record("clinilab/2026-02-15_100000", "2026-02-15T10:00:00", "Clinilab", "João Lima", 80000.0, 1000.0),
+    make_record("clinilab/2026-05-01_100000", "2026-05-01T10:00:00", "Clinilab", "Ana Souza", 300000.0, 25000.0),
+    make_record("otica/2026-03-20_100000", "2026-03-20T10:00:00", "Ótica Central", "Mariana Alves", 500000.0, None),
+]
+
+
+def _ids(resultado):
+    total, pagina = resultado
+    return total, [summary["id"] for summary in pagina]
+
+
+def test_busca_por_prefixo_aproximada_e_faixas():
+    indice = SearchIndex(summarize_record(record) for record in REGISTROS)
+    primeiro_trimestre = parse_ranges({"desde": "2026-01-01", "ate": "2026-03-31", "rendimento_min": "100000"})
+    assert _ids(indice.search("clini", ranges=primeiro_trimestre)) == (1, ["clinilab/2026-01-10_100000"])
+    assert _ids(indice.search("OTICA cent")) == (1, ["otica/2026-03-20_100000"])
+    assert _ids(indice.search("joao")) == (1, ["clinilab/2026-02-15_100000"])
+    assert indice.search("clinlab")[0] == 0
+    assert _ids(indice.search("clinlab souza", fuzzy=True)) == (
+        2,
+        ["clinilab/2026-05-01_100000", "clinilab/2026-01-10_100000"],
+    )
+    # registros sem o campo nao entram numa faixa dele
+    assert indice.search(ranges={"economia_tributaria": (None, None)})[0] == 3
+    assert _ids(indice.search(limit=2, offset=1)) == (
+        4,
+        ["otica/2026-03-20_100000", "clinilab/2026-02-15_100000"],
+    )
+
+    indice.discard("clinilab/2026-01-10_100000")
+    novo = make_record("otica/2026-06-01_100000", "2026-06-01T10:00:00", "Ótica Central", "Ana", 1.0, 2.0)
+    indice.add(summarize_record(novo))
+    assert _ids(indice.search("ana")) == (2, ["otica/2026-06-01_100000", "clinilab/2026-05-01_100000"])
+    assert indice.search("clini", ranges=primeiro_trimestre)[0] == 0
+
+
+def test_armazenamentos_mantem_o_indice_de_busca(tmp_path):
+    for storage in (FileStorage(tmp_path / "json", check_interval=0), open_storage(tmp_path / "sqlite", "sqlite")):
+        storage.save_many(REGISTROS[:3])
+        assert storage.search("ana")[0] == 2
+        storage.save(REGISTROS[3])
+        assert storage.delete("clinilab/2026-01-10_100000")
+        assert _ids(storage.search("ana")) == (1, ["clinilab/2026-05-01_100000"])
+        assert _ids(storage.search("mari")) == (1, ["otica/2026-03-20_100000"])
+
+    # gravacoes de outro processo entram no indice existente, sem remonta-lo
+    for storage in (FileStorage(tmp_path / "json", check_interval=0), SQLiteStorage(tmp_path / "sqlite")):
+        assert storage.search("ana")[0] == 1
+        indice = storage._search if isinstance(storage, FileStorage) else storage._search[1]
+        outro = type(storage)(storage.data_dir)
+        outro.save(make_record("lab/2026-07-01_100000", "2026-07-01T10:00:00", "Lab", "Ana", 1.0, 1.0))
+        outro.delete("clinilab/2026-05-01_100000")
+        assert _ids(storage.search("ana")) == (1, ["lab/2026-07-01_100000"])
+        assert (storage._search if isinstance(storage, FileStorage) else storage._search[1]) is indice
+
+
+def test_rota_de_busca_nos_dois_apps(tmp_path, monkeypatch):
+    storage = FileStorage(tmp_path, check_interval=0)
+    storage.save_many(REGISTROS)
+    monkeypatch.setattr(flask_app, "FILE_STORAGE", storage)
+    monkeypatch.setattr(main, "STORAGE", storage)
+    params = {"q": "clinilab", "desde": "2026-01-01", "ate": "2026-03-31", "rendimento_min": "100000"}
+
+    cliente_flask = flask_app.app.test_client()
+    credenciais = flask_app._get_credentials()
+    cabecalhos = {"X-Auth-Token": flask_app._make_token(credenciais["login"], credenciais["password"])}
+    resposta = cliente_flask.get("/simulations/search", query_string=params, headers=cabecalhos)
+    assert resposta.get_json()["total"] == 1
+    assert cliente_flask.get("/simulations/search?economia_max=x", headers=cabecalhos).status_code == 400
+
+    with TestClient(main.app) as cliente:
+        credenciais = main._get_credentials()
+        token = cliente.post("/login", json={"login": credenciais["login"], "senha": credenciais["password"]})
+        cabecalhos = {"X-Auth-Token": token.json()["token"]}
+        corpo = cliente.get("/simulations/search", params=params, headers=cabecalhos).json()
+        assert [item["id"] for item in corpo["items"]] == ["clinilab/2026-01-10_100000"]
+        assert cliente.get("/simulations/search", params={"ate": "ontem"}, headers=cabecalhos).status_code == 400
+
+
+def test_busca_no_kv_acompanha_gravacoes_do_processo(monkeypatch):
+    monkeypatch.setattr(flask_app, "_KV_SEARCH", None)
+    with use_local_kv():
+        for record in REGISTROS:
+            flask_app._save_record(record)
+        assert flask_app._search_summaries("ana", False, {}, 10, 0)[0] == 2
+        indice = flask_app._KV_SEARCH[1]
+        assert flask_app._delete_record("clinilab/2026-01-10_100000")
+        flask_app._save_record(make_record("lab/2026-07-01_100000", "2026-07-01T10:00:00", "Lab", "Ana", 1.0, 1.0))
+        total, pagina = flask_app._search_summaries("ana", False, {}, 10, 0)
+        assert flask_app._KV_SEARCH[1] is indice
+        assert [summary["id"] for summary in pagina] == ["lab/2026-07-01_100000", "clinilab/2026-05-01_100000"]
+
+        # gravacoes de outro processo: o indice aplica os ids de ``sim:changes``
+        with monkeypatch.context() as outro_processo:
+            outro_processo.setattr(flask_app, "_kv_update_search", lambda *args, **kwargs: None)
+            flask_app._save_records([make_record("lab/2026-08-01_100000", "2026-08-01T10:00:00", "Lab", "Ana", 1.0, 1.0)])
+            flask_app._delete_record("lab/2026-07-01_100000")
+        total, pagina = flask_app._search_summaries("ana", False, {}, 10, 0)
+        assert flask_app._KV_SEARCH[1] is indice
+        assert [summary["id"] for summary in pagina] == ["lab/2026-08-01_100000", "clinilab/2026-05-01_100000"]
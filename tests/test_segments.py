@@ -0,0 +1,63 @@
+import multiprocessing
+
+from backend.segments import SegmentStorage, convert_tree
+from backend.storage import FileStorage
+from conftest import make_record
+
+
+def test_segmento_grava_le_e_exclui_por_id(tmp_path):
+    storage = SegmentStorage(tmp_path, check_interval=0)
+    storage.save(make_record("clinica/2026-01-01_100000", "2026-01-01T10:00:00"))
+    storage.save(make_record("clinica/2026-01-02_100000", "2026-01-02T10:00:00"))
+
+    assert [path.name for path in tmp_path.iterdir() if path.suffix == ".seg"] == ["clinica.seg"]
+    assert storage.get("clinica/2026-01-01_100000")["created_at"] == "2026-01-01T10:00:00"
+    assert storage.delete("clinica/2026-01-01_100000")
+    assert storage.get("clinica/2026-01-01_100000") is None
+    assert not storage.delete("clinica/2026-01-01_100000")
+
+    outro = SegmentStorage(tmp_path, check_interval=0)
+    assert [s["id"] for s in outro.list_summaries()] == ["clinica/2026-01-02_100000"]
+    assert outro.compact() == 2
+    assert outro.get("clinica/2026-01-02_100000")["id"] == "clinica/2026-01-02_100000"
+
+
+def test_segmento_ignora_quadro_incompleto_no_fim(tmp_path):
+    storage = SegmentStorage(tmp_path, check_interval=0)
+    storage.save(make_record("clinica/2026-01-01_100000", "2026-01-01T10:00:00"))
+    with (tmp_path / "clinica.seg").open("ab") as handle:
+        handle.write(b"\x00\x05\x00\x00")
+
+    novo = SegmentStorage(tmp_path, check_interval=0)
+    novo.save(make_record("clinica/2026-01-02_100000", "2026-01-02T10:00:00"))
+    assert novo.get("clinica/2026-01-02_100000") is not None
+    assert len(SegmentStorage(tmp_path).list_summaries()) == 2
+
+
+def _grava_em_outro_processo(data_dir, inicio):
+    storage = SegmentStorage(data_dir, check_interval=0)
+    for numero in range(inicio, inicio + 100):
+        storage.save(make_record(f"clinica/2026-01-01_{numero:06d}", "2026-01-01T10:00:00"))
+
+
+def test_processos_anexam_ao_mesmo_segmento_sem_perder_quadros(tmp_path):
+    contexto = multiprocessing.get_context("fork")
+    processos = [contexto.Process(target=_grava_em_outro_processo, args=(tmp_path, inicio)) for inicio in (0, 100, 200)]
+    for processo in processos:
+        processo.start()
+    for processo in processos:
+        processo.join()
+    assert len(SegmentStorage(tmp_path).list_summaries()) == 300
+
+
+def test_conversao_de_json_para_segmento_e_volta(tmp_path):
+    FileStorage(tmp_path).save(make_record("clinica/2026-01-01_100000", "2026-01-01T10:00:00"))
+    FileStorage(tmp_path).save(make_record("outra/2026-01-02_100000", "2026-01-02T10:00:00", empresa="Outra"))
+
+    assert convert_tree(tmp_path, "segment") == 2
+    assert not (tmp_path / "clinica").exists()
+    assert SegmentStorage(tmp_path).get("outra/2026-01-02_100000")["nome_empresa"] == "Outra"
+
+    assert convert_tree(tmp_path, "json") == 2
+    assert not list(tmp_path.glob("*.seg"))
+    assert len(FileStorage(tmp_path).list_summaries()) == 2
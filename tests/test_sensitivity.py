@@ -0,0 +1,68 @@
+import json
+
+import pytest
+
+from backend.calculations import calculate_all
+from backend.sensitivity import Axis, sensitivity_json, sensitivity_ndjson, validate_axes
+
+CENARIO = {
+    "rendimento_mensal": 80000.0,
+    "pro_labore": 1621.0,
+    "iss_fixo": 1500.0,
+    "salario_minimo": 1621.0,
+    "annual_expenses": {
+        "secretaria": 24000.0,
+        "aluguel_condominio": 30000.0,
+        "contador": 12000.0,
+        "outras_despesas": 0.0,
+        "total": 66000.0,
+    },
+}
+
+
+def test_grade_confere_com_calculo_escalar():
+    eixo_x = Axis("rendimento_mensal", 10000, 200000, 4)
+    eixo_y = Axis("outras_despesas", 0, 60000, 3)
+
+    grade = json.loads(sensitivity_json(CENARIO, eixo_x, eixo_y))
+
+    for i, outras in enumerate(grade["y"]["valores"]):
+        despesas = dict(CENARIO["annual_expenses"], outras_despesas=outras)
+        despesas["total"] = 66000.0 + outras
+        for j, renda in enumerate(grade["x"]["valores"]):
+            comparativo = calculate_all(renda, despesas, 1621.0, 1500.0, 1621.0)["comparativo"]
+            economia = comparativo["economia_tributaria"]
+            assert grade["economia_tributaria"][i][j] == pytest.approx(economia, abs=0.005)
+            assert grade["aliquota_pf"][i][j] == pytest.approx(comparativo["aliquota_pf"], abs=1e-6)
+
+
+def test_grade_ndjson_uma_linha_por_valor_de_y():
+    eixo_x = Axis("rendimento_mensal", 10000, 200000, 5)
+    eixo_y = Axis("pro_labore", 1621, 20000, 7)
+
+    linhas = [json.loads(linha) for linha in sensitivity_ndjson(CENARIO, eixo_x, eixo_y)]
+
+    assert linhas[0]["x"]["campo"] == "rendimento_mensal"
+    assert [linha["y"] for linha in linhas[1:]] == linhas[0]["y"]["valores"]
+    assert all(len(linha["aliquota_pj_final"]) == 5 for linha in linhas[1:])
+
+
+def test_eixos_invalidos():
+    with pytest.raises(ValueError):
+        validate_axes(Axis("rendimento_mensal", 0, 1, 2), Axis("rendimento_mensal", 0, 1, 2))
+    with pytest.raises(ValueError):
+        validate_axes(Axis("inexistente", 0, 1, 2), Axis("pro_labore", 0, 1, 2))
+    with pytest.raises(ValueError):
+        validate_axes(Axis("rendimento_mensal", 0, float("inf"), 2), Axis("pro_labore", 0, 1, 2))
+
+
+def test_celulas_que_estouram_viram_null_e_o_json_e_compacto():
+    eixo_x = Axis("rendimento_mensal", 0, 1e308, 3)
+    eixo_y = Axis("pro_labore", 0, 1, 2)
+
+    texto = sensitivity_json(CENARIO, eixo_x, eixo_y)
+    grade = json.loads(texto, parse_constant=pytest.fail)
+    assert None in grade["aliquota_pf"][0]
+    assert ": " not in texto and ", " not in texto
+    for linha in sensitivity_ndjson(CENARIO, eixo_x, eixo_y):
+        json.loads(linha, parse_constant=pytest.fail)
@@ -0,0 +1,34 @@
+from benchmarks.kvlocal import use_local_kv
+from backend.kv import get_kv_client
+from backend.sessions import KVSessions, MemorySessions, SQLiteSessions
+
+
+def test_sessoes_em_memoria_vencem_e_respeitam_o_limite():
+    agora = [1000.0]
+    sessoes = MemorySessions(ttl=60, maxsize=2, clock=lambda: agora[0])
+    primeiro = sessoes.create("ana")
+    segundo = sessoes.create("bruno")
+    assert sessoes.get(primeiro) == "ana"
+    sessoes.create("carla")
+    assert sessoes.get(segundo) is None
+    agora[0] += 61
+    assert sessoes.get(primeiro) is None
+
+
+def test_sessoes_compartilhadas_entre_workers(tmp_path):
+    agora = [1000.0]
+    worker_a = SQLiteSessions(tmp_path, ttl=60, clock=lambda: agora[0])
+    worker_b = SQLiteSessions(tmp_path, ttl=60, clock=lambda: agora[0])
+    token = worker_a.create("admin")
+    assert worker_a.cached(token) == "admin"
+    assert worker_b.cached(token) is None
+    assert worker_b.get(token) == "admin"
+    assert worker_b.cached(token) == "admin"
+    assert worker_b.get("desconhecido") is None
+    agora[0] += 61
+    assert worker_b.get(token) is None
+    assert SQLiteSessions(tmp_path, ttl=60, clock=lambda: agora[0]).get(token) is None
+
+    with use_local_kv():
+        token = KVSessions(get_kv_client(), ttl=60).create("admin")
+        assert KVSessions(get_kv_client(), ttl=60).get(token) == "admin"
@@ -0,0 +1,88 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import app as flask_app
+from backend import main
+from backend.calculations import calculate_all
+from backend.solver import break_even_income, optimize_pro_labore
+
+
+def _despesas(secretaria=0.0, aluguel=0.0, contador=0.0, outras=0.0):
+    despesas = {
+        "secretaria": secretaria,
+        "aluguel_condominio": aluguel,
+        "contador": contador,
+        "outras_despesas": outras,
+    }
+    despesas["total"] = secretaria + aluguel + contador + outras
+    return despesas
+
+
+@pytest.mark.parametrize(
+    "despesas, pro_labore, iss",
+    [
+        (_despesas(24000, 30000, 12000), 1621, 1500),
+        (_despesas(outras=200000), 5000, 3000),
+        (_despesas(), 0, 0),
+    ],
+)
+def test_break_even_zera_economia_tributaria(despesas, pro_labore, iss):
+    result = break_even_income(despesas, pro_labore, iss, 1621)
+
+    assert result["pontos"]
+    for ponto in result["pontos"]:
+        renda = ponto["rendimento_mensal"]
+        economia = calculate_all(renda, despesas, pro_labore, iss, 1621)["comparativo"]["economia_tributaria"]
+        assert economia == pytest.approx(0.0, abs=1e-6)
+
+        acima = calculate_all(renda * 1.01, despesas, pro_labore, iss, 1621)["comparativo"]["economia_tributaria"]
+        assert (acima > 0) == (ponto["direcao"] == "pj")
+
+
+def test_break_even_referencia_planilha():
+    result = break_even_income(_despesas(24000, 30000, 12000), 1621, 1500, 1621)
+    assert result["vantagem_inicial"] == "pf"
+    assert result["break_even"] == pytest.approx(12543.66, abs=0.01)
+
+
+def test_pro_labore_otimo_minimiza_carga():
+    despesas = _despesas(24000, 30000, 12000)
+    result = optimize_pro_labore(80000, despesas, 1500, 1621, points=201)
+
+    assert result["limites"]["min"] <= result["pro_labore_otimo"] <= result["limites"]["max"]
+    menor_carga = min(row["carga_total"] for row in result["curva"])
+    assert result["otimo"]["carga_total"] <= menor_carga + 1e-6
+
+    pj = calculate_all(80000, despesas, result["pro_labore_otimo"], 1500, 1621)["pj"]
+    assert result["otimo"]["impacto_pf"] == pytest.approx(pj["impacto_pf"])
+
+
+def test_pro_labore_otimo_respeita_limites():
+    despesas = _despesas(24000, 30000, 12000)
+    result = optimize_pro_labore(80000, despesas, 1500, 1621, min_pro_labore=15000, max_pro_labore=20000)
+
+    assert result["pro_labore_otimo"] == 15000
+    assert result["curva"][0]["pro_labore"] == 15000
+    assert result["curva"][-1]["pro_labore"] == pytest.approx(20000)
+
+    # limite padrao (salario minimo) cede ao maximo informado
+    limites = optimize_pro_labore(80000, despesas, 1500, 1621, max_pro_labore=1000)["limites"]
+    assert limites == {"min": 1000, "max": 1000}
+    with pytest.raises(ValueError):
+        optimize_pro_labore(80000, despesas, 1500, 1621, min_pro_labore=20000, max_pro_labore=15000)
+
+
+def test_limites_invertidos_sao_recusados_nos_dois_apps():
+    corpo = {"rendimento_mensal": 80000, "despesas_anuais": {}, "pro_labore_min": 20000, "pro_labore_max": 15000}
+    cliente_flask = flask_app.app.test_client()
+    credenciais = flask_app._get_credentials()
+    cabecalhos = {"X-Auth-Token": flask_app._make_token(credenciais["login"], credenciais["password"])}
+    resposta = cliente_flask.post("/optimize/pro-labore", json=corpo, headers=cabecalhos)
+    assert resposta.status_code == 400
+    assert "pro_labore_min" in resposta.get_json()["detail"]
+
+    with TestClient(main.app) as cliente:
+        credenciais = main._get_credentials()
+        token = cliente.post("/login", json={"login": credenciais["login"], "senha": credenciais["password"]})
+        resposta = cliente.post("/optimize/pro-labore", json=corpo, headers={"X-Auth-Token": token.json()["token"]})
+        assert resposta.status_code == 422
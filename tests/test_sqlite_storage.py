@@ -0,0 +1,72 @@
+import sqlite3
+
+from backend.sqlite_storage import DATABASE_NAME, SQLiteStorage, _pack
+from backend.storage import FileStorage, open_storage, summary_key
+from conftest import make_record
+
+
+REGISTROS = [
+    make_record("clinica/2026-01-01_100000", "2026-01-01T10:00:00"),
+    make_record("clinica/2026-01-02_100000", "2026-01-02T10:00:00", cliente="Bruno", economia=-50.0),
+    make_record("outra/2026-01-03_100000", "2026-01-03T10:00:00", empresa="Outra", rendimento=900000.0),
+    make_record("outra/2026-01-04_100000", "2026-01-04T10:00:00", empresa="Outra", cliente="Bruna", economia=None),
+]
+
+
+def test_sqlite_consulta_como_o_armazenamento_em_arquivos(tmp_path):
+    arquivos = FileStorage(tmp_path / "json", check_interval=0)
+    banco = open_storage(tmp_path / "sqlite", "sqlite")
+    arquivos.save_many(REGISTROS)
+    banco.save_many(REGISTROS)
+
+    consultas = [
+        {},
+        {"empresa": "CLINICA"},
+        {"cliente": "brun"},
+        {"limit": 2, "offset": 1},
+        {"reverse": False, "limit": 3},
+        {"before": summary_key(REGISTROS[2]), "limit": 10},
+    ]
+    for filtros in consultas:
+        assert banco.list_summaries(**filtros) == arquivos.list_summaries(**filtros)
+    assert banco.aggregates() == arquivos.aggregates()
+    assert banco.get_many(["outra/2026-01-03_100000", "nao/existe"]) == [REGISTROS[2], None]
+
+    geracao = banco.generation()
+    assert not banco.delete("nao/existe")
+    assert banco.generation() == geracao
+    assert banco.delete("clinica/2026-01-01_100000")
+    assert banco.generation() != geracao
+    assert banco.get("clinica/2026-01-01_100000") is None
+    assert banco.aggregates()["total"]["quantidade"] == 3
+    assert SQLiteStorage(tmp_path / "sqlite").generation() == banco.generation()
+
+
+def test_leitor_aberto_nao_bloqueia_escrita(tmp_path):
+    banco = SQLiteStorage(tmp_path)
+    banco.save(REGISTROS[0])
+    leitor = sqlite3.connect(tmp_path / DATABASE_NAME, isolation_level=None, timeout=0)
+    leitor.execute("BEGIN")
+    assert leitor.execute("SELECT count(*) FROM simulacoes").fetchone() == (1,)
+
+    banco.save(REGISTROS[1])
+
+    assert leitor.execute("SELECT count(*) FROM simulacoes").fetchone() == (1,)
+    leitor.execute("COMMIT")
+    assert leitor.execute("SELECT count(*) FROM simulacoes").fetchone() == (2,)
+    assert len(banco.list_summaries()) == 2
+
+
+def test_rebuild_mantem_ids_quando_registro_falta(tmp_path):
+    banco = SQLiteStorage(tmp_path)
+    banco.save_many(REGISTROS[:3])
+    conn = sqlite3.connect(tmp_path / DATABASE_NAME, isolation_level=None)
+    conn.execute("DELETE FROM registros WHERE id = ?", (REGISTROS[0]["id"],))
+    for registro in REGISTROS[1:3]:
+        sem_id = {chave: valor for chave, valor in registro.items() if chave != "id"}
+        conn.execute("UPDATE registros SET registro = ? WHERE id = ?", (_pack(sem_id), registro["id"]))
+    conn.close()
+
+    banco.rebuild()
+
+    assert banco.get_many([r["id"] for r in REGISTROS[1:3]]) == REGISTROS[1:3]
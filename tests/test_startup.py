@@ -0,0 +1,8 @@
+from benchmarks.startup import LAZY_MODULES, probe
+
+
+def test_import_do_app_nao_carrega_modulos_sob_demanda():
+    amostra = probe()
+    assert amostra["carregados"] == []
+    assert set(LAZY_MODULES) >= {"requests", "pydantic", "backend.bulk", "backend.recompute", "backend.export"}
+    assert amostra["import"] > 0 and amostra["primeira_requisicao"] > 0
@@ -0,0 +1,205 @@
+import json
+import multiprocessing
+import os
+
+from fastapi.testclient import TestClient
+
+import app as flask_app
+from backend import main
+from backend import storage as storage_module
+from backend.export import iter_summary_batches
+from backend.storage import CATALOG_NAME, FileStorage, next_cursor, open_storage, summary_key
+from benchmarks.kvlocal import use_local_kv
+from conftest import make_record
+
+
+def test_catalogo_acompanha_gravacao_e_exclusao(tmp_path):
+    storage = FileStorage(tmp_path, check_interval=0)
+    storage.save(make_record("clinica/2026-01-01_100000", "2026-01-01T10:00:00"))
+    storage.save(make_record("clinica/2026-01-02_100000", "2026-01-02T10:00:00", cliente="Bruno"))
+    storage.save(make_record("outra/2026-01-03_100000", "2026-01-03T10:00:00", empresa="Outra"))
+
+    ids = [summary["id"] for summary in storage.list_summaries()]
+    assert ids == ["outra/2026-01-03_100000", "clinica/2026-01-02_100000", "clinica/2026-01-01_100000"]
+    assert [s["id"] for s in storage.list_summaries(empresa="clinica", cliente="bru")] == [
+        "clinica/2026-01-02_100000"
+    ]
+    assert storage.list_summaries()[0]["economia_tributaria"] == 100.0
+    assert [s["id"] for s in storage.list_summaries(limit=1, offset=1)] == ["clinica/2026-01-02_100000"]
+    assert [s["id"] for s in storage.list_summaries(reverse=False, limit=1)] == ["clinica/2026-01-01_100000"]
+
+    assert storage.delete("clinica/2026-01-01_100000")
+    assert not storage.delete("clinica/2026-01-01_100000")
+    assert len(FileStorage(tmp_path).list_summaries()) == 2
+
+
+def test_catalogo_detecta_arquivos_gravados_por_fora(tmp_path):
+    storage = FileStorage(tmp_path, check_interval=0)
+    storage.save(make_record("clinica/2026-01-01_100000", "2026-01-01T10:00:00"))
+
+    externo = tmp_path / "clinica" / "2026-01-05_100000.json"
+    externo.write_text(json.dumps(make_record("clinica/2026-01-05_100000", "2026-01-05T10:00:00")), encoding="utf-8")
+    stat = externo.parent.stat()
+    os.utime(externo.parent, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+    assert [s["id"] for s in storage.list_summaries()][0] == "clinica/2026-01-05_100000"
+
+
+def test_catalogo_corrompido_e_reconstruido(tmp_path):
+    FileStorage(tmp_path).save(make_record("clinica/2026-01-01_100000", "2026-01-01T10:00:00"))
+    (tmp_path / CATALOG_NAME).write_text("{invalido", encoding="utf-8")
+
+    summaries = FileStorage(tmp_path).list_summaries()
+
+    assert [s["id"] for s in summaries] == ["clinica/2026-01-01_100000"]
+    assert json.loads((tmp_path / CATALOG_NAME).read_text(encoding="utf-8"))["entries"]
+
+
+def _salva_em_outro_processo(data_dir, inicio):
+    storage = FileStorage(data_dir, check_interval=0)
+    for numero in range(inicio, inicio + 60):
+        storage.save(make_record(f"clinica/2026-01-01_{numero:06d}", "2026-01-01T10:00:00"))
+
+
+def test_processos_no_mesmo_diretorio_nao_perdem_resumos(tmp_path, monkeypatch):
+    # diario pequeno para o catalogo ser regravado varias vezes durante o teste
+    monkeypatch.setattr(storage_module, "JOURNAL_MIN_SIZE", 4000)
+    storage = FileStorage(tmp_path, check_interval=0)
+    storage.save(make_record("outra/2026-01-02_100000", "2026-01-02T10:00:00", empresa="Outra"))
+    contexto = multiprocessing.get_context("fork")
+    processos = [contexto.Process(target=_salva_em_outro_processo, args=(tmp_path, inicio)) for inicio in (0, 60, 120)]
+    for processo in processos:
+        processo.start()
+    for processo in processos:
+        processo.join()
+
+    assert len(storage.list_summaries()) == 181
+    assert len(FileStorage(tmp_path).list_summaries()) == 181
+    assert json.loads((tmp_path / CATALOG_NAME).read_text(encoding="utf-8"))["seq"] > 1
+    assert not list(tmp_path.glob("*.tmp"))
+
+
+def test_paginacao_por_cursor_percorre_do_mais_novo_ao_mais_antigo(tmp_path):
+    storage = FileStorage(tmp_path, check_interval=0)
+    for dia in range(1, 6):
+        empresa = "Clinica" if dia % 2 else "Outra"
+        storage.save(make_record(f"{empresa.lower()}/2026-01-0{dia}_100000", f"2026-01-0{dia}T10:00:00", empresa=empresa))
+
+    pagina = storage.list_summaries(limit=2)
+    cursor = next_cursor(pagina, 2)
+    assert cursor == summary_key(pagina[-1])
+    pagina = storage.list_summaries(limit=2, before=cursor)
+    assert [s["created_at"][:10] for s in pagina] == ["2026-01-03", "2026-01-02"]
+
+    filtrada = storage.list_summaries(empresa="clinica", limit=5, before=cursor)
+    assert [s["created_at"][:10] for s in filtrada] == ["2026-01-03", "2026-01-01"]
+    assert next_cursor(filtrada, 5) is None
+
+
+def test_indice_ordenado_acompanha_gravacoes_sem_reordenar(tmp_path):
+    storage = FileStorage(tmp_path, check_interval=0)
+    storage.save_many(make_record(f"clinica/2026-01-0{dia}_100000", f"2026-01-0{dia}T10:00:00") for dia in (2, 4, 6))
+    pagina = storage.list_summaries()
+    assert storage._sorted is not None
+
+    storage.save(make_record("clinica/2026-01-04_100000", "2026-01-04T10:00:00", economia=7.0))
+    storage.save(make_record("clinica/2026-01-02_100000", "2026-01-09T10:00:00"))
+    storage.save(make_record("clinica/2026-01-05_100000", "2026-01-05T10:00:00"))
+    storage.delete("clinica/2026-01-06_100000")
+
+    esperado = FileStorage(tmp_path).list_summaries()
+    assert storage.list_summaries() == esperado
+    assert [s["created_at"][:10] for s in esperado] == ["2026-01-09", "2026-01-05", "2026-01-04"]
+    assert esperado[2]["economia_tributaria"] == 7.0
+    assert len(pagina) == 3
+
+
+def test_geracao_muda_a_cada_gravacao_e_e_igual_entre_instancias(tmp_path):
+    storage = FileStorage(tmp_path, check_interval=0)
+    inicial = storage.generation()
+    storage.save(make_record("clinica/2026-01-01_100000", "2026-01-01T10:00:00"))
+    depois = storage.generation()
+    assert depois != inicial
+    assert FileStorage(tmp_path, check_interval=0).generation() == depois
+
+    with storage.deferred_catalog():
+        storage.save(make_record("clinica/2026-01-02_100000", "2026-01-02T10:00:00"))
+        assert storage.generation() != depois
+    assert storage.generation() == FileStorage(tmp_path, check_interval=0).generation()
+
+
+def test_etag_das_listagens_responde_304_nos_dois_apps(tmp_path, monkeypatch):
+    storage = FileStorage(tmp_path, check_interval=3600)
+    storage.save(make_record("clinica/2026-01-01_100000", "2026-01-01T10:00:00"))
+    monkeypatch.setattr(flask_app, "FILE_STORAGE", storage)
+    monkeypatch.setattr(main, "STORAGE", storage)
+    outro_processo = FileStorage(tmp_path, check_interval=3600)
+
+    cliente_flask = flask_app.app.test_client()
+    credenciais = flask_app._get_credentials()
+    cabecalhos = {"X-Auth-Token": flask_app._make_token(credenciais["login"], credenciais["password"])}
+    etag = cliente_flask.get("/simulations", headers=cabecalhos).headers["ETag"]
+    assert cliente_flask.get("/simulations", headers={**cabecalhos, "If-None-Match": etag}).status_code == 304
+    # a gravacao de outro processo muda a ETag ja na proxima requisicao, sem esperar check_interval
+    outro_processo.save(make_record("clinica/2026-01-02_100000", "2026-01-02T10:00:00"))
+    resposta = cliente_flask.get("/simulations", headers={**cabecalhos, "If-None-Match": etag})
+    assert resposta.status_code == 200 and len(resposta.get_json()) == 2
+    assert resposta.headers["ETag"] != etag
+
+    with TestClient(main.app) as cliente:
+        credenciais = main._get_credentials()
+        token = cliente.post("/login", json={"login": credenciais["login"], "senha": credenciais["password"]})
+        cabecalhos = {"X-Auth-Token": token.json()["token"]}
+        etag = cliente.get("/simulations", headers=cabecalhos).headers["etag"]
+        assert cliente.get("/simulations", headers={**cabecalhos, "If-None-Match": etag}).status_code == 304
+        outro_processo.delete("clinica/2026-01-01_100000")
+        resposta = cliente.get("/simulations", headers={**cabecalhos, "If-None-Match": etag})
+        assert resposta.status_code == 200 and len(resposta.json()) == 1
+        assert resposta.headers["etag"] != etag
+
+
+def test_cursor_nao_pula_registros_com_o_mesmo_horario(tmp_path):
+    registros = [make_record(f"clinica/2026-01-01_10000{numero}", "2026-01-01T10:00:00") for numero in range(5)]
+    registros.append(make_record("clinica/2026-01-02_100000", "2026-01-02T10:00:00"))
+    esperados = ["clinica/2026-01-02_100000"] + [f"clinica/2026-01-01_10000{numero}" for numero in (4, 3, 2, 1, 0)]
+
+    def percorre(listar):
+        ids, cursor = [], None
+        while True:
+            pagina = listar(limit=2, before=cursor)
+            ids += [summary["id"] for summary in pagina]
+            cursor = next_cursor(pagina, 2)
+            if cursor is None:
+                return ids
+
+    for storage in (FileStorage(tmp_path / "json", check_interval=0), open_storage(tmp_path / "sqlite", "sqlite")):
+        storage.save_many(registros)
+        assert percorre(storage.list_summaries) == esperados
+        lotes = iter_summary_batches(storage.list_summaries, batch_size=2)
+        assert [summary["id"] for lote in lotes for summary in lote] == esperados
+
+    with use_local_kv():
+        for registro in registros:
+            flask_app._save_record(registro)
+        assert percorre(flask_app._list_summaries) == esperados
+        assert percorre(lambda **pagina: flask_app._list_summaries(empresa="clinica", **pagina)) == esperados
+
+
+def test_resumos_que_faltam_no_kv_sao_gerados_na_leitura_e_pelo_comando():
+    ids = [f"clinica/2026-01-0{dia}_100000" for dia in (1, 2, 3)]
+    with use_local_kv():
+        for dia, sim_id in enumerate(ids, start=1):
+            flask_app._save_record(make_record(sim_id, f"2026-01-0{dia}T10:00:00", economia=float(dia)))
+        kv = flask_app._kv_client()
+        # simulacoes gravadas antes de existir o hash de resumos
+        kv.command("HDEL", flask_app.KV_SUMMARIES_KEY, ids[0], ids[2])
+        resumos = flask_app._list_summaries()
+        assert [summary["id"] for summary in resumos] == ids[::-1]
+        assert resumos[0]["economia_tributaria"] == 3.0
+        assert kv.command("HLEN", flask_app.KV_SUMMARIES_KEY) == 3
+
+        kv.command("HDEL", flask_app.KV_SUMMARIES_KEY, ids[1])
+        saida = flask_app.app.test_cli_runner().invoke(args=["backfill-summaries"])
+        assert saida.exit_code == 0
+        assert "1 resumos gerados para 3 simulacoes no KV" in saida.output
+        assert json.loads(kv.command("HGET", flask_app.KV_SUMMARIES_KEY, ids[1]))["economia_tributaria"] == 2.0
@@ -0,0 +1,111 @@
+import asyncio
+import json
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from backend import async_storage, main
+from backend.async_storage import AsyncStorage
+from backend.storage import FileStorage, new_record_id
+from backend.writer import WriteBehind, WriteTimeout
+from conftest import make_record
+
+
+def test_ids_no_mesmo_segundo_nao_colidem():
+    gerados = [new_record_id("Clínica Boa Vista") for _ in range(2000)]
+    ids = [sim_id for sim_id, _ in gerados]
+    assert len(set(ids)) == len(ids)
+    assert ids == sorted(ids)
+    assert ids[0].startswith("clínica_boa_vista/")
+    assert [created for _, created in gerados] == sorted({created for _, created in gerados})
+
+
+def test_fila_grava_em_lote_e_sobrevive_a_falhas(tmp_path):
+    storage = FileStorage(tmp_path, check_interval=0)
+    original = storage.save_many
+    falhas = [1]
+
+    def instavel(records):
+        if falhas[0]:
+            falhas[0] -= 1
+            raise OSError("disco cheio")
+        return original(records)
+
+    storage.save_many = instavel
+    writer = WriteBehind(storage)
+    ids = []
+    for _ in range(50):
+        sim_id, created = new_record_id("Clinica")
+        writer.submit(make_record(sim_id, created.isoformat()))
+        ids.append(sim_id)
+    writer.close(timeout=10)
+    assert not writer.busy and writer.pending(ids[0]) is None
+    assert [record["id"] for record in storage.get_many(ids)] == ids
+    assert not list(tmp_path.rglob("*.tmp"))
+
+
+def test_leitura_apos_salvar_ve_o_registro(tmp_path):
+    backend = FileStorage(tmp_path, check_interval=0)
+    storage = AsyncStorage(backend, WriteBehind(backend))
+    sim_id, created = new_record_id("Clinica")
+
+    async def run():
+        await storage.save(make_record(sim_id, created.isoformat()))
+        encontrado = await storage.get(sim_id)
+        resumos = await storage.list_summaries()
+        await storage.close()
+        return encontrado, resumos
+
+    encontrado, resumos = asyncio.run(run())
+    assert encontrado["id"] == sim_id
+    assert [summary["id"] for summary in resumos] == [sim_id]
+
+
+def test_armazenamento_travado_tem_prazo_e_despeja_a_fila(tmp_path, monkeypatch):
+    storage = FileStorage(tmp_path, check_interval=0)
+
+    def falha(records):
+        raise OSError("disco cheio")
+
+    storage.save_many = falha
+    monkeypatch.setattr(async_storage, "FLUSH_TIMEOUT", 0.05)
+    monkeypatch.setattr(main, "STORAGE", storage)
+    with TestClient(main.app) as cliente:
+        credenciais = main._get_credentials()
+        token = cliente.post("/login", json={"login": credenciais["login"], "senha": credenciais["password"]})
+        cabecalhos = {"X-Auth-Token": token.json()["token"]}
+        sim_id, created = new_record_id("Clinica")
+        writer = main._storage().writer
+        writer.submit(make_record(sim_id, created.isoformat()))
+        resposta = cliente.get("/simulations", headers=cabecalhos)
+        assert resposta.status_code == 503
+        with pytest.raises(WriteTimeout):
+            asyncio.run(AsyncStorage(storage, writer).list_summaries())
+        writer.close(timeout=0.1)
+
+    assert not writer.busy
+    despejadas = [json.loads(linha) for linha in writer.dump_path.read_text(encoding="utf-8").splitlines()]
+    assert writer.dump_path.parent == tmp_path
+    assert [record["id"] for record in despejadas] == [sim_id]
+
+
+def test_exportacao_ve_o_que_ainda_esta_na_fila(tmp_path, monkeypatch):
+    storage = FileStorage(tmp_path, check_interval=0)
+    original = storage.save_many
+
+    def lento(records):
+        time.sleep(0.2)
+        return original(records)
+
+    storage.save_many = lento
+    monkeypatch.setattr(main, "STORAGE", storage)
+    with TestClient(main.app) as cliente:
+        credenciais = main._get_credentials()
+        token = cliente.post("/login", json={"login": credenciais["login"], "senha": credenciais["password"]})
+        cabecalhos = {"X-Auth-Token": token.json()["token"]}
+        sim_id, created = new_record_id("Clinica")
+        main._storage().writer.submit(make_record(sim_id, created.isoformat()))
+        for rota in ("/export/simulations", "/export/analysis"):
+            linhas = cliente.get(rota, headers=cabecalhos).text.splitlines()
+            assert [json.loads(linha)["created_at"] for linha in linhas] == [created.isoformat()], rota